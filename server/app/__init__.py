@@ -37,6 +37,18 @@ def create_app(config_class=Config):
     # Initialize extensions
     mongo.init_app(app)
     
+    # Create missing indexes (idempotent). A client with a short server-selection
+    # timeout keeps startup quick when MongoDB is unreachable; the app still starts
+    if app.config.get('SYNC_INDEXES_ON_STARTUP') and not app.testing:
+        from pymongo import MongoClient
+        from app.utils.indexes import sync_indexes
+        try:
+            with MongoClient(app.config['MONGO_URI'],
+                             serverSelectionTimeoutMS=app.config['INDEX_SYNC_TIMEOUT_MS']) as client:
+                sync_indexes(client[mongo.db.name])
+        except Exception as e:
+            app.logger.warning(f"Index sync skipped (run `flask db sync-indexes` later): {str(e)}")
+    
     # Configure CORS
     CORS(app, resources={r"/api/*": {"origins": "*"}}, supports_credentials=True)
     
@@ -47,6 +59,7 @@ def create_app(config_class=Config):
     from app.routes.pastpapers import pastpapers
     from app.routes.saved import saved_items
     from app.routes.ratings import ratings
+    from app.routes.ai import ai
     
     app.register_blueprint(auth, url_prefix='/api/auth')
     app.register_blueprint(units_bp, url_prefix='/api/units')
@@ -54,6 +67,11 @@ def create_app(config_class=Config):
     app.register_blueprint(pastpapers, url_prefix='/api/pastpapers')
     app.register_blueprint(saved_items, url_prefix='/api/saved-items')
     app.register_blueprint(ratings, url_prefix='/api/ratings')
+    app.register_blueprint(ai, url_prefix='/api/ai')
+    
+    # Register CLI commands
+    from app.commands import register_commands
+    register_commands(app)
     
     # Error handlers
     @app.errorhandler(HTTPException)
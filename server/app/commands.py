@@ -0,0 +1,143 @@
+# app/commands.py
+# Maintenance commands, run with `flask --app run <group> <command>`
+
+import click
+from flask.cli import AppGroup
+
+questions_cli = AppGroup('questions', help='Question index maintenance')
+embeddings_cli = AppGroup('embeddings', help='Embedding storage maintenance')
+notes_cli = AppGroup('notes', help='Note vector index maintenance')
+papers_cli = AppGroup('papers', help='Past paper analytics maintenance')
+db_cli = AppGroup('db', help='Database index maintenance')
+
+# Collections and fields that hold embeddings in MongoDB
+EMBEDDING_FIELDS = {
+    'questions': 'embedding',
+    'notes': 'embeddings'
+}
+
+
+@questions_cli.command('index-vectors')
+@click.option('--unit-id', default=None, help='Only index questions of this unit')
+@click.option('--batch-size', default=256, show_default=True, help='Points per upsert')
+def index_question_vectors(unit_id, batch_size):
+    """Index question embeddings into the archive-wide vector collection"""
+    from app.services.question_vectors import get_question_vector_store
+
+    store = get_question_vector_store()
+    if store is None:
+        raise click.ClickException('Question vector store is unavailable')
+    total = store.sync_from_mongo(unit_id=unit_id, batch_size=batch_size)
+    click.echo(f"Indexed {total} questions")
+
+
+@embeddings_cli.command('migrate')
+@click.option('--dtype', type=click.Choice(['float32', 'float16']), default=None,
+              help='Storage dtype (defaults to EMBEDDING_STORAGE_DTYPE)')
+@click.option('--collection', 'collections', multiple=True, type=click.Choice(sorted(EMBEDDING_FIELDS)),
+              help='Collection to migrate (repeatable; default all)')
+@click.option('--batch-size', default=500, show_default=True, help='Updates per bulk write')
+@click.option('--dry-run', is_flag=True, help='Report sizes without writing')
+def migrate_embeddings_command(dtype, collections, batch_size, dry_run):
+    """Convert float-array embeddings to compact BSON Binary"""
+    from flask import current_app
+    from app import mongo
+    from app.utils.embeddings import migrate_embeddings
+
+    dtype = dtype or current_app.config.get('EMBEDDING_STORAGE_DTYPE', 'float32')
+    for name in collections or sorted(EMBEDDING_FIELDS):
+        result = migrate_embeddings(
+            mongo.db[name], EMBEDDING_FIELDS[name],
+            dtype=dtype, batch_size=batch_size, dry_run=dry_run
+        )
+        click.echo(f"{name}.{EMBEDDING_FIELDS[name]}: {result['documents']} documents, "
+                   f"{result['bytes_before']} -> {result['bytes_after']} bytes"
+                   f"{' (dry run)' if dry_run else ''}")
+
+
+@notes_cli.command('backfill-units')
+def backfill_note_units_command():
+    """Copy unit_id onto note chunks stored before it was part of the payload"""
+    from app.services.note_vectors import backfill_note_units
+
+    updated = backfill_note_units()
+    click.echo(f"Updated chunks of {updated} notes")
+
+
+@notes_cli.command('index-sentences')
+@click.option('--embeddings', is_flag=True, help='Also store sentence embeddings')
+def index_note_sentences_command(embeddings):
+    """Rebuild the sentence index of every note with content"""
+    from app import mongo
+    from app.services.sentence_index import store_sentence_index
+
+    encode = None
+    if embeddings:
+        from app.services.embedding_service import get_embedding_service
+        encode = get_embedding_service().get_embeddings
+
+    total = 0
+    for note in mongo.db.notes.find({'content': {'$nin': [None, '']}}, {'content': 1}):
+        store_sentence_index(note['_id'], note['content'], encode=encode)
+        total += 1
+    click.echo(f"Indexed sentences of {total} notes")
+
+
+@papers_cli.command('rebuild-topic-stats')
+@click.option('--unit-id', default=None, help='Only rebuild this unit')
+def rebuild_topic_stats_command(unit_id):
+    """Recompute unit_topic_stats from past_papers"""
+    from app.services.topic_stats import rebuild_unit_topic_stats
+
+    rebuild_unit_topic_stats(unit_id)
+    click.echo(f"Rebuilt topic stats for {unit_id or 'all units'}")
+
+
+@db_cli.command('sync-indexes')
+@click.option('--collection', 'collections', multiple=True, help='Only sync this collection (repeatable)')
+def sync_indexes_command(collections):
+    """Create the registered indexes that are missing"""
+    from app.utils.indexes import sync_indexes
+
+    for name, result in sync_indexes(collections=collections or None).items():
+        click.echo(f"{name}: {len(result['created'])} created, {len(result['existing'])} existing")
+        for index in result['conflicts']:
+            click.echo(f"  conflict: {index} (an index with the same keys and other options exists)")
+        for index in result['unregistered']:
+            click.echo(f"  unregistered: {index}")
+
+
+@db_cli.command('index-report')
+def index_report_command():
+    """Explain the hot query shapes and flag collection scans and in-memory sorts"""
+    from app.utils.indexes import missing_index_report
+
+    report = missing_index_report()
+    for entry in report:
+        problems = [p for p, flagged in (('COLLSCAN', entry['collection_scan']),
+                                         ('in-memory sort', entry['in_memory_sort'])) if flagged]
+        status = ', '.join(problems) if problems else 'ok'
+        click.echo(f"{entry['collection']}: {entry['shape']}: {status} [{' > '.join(map(str, entry['stages']))}]")
+    missing = sum(1 for entry in report if entry['collection_scan'] or entry['in_memory_sort'])
+    click.echo(f"{missing} of {len(report)} query shapes need an index")
+
+
+@db_cli.command('index-search')
+@click.option('--collection', 'collections', multiple=True, type=click.Choice(['units', 'past_papers']),
+              help='Collection to index (repeatable; default all)')
+@click.option('--batch-size', default=500, show_default=True, help='Updates per bulk write')
+def index_search_command(collections, batch_size):
+    """Recompute the search_tokens used by unit and past paper search"""
+    from app.services.search_tokens import backfill_search_tokens
+
+    for name in collections or ('units', 'past_papers'):
+        click.echo(f"{name}: updated {backfill_search_tokens(name, batch_size=batch_size)} documents")
+
+
+def register_commands(app):
+    """Attach the CLI command groups to the app"""
+    app.cli.add_command(questions_cli)
+    app.cli.add_command(embeddings_cli)
+    app.cli.add_command(notes_cli)
+    app.cli.add_command(papers_cli)
+    app.cli.add_command(db_cli)
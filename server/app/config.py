@@ -13,12 +13,43 @@ class Config:
     # MongoDB settings
     MONGO_URI = os.environ.get('MONGO_URI', 'mongodb://localhost:27017/syllabuzz')
     MONGO_DB = os.environ.get('MONGO_DB', 'syllabuzz')
+    # Create missing registered indexes when the app starts (see utils/indexes.py)
+    SYNC_INDEXES_ON_STARTUP = os.environ.get('SYNC_INDEXES_ON_STARTUP', 'true').lower() == 'true'
+    # Milliseconds the startup sync waits for MongoDB before giving up
+    INDEX_SYNC_TIMEOUT_MS = int(os.environ.get('INDEX_SYNC_TIMEOUT_MS', 2000))
     
     # Qdrant settings
     QDRANT_HOST = os.environ.get('QDRANT_HOST', 'localhost')
     QDRANT_PORT = int(os.environ.get('QDRANT_PORT', 6333))
     QDRANT_COLLECTION = os.environ.get('QDRANT_COLLECTION', 'syllabuzz')
     
+    # Archive-wide question vectors: 'server' (Qdrant above) or 'local' (embedded, stored at
+    # QUESTION_VECTOR_PATH; single process only, since embedded Qdrant locks its folder)
+    QUESTION_VECTOR_BACKEND = os.environ.get('QUESTION_VECTOR_BACKEND', 'server')
+    QUESTION_COLLECTION = os.environ.get('QUESTION_COLLECTION', 'questions')
+    QUESTION_VECTOR_PATH = os.environ.get('QUESTION_VECTOR_PATH', 'question_vectors')
+    # Seconds to wait before reconnecting after the vector backend was unreachable
+    QUESTION_VECTOR_RETRY_SECONDS = int(os.environ.get('QUESTION_VECTOR_RETRY_SECONDS', 60))
+
+    # Note chunk vectors (one point per chunk, payload carries note_id and unit_id)
+    NOTES_COLLECTION = os.environ.get('NOTES_COLLECTION', 'notes_content')
+    
+    # Sentence embedding model used by the embedding service
+    EMBEDDING_MODEL = os.environ.get('EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+    # Length of that model's embeddings; sizes new vector collections
+    EMBEDDING_DIMENSION = int(os.environ.get('EMBEDDING_DIMENSION', 384))
+
+    # Embeddings stored in MongoDB documents are packed as BSON Binary: 'float32' or 'float16'
+    EMBEDDING_STORAGE_DTYPE = os.environ.get('EMBEDDING_STORAGE_DTYPE', 'float32')
+
+    # Seconds the in-memory unit embedding matrices (question_index) are reused before reloading
+    QUESTION_INDEX_TTL = int(os.environ.get('QUESTION_INDEX_TTL', 300))
+    NOTE_INDEX_TTL = int(os.environ.get('NOTE_INDEX_TTL', 300))
+
+    # Question highlights: sentence embeddings score by meaning instead of word overlap
+    SENTENCE_EMBEDDINGS = os.environ.get('SENTENCE_EMBEDDINGS', 'false').lower() == 'true'
+    HIGHLIGHT_CACHE_TTL = int(os.environ.get('HIGHLIGHT_CACHE_TTL', 24 * 3600))
+    
     # Redis settings
     REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
 
@@ -29,7 +60,50 @@ class Config:
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', 'uploads')
     MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB limit
     ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'ppt', 'pptx'}
-    
+
+    # Ingestion pipeline settings (pages -> chunks -> embedding batches -> upsert batches)
+    INGEST_EMBED_BATCH_SIZE = int(os.environ.get('INGEST_EMBED_BATCH_SIZE', 64))
+    INGEST_UPSERT_BATCH_SIZE = int(os.environ.get('INGEST_UPSERT_BATCH_SIZE', 100))
+    INGEST_MAX_IN_FLIGHT = int(os.environ.get('INGEST_MAX_IN_FLIGHT', 2))
+
+    # Rendered page image settings
+    PAGE_CACHE_FOLDER = os.environ.get('PAGE_CACHE_FOLDER', 'page_cache')
+    PAGE_PRERENDER_PAGES = int(os.environ.get('PAGE_PRERENDER_PAGES', 3))
+    PAGE_CACHE_MAX_AGE = int(os.environ.get('PAGE_CACHE_MAX_AGE', 365 * 24 * 3600))
+
+    # Text similarity analysis: texts above SIMILARITY_DENSE_MAX get sparse (top-k/threshold) results
+    SIMILARITY_MAX_TEXTS = int(os.environ.get('SIMILARITY_MAX_TEXTS', 5000))
+    SIMILARITY_DENSE_MAX = int(os.environ.get('SIMILARITY_DENSE_MAX', 200))
+    SIMILARITY_BLOCK_SIZE = int(os.environ.get('SIMILARITY_BLOCK_SIZE', 512))
+    SIMILARITY_MAX_EDGES = int(os.environ.get('SIMILARITY_MAX_EDGES', 20000))
+
+    # Past paper analysis: background workers, seconds before a stuck job is re-queued, retries
+    ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', 2))
+    ANALYSIS_JOB_TIMEOUT = int(os.environ.get('ANALYSIS_JOB_TIMEOUT', 600))
+    ANALYSIS_MAX_ATTEMPTS = int(os.environ.get('ANALYSIS_MAX_ATTEMPTS', 3))
+
+    # Practice question generation: 'local' or 'openai' (default: openai when a key is set)
+    QUESTION_GENERATOR = os.environ.get('QUESTION_GENERATOR', '')
+    OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
+    PRACTICE_QUESTIONS_CACHE_TTL = int(os.environ.get('PRACTICE_QUESTIONS_CACHE_TTL', 3600))
+    PRACTICE_QUESTIONS_MAX_COUNT = int(os.environ.get('PRACTICE_QUESTIONS_MAX_COUNT', 20))
+
+    # List pagination: deeper page-number offsets must follow next_cursor instead
+    MAX_PAGE_OFFSET = int(os.environ.get('MAX_PAGE_OFFSET', 10000))
+    # Seconds an exact filtered list total is reused (unfiltered totals are estimated)
+    COUNT_CACHE_TTL = int(os.environ.get('COUNT_CACHE_TTL', 30))
+
+    # HTML rendition settings
+    HTML_CACHE_FOLDER = os.environ.get('HTML_CACHE_FOLDER', 'html_cache')
+    HTML_DEFAULT_PAGES = int(os.environ.get('HTML_DEFAULT_PAGES', 10))
+    HTML_MAX_PAGES = int(os.environ.get('HTML_MAX_PAGES', 50))
+
+    # Uploaded file serving: '' (Flask streams the file), 'x-accel' (nginx) or 'x-sendfile' (Apache/lighttpd)
+    FILE_SERVE_OFFLOAD = os.environ.get('FILE_SERVE_OFFLOAD', '')
+    X_ACCEL_PREFIX = os.environ.get('X_ACCEL_PREFIX', '/protected-uploads/')
+    FILE_CACHE_MAX_AGE = int(os.environ.get('FILE_CACHE_MAX_AGE', 3600))
+    USE_X_SENDFILE = FILE_SERVE_OFFLOAD.lower() == 'x-sendfile'
+
     # JWT settings
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=30)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
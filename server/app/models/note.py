@@ -3,6 +3,10 @@
 from datetime import datetime
 from bson import ObjectId
 from app import mongo
+from app.config import Config
+from app.utils.embeddings import encode_embedding
+from app.services.question_index import note_index
+from app.services.sentence_index import store_sentence_index
 
 class Note:
     collection = mongo.db.notes
@@ -18,13 +22,17 @@ class Note:
             'topic': topic,
             'pdf_path': pdf_path,
             'page_numbers': page_numbers or [],
-            'embeddings': embeddings,  # Vector embeddings for content
+            'embeddings': encode_embedding(embeddings, Config.EMBEDDING_STORAGE_DTYPE),  # Vector embeddings for content (BSON Binary)
             'section_id': section_id,  # For hierarchical organization
             'created_at': datetime.utcnow(),
             'updated_at': datetime.utcnow()
         }
         result = Note.collection.insert_one(note)
         note['_id'] = result.inserted_id
+        note_index.add(unit_id, note['_id'], embeddings)
+        if content:
+            # Sentence offsets and token ids for question highlights
+            store_sentence_index(note['_id'], content)
         return note
     
     @staticmethod
@@ -2,6 +2,7 @@
 from datetime import datetime
 from bson import ObjectId
 from app import mongo
+from app.utils.database import BulkWriter
 
 class PastPaper:
     collection = mongo.db.pastpapers
@@ -161,6 +162,52 @@ class Question:
         Returns:
             The created question document
         """
+        question = Question._build_from_pastpaper(
+            unit_id, question_text, question_number, marks,
+            subquestions=subquestions, year=year, exam_type=exam_type,
+            pastpaper_id=pastpaper_id, section=section
+        )
+        
+        result = Question.collection.insert_one(question)
+        question['_id'] = result.inserted_id
+        return question
+    
+    @staticmethod
+    def create_many_from_pastpaper(unit_id, questions, year=None, exam_type=None,
+                                   pastpaper_id=None, section=None):
+        """
+        Create all questions of a past paper with batched unordered writes
+        
+        Args:
+            unit_id: ID of the unit the questions belong to
+            questions: List of dicts with 'text', 'question_number', 'marks'
+                and optional 'subquestions'/'section'
+            year: Year of the past paper
+            exam_type: Type of exam
+            pastpaper_id: Reference to the past paper
+            section: Default section identifier
+            
+        Returns:
+            The created question documents (with their new `_id`s)
+        """
+        documents = []
+        with BulkWriter(Question.collection, raise_on_error=True) as writer:
+            for question in questions:
+                document = Question._build_from_pastpaper(
+                    unit_id, question['text'], question['question_number'], question['marks'],
+                    subquestions=question.get('subquestions'), year=year, exam_type=exam_type,
+                    pastpaper_id=pastpaper_id, section=question.get('section', section)
+                )
+                writer.insert(document)
+                documents.append(document)
+        
+        return documents
+    
+    @staticmethod
+    def _build_from_pastpaper(unit_id, question_text, question_number, marks,
+                              subquestions=None, year=None, exam_type=None,
+                              pastpaper_id=None, section=None):
+        """Build a past-paper question document without writing it"""
         question = {
             'unit_id': ObjectId(unit_id),
             'text': question_text,
@@ -183,8 +230,6 @@ class Question:
         if section:
             question['section'] = section
         
-        result = Question.collection.insert_one(question)
-        question['_id'] = result.inserted_id
         return question
     
     @staticmethod
@@ -3,24 +3,31 @@
 from datetime import datetime
 from bson import ObjectId
 from app import mongo
+from app.config import Config
+from app.utils.embeddings import encode_embedding, decode_embedding
+from app.services.question_index import question_index
+from app.services.question_vectors import get_question_vector_store
+import logging
+
+logger = logging.getLogger(__name__)
 
 class Question:
     collection = mongo.db.questions
     
     @staticmethod
-    def create(text, unit_id, source_type, source_id, year=None, embedding=None, 
-               related_sections=None, difficulty=None, frequency=1, group_id=None):
+    def build(text, unit_id, source_type, source_id, year=None, embedding=None,
+              related_sections=None, difficulty=None, frequency=1, group_id=None):
         """
-        Create a new question
+        Build a question document without inserting it
         source_type: 'exam' or 'cat'
         """
-        question = {
+        return {
             'text': text,
             'unit_id': ObjectId(unit_id),
             'source_type': source_type,  # 'exam' or 'cat'
             'source_id': source_id,  # ID of the exam or CAT
             'year': year,
-            'embedding': embedding,  # Vector embedding
+            'embedding': encode_embedding(embedding, Config.EMBEDDING_STORAGE_DTYPE),  # Vector embedding (BSON Binary)
             'related_sections': related_sections or [],  # List of related note section IDs
             'difficulty': difficulty,
             'frequency': frequency,  # How many times this or similar questions appeared
@@ -28,10 +35,59 @@ class Question:
             'created_at': datetime.utcnow(),
             'updated_at': datetime.utcnow()
         }
+    
+    @staticmethod
+    def create(text, unit_id, source_type, source_id, year=None, embedding=None, 
+               related_sections=None, difficulty=None, frequency=1, group_id=None):
+        """
+        Create a new question
+        source_type: 'exam' or 'cat'
+        """
+        question = Question.build(
+            text, unit_id, source_type, source_id, year=year, embedding=embedding,
+            related_sections=related_sections, difficulty=difficulty,
+            frequency=frequency, group_id=group_id
+        )
         result = Question.collection.insert_one(question)
         question['_id'] = result.inserted_id
+        
+        # Keep the cached unit embedding matrix and the archive-wide index in step with the collection
+        question_index.add(unit_id, question['_id'], embedding)
+        store = get_question_vector_store() if embedding is not None else None
+        if store is not None:
+            try:
+                store.index_question(question)
+            except Exception as e:
+                # The index can be rebuilt with `flask questions index-vectors`
+                logger.warning(f"Could not index question {question['_id']}: {str(e)}")
         return question
     
+    @staticmethod
+    def create_many(questions):
+        """
+        Insert documents made by Question.build in one round trip
+        
+        Returns the documents with their `_id` set.
+        """
+        if not questions:
+            return []
+        Question.collection.insert_many(questions)
+        
+        by_unit = {}
+        for question in questions:
+            embedding = decode_embedding(question.get('embedding'))
+            by_unit.setdefault(question['unit_id'], []).append((question['_id'], embedding))
+        for unit_id, items in by_unit.items():
+            question_index.extend(unit_id, items)
+        
+        store = get_question_vector_store()
+        if store is not None:
+            try:
+                store.index_questions(questions)
+            except Exception as e:
+                logger.warning(f"Could not index {len(questions)} questions: {str(e)}")
+        return questions
+    
     @staticmethod
     def get_by_id(question_id):
         """Get question by ID"""
@@ -3,6 +3,7 @@
 from datetime import datetime
 from bson import ObjectId
 from app import mongo
+from app.services.search_tokens import unit_search_tokens
 
 class Unit:
     collection = mongo.db.units
@@ -18,6 +19,7 @@ class Unit:
             'created_at': datetime.utcnow(),
             'updated_at': datetime.utcnow()
         }
+        unit['search_tokens'] = unit_search_tokens(unit)
         result = Unit.collection.insert_one(unit)
         unit['_id'] = result.inserted_id
         return unit
@@ -6,34 +6,25 @@ from middleware.middleware import token_required
 import os
 import random
 import re
-import nltk
-from nltk.tokenize import sent_tokenize
-from nltk.corpus import stopwords
-from sentence_transformers import SentenceTransformer
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-import openai
-
-# Initialize NLTK resources
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
-    
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
+from app import mongo
+from app.services.embedding_service import get_embedding_service
+from app.services.paper_vectors import load_paper_vectors, store_paper_vector, paper_similarity_matrix
+from app.services.question_index import normalize_rows
+from app.services.topic_stats import (
+    get_unit_topic_stats, recent_topic_counts, recent_years,
+    year_filter, topic_frequencies, topic_trends, topic_name
+)
+from app.utils.file_serving import cached_content_hash
+from app.services.paper_analysis import request_paper_analysis, apply_detected_topics
+from app.services.question_generation import practice_questions, normalize_topics, DIFFICULTY_TYPES
+from app.services.text_similarity import SCORE_DTYPES, mean_similarity, top_k_neighbors, threshold_edges
 
 ai = Blueprint('ai', __name__, url_prefix='/api/ai')
 
-# Initialize Sentence Transformer model for embeddings
-model = None
 def get_model():
-    global model
-    if model is None:
-        model = SentenceTransformer('all-MiniLM-L6-v2')
-    return model
+    """Sentence embedding model, shared with the embedding service and loaded on first use"""
+    return get_embedding_service().model
 
 @ai.route('/analyze/<paper_id>', methods=['GET'])
 @token_required
@@ -46,7 +37,7 @@ def analyze_paper(paper_id):
         if not ObjectId.is_valid(paper_id):
             return jsonify({"success": False, "error": "Invalid paper ID"}), 400
             
-        db = current_app.config['MONGO_DB']
+        db = mongo.db
         
         # Get paper
         paper = db.past_papers.find_one({"_id": ObjectId(paper_id)})
@@ -59,35 +50,45 @@ def analyze_paper(paper_id):
         if not os.path.exists(file_path):
             return jsonify({"success": False, "error": "Paper file not found"}), 404
         
-        # In a real implementation, this would extract text from the PDF/DOC
-        # and analyze its content for difficulty, topics, etc.
-        # For this example, we'll generate a placeholder analysis
-        
-        # Get unit information for context
+        # Analyses are cached per file content and computed in the background
         unit = db.units.find_one({"_id": paper['unit_id']})
-        unit_keywords = unit.get('keywords', []) if unit else []
+        faculty_code = (unit.get('faculty_code') or unit.get('facultyCode')) if unit else None
+        file_hash = paper.get('file_hash') or cached_content_hash(file_path)
+        job = request_paper_analysis(paper, file_path, file_hash, faculty_code)
+        
+        if job['status'] != 'done':
+            if job['status'] == 'failed' and job.get('attempts', 0) >= current_app.config['ANALYSIS_MAX_ATTEMPTS']:
+                return jsonify({"success": False, "error": "Paper could not be analyzed"}), 422
+            return jsonify({
+                'success': True,
+                'data': {
+                    'status': job['status'],
+                    'job': {
+                        'id': str(job['_id']),
+                        'attempts': job.get('attempts', 0),
+                        'created_at': job['created_at'].isoformat(),
+                        'updated_at': job['updated_at'].isoformat()
+                    }
+                }
+            }), 202
         
-        # Generate a basic analysis
+        result = job['result']
         analysis = {
-            'difficulty_score': paper.get('avg_difficulty_rating', 0) or random.uniform(2.5, 4.5),
-            'estimated_completion_time': random.randint(60, 180),  # minutes
-            'question_count': random.randint(5, 15),
-            'topics_detected': paper.get('topics', []) or sample_topics_for_unit(unit_keywords),
-            'question_types': sample_question_types(),
-            'structure_analysis': {
-                'has_multiple_choice': random.choice([True, False]),
-                'has_short_answer': random.choice([True, False]),
-                'has_long_answer': True,
-                'has_calculation': unit.get('faculty_code') in ['SCI', 'ENG', 'BUS'],
-            }
+            'status': 'done',
+            'difficulty_score': paper.get('avg_difficulty_rating', 0) or result['difficulty_score'],
+            'estimated_completion_time': result['estimated_completion_time'],
+            'question_count': result['question_count'],
+            'sub_question_count': result['sub_question_count'],
+            'total_marks': result['total_marks'],
+            'topics_detected': paper.get('topics', []) or result['topics_detected'],
+            'question_types': result['question_types'],
+            'structure_analysis': result['structure_analysis'],
+            'analyzed_at': job['finished_at'].isoformat()
         }
         
-        # Update paper with detected topics if not already set
+        # Same file analyzed for another paper: fill this paper's topics too
         if not paper.get('topics'):
-            db.past_papers.update_one(
-                {"_id": ObjectId(paper_id)},
-                {"$set": {"topics": analysis['topics_detected']}}
-            )
+            apply_detected_topics(paper['_id'], result['topics_detected'])
         
         return jsonify({
             'success': True,
@@ -112,7 +113,7 @@ def predict_exam_questions(unit_id):
         if not ObjectId.is_valid(unit_id):
             return jsonify({"success": False, "error": "Invalid unit ID"}), 400
             
-        db = current_app.config['MONGO_DB']
+        db = mongo.db
         
         # Get unit
         unit = db.units.find_one({"_id": ObjectId(unit_id)})
@@ -120,20 +121,25 @@ def predict_exam_questions(unit_id):
         if not unit:
             return jsonify({"success": False, "error": "Unit not found"}), 404
             
-        # Get past papers for the unit
-        papers = list(db.past_papers.find({"unit_id": ObjectId(unit_id)}).sort("year", -1).limit(5))
+        # Topic counts are precomputed per unit (see topic_stats)
+        stats = get_unit_topic_stats(unit_id)
         
-        if not papers:
+        if not stats or not stats.get('paper_count'):
             return jsonify({"success": False, "error": "No past papers found for this unit"}), 404
             
-        # In a real implementation, this would analyze past papers and use ML/AI
-        # to predict likely exam questions
-        # For this example, we'll generate placeholder predictions
+        # Papers of the years the prediction window covers
+        years = recent_years(stats, min_papers=5)
+        papers = list(db.past_papers.find(
+            {"unit_id": ObjectId(unit_id), **year_filter(years)}, {"_id": 1}
+        ).sort("year", -1))
+        counts = recent_topic_counts(stats, min_papers=5)
+        likely_topics = list(counts)[:8]
         
         predictions = {
-            'likely_topics': predict_likely_topics(papers, unit),
-            'predicted_questions': generate_sample_questions(papers, unit),
-            'topic_frequencies': calculate_topic_frequency(papers),
+            'likely_topics': likely_topics,
+            'predicted_questions': generate_sample_questions(list(counts), unit),
+            'topic_frequencies': topic_frequencies(counts),
+            'topic_trends': topic_trends(stats),
             'confidence_score': random.uniform(0.65, 0.95),
             'based_on_papers': [str(paper['_id']) for paper in papers]
         }
@@ -150,6 +156,43 @@ def predict_exam_questions(unit_id):
         current_app.logger.error(f"Error: {str(e)}")
         return jsonify({"success": False, "error": "An error occurred"}), 500
 
+@ai.route('/topic-stats/<unit_id>', methods=['GET'])
+@token_required
+def get_topic_stats(unit_id):
+    """
+    Topic frequencies of a unit's past papers, overall and per year
+    """
+    try:
+        # Validate unit_id
+        if not ObjectId.is_valid(unit_id):
+            return jsonify({"success": False, "error": "Invalid unit ID"}), 400
+            
+        stats = get_unit_topic_stats(unit_id)
+        
+        if not stats:
+            return jsonify({"success": False, "error": "No past papers found for this unit"}), 404
+            
+        overall = {topic_name(key): count for key, count in stats.get('topics', {}).items() if count > 0}
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'unit_id': unit_id,
+                'paper_count': stats.get('paper_count', 0),
+                'topic_frequencies': topic_frequencies(dict(sorted(overall.items(), key=lambda x: x[1], reverse=True))),
+                'papers_per_year': {topic_name(year): count for year, count in stats.get('year_papers', {}).items() if count > 0},
+                'topic_trends': topic_trends(stats),
+                'updated_at': stats['updated_at'].isoformat() if stats.get('updated_at') else None
+            }
+        })
+    
+    except PyMongoError as e:
+        current_app.logger.error(f"Database error: {str(e)}")
+        return jsonify({"success": False, "error": "Database error"}), 500
+    except Exception as e:
+        current_app.logger.error(f"Error: {str(e)}")
+        return jsonify({"success": False, "error": "An error occurred"}), 500
+
 @ai.route('/generate/questions', methods=['POST'])
 @token_required
 def generate_practice_questions():
@@ -162,7 +205,7 @@ def generate_practice_questions():
     - count: Number of questions to generate (default: 5)
     """
     try:
-        db = current_app.config['MONGO_DB']
+        db = mongo.db
         data = request.json
         
         # Validate required fields
@@ -181,23 +224,23 @@ def generate_practice_questions():
             return jsonify({"success": False, "error": "Unit not found"}), 404
             
         # Get parameters
-        topics = data['topics']
+        topics = data['topics'] if isinstance(data['topics'], list) else []
         difficulty = data.get('difficulty', 'medium')
-        count = int(data.get('count', 5))
-        
-        # In a real implementation, this would use OpenAI or a local model
-        # to generate practice questions based on the topics
-        # For this example, we'll generate placeholder questions
-        
-        # Generate questions
-        open_ai_key = current_app.config.get('OPENAI_API_KEY')
-        
-        if open_ai_key:
-            # Use OpenAI to generate questions
-            questions = generate_questions_with_openai(unit, topics, difficulty, count, open_ai_key)
-        else:
-            # Use template-based generation
-            questions = generate_template_questions(unit, topics, difficulty, count)
+        try:
+            count = int(data.get('count', 5))
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "error": "Count must be a number"}), 400
+        
+        if not normalize_topics(topics):
+            return jsonify({"success": False, "error": "At least one topic is required"}), 400
+        if difficulty not in DIFFICULTY_TYPES:
+            return jsonify({"success": False, "error": "Difficulty must be easy, medium or hard"}), 400
+        max_count = current_app.config['PRACTICE_QUESTIONS_MAX_COUNT']
+        if not 1 <= count <= max_count:
+            return jsonify({"success": False, "error": f"Count must be between 1 and {max_count}"}), 400
+        
+        # Identical requests (same unit, topics, difficulty and count) share one generation
+        questions, cached = practice_questions.get(unit, topics, difficulty, count)
         
         return jsonify({
             'success': True,
@@ -209,7 +252,8 @@ def generate_practice_questions():
                     'name': unit['name']
                 },
                 'topics': topics,
-                'difficulty': difficulty
+                'difficulty': difficulty,
+                'cached': cached
             }
         })
     
@@ -229,9 +273,14 @@ def similarity_analysis():
     - paper_ids: Array of paper IDs to compare
     or
     - texts: Array of text snippets to compare
+    Optional body parameters for texts:
+    - mode: auto, dense, top_k or threshold (default: auto)
+    - k: Neighbors per text in top_k mode (default: 10)
+    - threshold: Minimum similarity (default: 0.8 in threshold mode)
+    - precision: float32 or float16 scores (default: float32)
     """
     try:
-        db = current_app.config['MONGO_DB']
+        db = mongo.db
         data = request.json
         
         # Validate input
@@ -247,57 +296,109 @@ def similarity_analysis():
                 if not ObjectId.is_valid(paper_id):
                     return jsonify({"success": False, "error": f"Invalid paper ID: {paper_id}"}), 400
             
-            # Get papers
-            papers = []
-            for paper_id in paper_ids:
-                paper = db.past_papers.find_one({"_id": ObjectId(paper_id)})
-                if paper:
-                    papers.append(paper)
+            # Get papers in request order
+            found = {
+                paper['_id']: paper
+                for paper in db.past_papers.find({"_id": {"$in": [ObjectId(p) for p in paper_ids]}})
+            }
+            papers = [found[ObjectId(p)] for p in dict.fromkeys(paper_ids) if ObjectId(p) in found]
             
             if len(papers) < 2:
                 return jsonify({"success": False, "error": "At least two valid papers are required for comparison"}), 400
-                
-            # In a real implementation, this would extract text from papers
-            # and compute semantic similarity using embeddings
-            # For this example, we'll generate a placeholder similarity matrix
             
-            # Generate similarity matrix
-            similarity_matrix = generate_similarity_matrix(len(papers))
+            # Pooled vectors are stored at upload; older papers get theirs now
+            vectors = load_paper_vectors([paper['_id'] for paper in papers])
+            for paper in papers:
+                document = vectors.get(paper['_id'])
+                if document is None or document.get('model') != current_app.config['EMBEDDING_MODEL']:
+                    vectors[paper['_id']] = compute_missing_paper_vector(paper)
+            
+            compared = [paper for paper in papers if vectors.get(paper['_id'])]
+            unavailable = [str(paper['_id']) for paper in papers if not vectors.get(paper['_id'])]
+            
+            if len(compared) < 2:
+                return jsonify({"success": False, "error": "At least two papers with extractable text are required for comparison"}), 400
+            
+            # One vectorized N x N computation over the cached vectors
+            similarity_matrix = paper_similarity_matrix([vectors[paper['_id']] for paper in compared])
             
             paper_info = [{
                 'id': str(paper['_id']),
                 'title': paper['title'],
                 'year': paper['year'],
                 'exam_type': paper['exam_type']
-            } for paper in papers]
+            } for paper in compared]
             
             return jsonify({
                 'success': True,
                 'data': {
                     'papers': paper_info,
-                    'similarity_matrix': similarity_matrix,
-                    'average_similarity': np.mean(similarity_matrix).item()
+                    'similarity_matrix': similarity_matrix.tolist(),
+                    'average_similarity': np.mean(similarity_matrix).item(),
+                    'unavailable': unavailable
                 }
             })
             
         # Process text snippets if texts provided
         else:
             texts = data['texts']
+            config = current_app.config
             
             if len(texts) < 2:
                 return jsonify({"success": False, "error": "At least two texts are required for comparison"}), 400
+            if len(texts) > config['SIMILARITY_MAX_TEXTS']:
+                return jsonify({"success": False, "error": f"At most {config['SIMILARITY_MAX_TEXTS']} texts can be compared"}), 400
+            
+            # mode: dense (full matrix), top_k (neighbors per text) or threshold (edge list);
+            # auto picks dense for small sets and top_k otherwise
+            mode = data.get('mode', 'auto')
+            if mode == 'auto':
+                mode = 'dense' if len(texts) <= config['SIMILARITY_DENSE_MAX'] else 'top_k'
+            if mode not in ('dense', 'top_k', 'threshold'):
+                return jsonify({"success": False, "error": "mode must be one of: auto, dense, top_k, threshold"}), 400
+            if mode == 'dense' and len(texts) > config['SIMILARITY_DENSE_MAX']:
+                return jsonify({"success": False, "error": f"dense mode supports at most {config['SIMILARITY_DENSE_MAX']} texts; use top_k or threshold"}), 400
+            
+            dtype = data.get('precision', 'float32')
+            if dtype not in SCORE_DTYPES:
+                return jsonify({"success": False, "error": "precision must be float32 or float16"}), 400
+            try:
+                k = int(data.get('k', 10))
+                threshold = data.get('threshold')
+                threshold = float(threshold) if threshold is not None else (0.8 if mode == 'threshold' else None)
+            except (TypeError, ValueError):
+                return jsonify({"success": False, "error": "k and threshold must be numbers"}), 400
+            if k < 1:
+                return jsonify({"success": False, "error": "k must be at least 1"}), 400
                 
             # Generate embeddings and compute similarity
             embeddings = compute_embeddings(texts)
-            similarity_matrix = compute_similarity_matrix(embeddings)
+            
+            result = {
+                'texts': [text[:100] + '...' if len(text) > 100 else text for text in texts],
+                'mode': mode,
+                'average_similarity': mean_similarity(normalize_rows(embeddings))
+            }
+            
+            if mode == 'dense':
+                similarity_matrix = compute_similarity_matrix(embeddings)
+                result['similarity_matrix'] = similarity_matrix.astype(SCORE_DTYPES[dtype]).tolist()
+            elif mode == 'top_k':
+                result['k'] = k
+                result['neighbors'] = top_k_neighbors(
+                    embeddings, k=k, threshold=threshold,
+                    block_size=config['SIMILARITY_BLOCK_SIZE'], dtype=dtype
+                )
+            else:
+                result['threshold'] = threshold
+                result['edges'], result['truncated'] = threshold_edges(
+                    embeddings, threshold=threshold, block_size=config['SIMILARITY_BLOCK_SIZE'],
+                    max_edges=config['SIMILARITY_MAX_EDGES'], dtype=dtype
+                )
             
             return jsonify({
                 'success': True,
-                'data': {
-                    'texts': [text[:100] + '...' if len(text) > 100 else text for text in texts],
-                    'similarity_matrix': similarity_matrix.tolist(),
-                    'average_similarity': np.mean(similarity_matrix).item()
-                }
+                'data': result
             })
     
     except PyMongoError as e:
@@ -309,60 +410,8 @@ def similarity_analysis():
 
 # Helper functions for AI blueprint
 
-def sample_topics_for_unit(unit_keywords):
-    """Generate sample topics based on unit keywords"""
-    all_topics = [
-        "Introduction to the subject", "Theoretical foundations", "Basic concepts",
-        "Advanced techniques", "Practical applications", "Case studies",
-        "Research methodologies", "Data analysis", "Critical evaluation",
-        "Problem solving", "Ethical considerations", "Historical development",
-        "Current trends", "Future directions", "Comparative analysis"
-    ]
-    
-    # Add unit-specific keywords if available
-    if unit_keywords:
-        topics = unit_keywords[:5]  # Use up to 5 unit keywords
-        # Add some generic topics
-        remaining = 5 - len(topics)
-        if remaining > 0:
-            topics.extend(random.sample(all_topics, remaining))
-        return topics
-    else:
-        # Use generic topics
-        return random.sample(all_topics, 5)
-
-def sample_question_types():
-    """Generate sample question types with distribution"""
-    question_types = {
-        "multiple_choice": random.randint(0, 5),
-        "short_answer": random.randint(1, 5),
-        "essay": random.randint(0, 3),
-        "calculation": random.randint(0, 5),
-        "case_study": random.randint(0, 2)
-    }
-    # Filter out types with zero questions
-    return {k: v for k, v in question_types.items() if v > 0}
-
-def predict_likely_topics(papers, unit):
-    """Predict likely topics based on past papers"""
-    # Collect all topics from past papers
-    all_topics = []
-    for paper in papers:
-        all_topics.extend(paper.get('topics', []))
-    
-    # Count topic frequencies
-    topic_counts = {}
-    for topic in all_topics:
-        topic_counts[topic] = topic_counts.get(topic, 0) + 1
-    
-    # Sort by frequency
-    sorted_topics = sorted(topic_counts.items(), key=lambda x: x[1], reverse=True)
-    
-    # Return top topics
-    return [topic for topic, count in sorted_topics[:8]]
-
-def generate_sample_questions(papers, unit):
-    """Generate sample questions based on past papers and unit"""
+def generate_sample_questions(topics, unit):
+    """Generate sample questions based on past paper topics and unit"""
     # Templates for different question types
     templates = {
         "multiple_choice": [
@@ -387,11 +436,6 @@ def generate_sample_questions(papers, unit):
         ]
     }
     
-    # Collect topics from papers
-    topics = []
-    for paper in papers:
-        topics.extend(paper.get('topics', []))
-    
     # Deduplicate topics
     unique_topics = list(set(topics))
     
@@ -444,37 +488,16 @@ def generate_sample_questions(papers, unit):
     
     return questions
 
-def calculate_topic_frequency(papers):
-    """Calculate topic frequency across papers"""
-    # Collect all topics
-    topic_counts = {}
-    for paper in papers:
-        for topic in paper.get('topics', []):
-            topic_counts[topic] = topic_counts.get(topic, 0) + 1
-    
-    # Convert to list format
-    frequency_list = [{"topic": topic, "count": count} for topic, count in topic_counts.items()]
-    
-    # Sort by count (descending)
-    frequency_list.sort(key=lambda x: x["count"], reverse=True)
-    
-    return frequency_list
-
-def generate_similarity_matrix(size):
-    """Generate a random similarity matrix"""
-    # Create a symmetric matrix with 1s on diagonal
-    matrix = np.zeros((size, size))
-    for i in range(size):
-        for j in range(i, size):
-            if i == j:
-                matrix[i, j] = 1.0
-            else:
-                # Random similarity value between 0.3 and 0.9
-                sim = random.uniform(0.3, 0.9)
-                matrix[i, j] = sim
-                matrix[j, i] = sim
-    
-    return matrix.tolist()
+def compute_missing_paper_vector(paper):
+    """Compute and store the vector of a paper uploaded before vectors existed"""
+    file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], paper['file_path'])
+    if not os.path.exists(file_path) or not file_path.lower().endswith('.pdf'):
+        return None
+    unit = mongo.db.units.find_one({"_id": paper['unit_id']}, {"faculty_code": 1, "facultyCode": 1})
+    return store_paper_vector(
+        paper, file_path, get_embedding_service().get_embeddings,
+        faculty_code=(unit.get('faculty_code') or unit.get('facultyCode')) if unit else None
+    )
 
 def compute_embeddings(texts):
     """Compute embeddings for text snippets"""
@@ -483,116 +506,5 @@ def compute_embeddings(texts):
 
 def compute_similarity_matrix(embeddings):
     """Compute similarity matrix from embeddings"""
-    return cosine_similarity(embeddings)
-
-def generate_questions_with_openai(unit, topics, difficulty, count, api_key):
-    """Generate questions using OpenAI API"""
-    openai.api_key = api_key
-    
-    # Create prompt
-    prompt = f"""Generate {count} practice questions for a university course on {unit['name']} ({unit['code']}).
-    
-Topics to focus on:
-{', '.join(topics)}
-
-Difficulty level: {difficulty}
-
-For each question, provide:
-1. The question text
-2. The question type (multiple_choice, short_answer, essay, calculation)
-3. Topic tags
-4. Difficulty rating
-5. A sample answer or solution
-
-Format each question as a JSON object."""
-
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful academic assistant that generates exam questions."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=2000
-        )
-        
-        # Extract generated text
-        generated_text = response.choices[0].message.content
-        
-        # In a real implementation, you would parse the JSON objects from the response
-        # For this example, we'll generate placeholder questions
-        questions = []
-        for i in range(count):
-            questions.append({
-                "type": random.choice(["multiple_choice", "short_answer", "essay", "calculation"]),
-                "question": f"Question {i+1} about {random.choice(topics)}",
-                "topics": [random.choice(topics)],
-                "difficulty": difficulty
-            })
-        
-        return questions
-        
-    except Exception as e:
-        current_app.logger.error(f"OpenAI API error: {str(e)}")
-        # Fall back to template-based generation
-        return generate_template_questions(unit, topics, difficulty, count)
-
-def generate_template_questions(unit, topics, difficulty, count):
-    """Generate questions using templates"""
-    # Templates for different question types
-    templates = {
-        "multiple_choice": [
-            "Which of the following best describes {topic}?",
-            "What is the primary characteristic of {topic}?",
-            "Which statement about {topic} is correct?"
-        ],
-        "short_answer": [
-            "Define {topic} and provide an example.",
-            "Explain the significance of {topic} in relation to {unit_name}.",
-            "Describe the key features of {topic}."
-        ],
-        "essay": [
-            "Critically analyze the role of {topic} in the field of {unit_name}.",
-            "Compare and contrast different approaches to {topic}.",
-            "Discuss the implications of {topic} for future developments in {unit_name}."
-        ],
-        "calculation": [
-            "Calculate the results for the following problem related to {topic}: [problem details]",
-            "Using {topic} principles, solve this equation: [equation]",
-            "Apply {topic} techniques to find the solution to this problem: [problem details]"
-        ]
-    }
-    
-    questions = []
-    for i in range(count):
-        # Select random question type based on difficulty
-        if difficulty == "easy":
-            q_types = ["multiple_choice", "short_answer"]
-        elif difficulty == "medium":
-            q_types = ["multiple_choice", "short_answer", "calculation"]
-        else:  # hard
-            q_types = ["short_answer", "essay", "calculation"]
-            
-        q_type = random.choice(q_types)
-        
-        # Select random template
-        template = random.choice(templates[q_type])
-        
-        # Select random topic
-        topic = random.choice(topics)
-        
-        # Format question
-        question = template.format(
-            topic=topic,
-            unit_name=unit['name']
-        )
-        
-        questions.append({
-            "type": q_type,
-            "question": question,
-            "topics": [topic],
-            "difficulty": difficulty
-        })
-    
-    return questions
\ No newline at end of file
+    normalized = normalize_rows(embeddings)
+    return normalized @ normalized.T
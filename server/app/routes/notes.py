@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify, current_app, send_from_directory
+from flask import Blueprint, request, jsonify, current_app, send_file
 from pymongo import MongoClient
 from bson import ObjectId
 from werkzeug.utils import secure_filename
@@ -9,14 +9,27 @@ from datetime import datetime
 from functools import wraps
 import jwt
 from qdrant_client import QdrantClient
-from qdrant_client.http.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue, PointIdsList, MatchAny
+from qdrant_client.http.models import Distance, VectorParams, Filter, FieldCondition, MatchValue, PointIdsList, MatchAny, PayloadSchemaType
 import fitz  # PyMuPDF for PDF processing
 from app import mongo, QDRANT_HOST, QDRANT_PORT
+from app.config import Config
 from app.utils.validation import (
     validate_objectid, validate_file_upload, validate_pagination,
-    validate_search_query, validate_json_body
+    validate_search_query, validate_page_ranges, validate_json_body
 )
 from app.utils.error_handler import ValidationError, NotFoundError, AuthorizationError
+from app.utils.database import BulkWriter, fetch_page, count_total, page_count
+from app.utils.projections import build_projection
+from app.utils.file_serving import send_upload, file_content_hash, cached_content_hash
+from app.services.toc import TocCollector, build_toc
+from app.services.references import extract_references
+from app.services.page_renderer import PageRenderer, RENDER_SIZES, RENDER_FORMATS
+from app.services.html_renderer import HtmlRenderer
+from app.services.note_vectors import NOTE_PAYLOAD_INDEXES
+from app.services.ingestion import (
+    iter_pdf_pages, iter_text_chunks, iter_page_chunks,
+    iter_embedded_batches, iter_chunk_points, upsert_streaming
+)
 from sentence_transformers import SentenceTransformer
 import numpy as np
 import hashlib
@@ -26,6 +39,7 @@ import pickle
 db = mongo.db
 notes_collection = db.notes
 references_collection = db.references
+tocs_collection = db.tocs
 users_collection = db.users
 
 # REMNDER: Ensure Tto implement grpc for communication with Qdrant
@@ -40,6 +54,34 @@ qdrant_client = QdrantClient(
 # Create the notes blueprint
 notes_bp = Blueprint('notes', __name__, url_prefix='/api/notes')
 
+# Page image renderer, created on first use so it picks up the app config
+_page_renderer = None
+
+
+def get_page_renderer():
+    """Return the shared PageRenderer instance"""
+    global _page_renderer
+    if _page_renderer is None:
+        _page_renderer = PageRenderer(cache_dir=current_app.config.get('PAGE_CACHE_FOLDER', 'page_cache'))
+    return _page_renderer
+
+
+# HTML rendition renderer, created on first use
+_html_renderer = None
+
+
+def get_html_renderer():
+    """Return the shared HtmlRenderer instance"""
+    global _html_renderer
+    if _html_renderer is None:
+        _html_renderer = HtmlRenderer(cache_dir=current_app.config.get('HTML_CACHE_FOLDER', 'html_cache'))
+    return _html_renderer
+
+
+def note_file_hash(note):
+    """Content hash of a note's file, falling back to hashing it for older notes"""
+    return note.get('file_hash') or cached_content_hash(note['file_path'])
+
 
 class EmbeddingService:
     """Service for generating and caching embeddings using sentence-transformers"""
@@ -171,19 +213,7 @@ def token_required(f):
 # Text chunking function
 def chunk_text(text, chunk_size=512, overlap=0.2):
     """Split text into overlapping chunks of specified size"""
-    chunks = []
-    overlap_size = int(chunk_size * overlap)
-    
-    if len(text) <= chunk_size:
-        chunks.append(text)
-    else:
-        start = 0
-        while start < len(text):
-            end = min(start + chunk_size, len(text))
-            chunks.append(text[start:end])
-            start += chunk_size - overlap_size
-            
-    return chunks
+    return [chunk for _, chunk in iter_text_chunks(text, chunk_size=chunk_size, overlap=overlap)]
 
 
 # Routes for notes
@@ -199,6 +229,9 @@ def get_notes(current_user):
         search_query = request.args.get('query', '').strip()
         unit_id = request.args.get('unit_id', '').strip()
         sort_by = request.args.get('sort_by', 'recent')
+        cursor = request.args.get('cursor', '').strip()
+        include_total = request.args.get('include_total', 'true').lower() != 'false'
+        projection = build_projection('notes.list', request.args.get('fields'))
         
         # Validate pagination
         page, limit = validate_pagination(
@@ -241,14 +274,14 @@ def get_notes(current_user):
             'za': [('title', -1)]
         }
         
-        # Get total count for pagination
-        total_count = notes_collection.count_documents(query)
+        # Get total count for pagination (estimated or cached)
+        total_count = count_total(notes_collection, query, include_total)
         
-        # Fetch notes with pagination
-        notes = list(notes_collection.find(query)
-                    .sort(sort_options.get(sort_by, sort_options['recent']))
-                    .skip((page - 1) * limit)
-                    .limit(limit))
+        # Fetch notes by page number, or after the cursor of the previous page
+        notes, next_cursor = fetch_page(
+            notes_collection, query, sort_options.get(sort_by, sort_options['recent']),
+            limit, page=page, cursor=cursor, projection=projection
+        )
         
         # Format notes for response
         formatted_notes = [format_doc(note) for note in notes]
@@ -257,11 +290,14 @@ def get_notes(current_user):
             'status': 'success',
             'data': formatted_notes,
             'total': total_count,
-            'page': page,
+            'page': None if cursor else page,
             'limit': limit,
-            'pages': (total_count + limit - 1) // limit  # Ceiling division
+            'pages': page_count(total_count, limit),
+            'next_cursor': next_cursor
         })
         
+    except ValidationError as e:
+        return jsonify({'status': 'error', 'message': e.message, 'details': e.details}), 400
     except Exception as e:
         current_app.logger.error(f"Error fetching notes: {str(e)}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
@@ -317,10 +353,13 @@ def create_note(current_user):
         unique_filename = f"{uuid.uuid4()}_{filename}"
         file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
         file.save(file_path)
-        
-        # Process the PDF to extract text and references
-        text_by_page, total_pages, references = process_pdf(file_path)
-        
+        file_hash = file_content_hash(file_path)
+
+        # Only the page count and outline are needed up front; text is streamed page by page below
+        with fitz.open(file_path) as doc:
+            total_pages = doc.page_count
+            toc_collector = TocCollector.from_document(doc)
+
         # Extract and validate unit_id if provided
         unit_id = note_data.get('unit_id')
         unit_name = note_data.get('unit_name', '')
@@ -346,6 +385,7 @@ def create_note(current_user):
             'title': note_data.get('title', filename),
             'description': note_data.get('description', ''),
             'file_path': file_path,
+            'file_hash': file_hash,
             'url': f"/api/notes/file/{unique_filename}",
             'source_name': note_data.get('source_name', ''),
             'published_at': note_data.get('published_at', datetime.now().strftime('%Y-%m-%d')),
@@ -370,26 +410,46 @@ def create_note(current_user):
         # Insert note into MongoDB
         result = notes_collection.insert_one(new_note)
         note_id = str(result.inserted_id)
-        
-        # Store the references in MongoDB
-        for ref in references:
-            ref['note_id'] = note_id
-            references_collection.insert_one(ref)
-        
+
         # Get chunking parameters from request or use defaults
         use_cache = request.form.get('use_cache', 'true').lower() == 'true'
         chunk_size = int(request.form.get('chunk_size', 512))
         overlap = float(request.form.get('overlap', 0.2))
-        
-        # Store text content in Qdrant for vector search
-        store_text_in_qdrant(
-            note_id, 
-            text_by_page, 
-            use_cache=use_cache,
-            chunk_size=chunk_size,
-            overlap=overlap
-        )
-        
+
+        try:
+            # Single streaming pass: references and headings are collected as each page goes by,
+            # and the text flows on into Qdrant without the document being held in memory
+            pages = store_page_references(toc_collector.watch(iter_pdf_pages(file_path)), note_id)
+            store_text_in_qdrant(
+                note_id,
+                pages,
+                use_cache=use_cache,
+                chunk_size=chunk_size,
+                overlap=overlap,
+                unit_id=new_note.get('unit_id')
+            )
+            store_toc(note_id, toc_collector.result())
+        except Exception:
+            # Don't leave a half-ingested note behind
+            references_collection.delete_many({'note_id': note_id})
+            tocs_collection.delete_one({'note_id': note_id})
+            notes_collection.delete_one({'_id': result.inserted_id})
+            try:
+                delete_from_qdrant(note_id)
+            except Exception:
+                pass
+            raise
+
+        # Pre-render the first pages so viewers can paint before the PDF arrives
+        try:
+            get_page_renderer().prerender(
+                note_id,
+                file_path,
+                max_pages=current_app.config.get('PAGE_PRERENDER_PAGES', 3)
+            )
+        except Exception as e:
+            current_app.logger.warning(f"Page pre-rendering failed for note {note_id}: {str(e)}")
+
         return jsonify({
             'status': 'success',
             'message': 'Note created successfully',
@@ -459,18 +519,25 @@ def delete_note(current_user, note_id):
         if str(note.get('created_by')) != str(current_user['_id']) and current_user.get('role') != 'admin':
             return jsonify({'status': 'error', 'message': 'Unauthorized to delete this note'}), 403
         
-        # Delete the file
+        # Delete the file and its HTML rendition
         if 'file_path' in note and os.path.exists(note['file_path']):
+            get_html_renderer().invalidate(note_file_hash(note))
             os.remove(note['file_path'])
             
         # Delete references from references collection
         references_collection.delete_many({'note_id': note_id})
+
+        # Delete the table of contents
+        tocs_collection.delete_one({'note_id': note_id})
         
         # Delete note from notes collection
         notes_collection.delete_one({'_id': ObjectId(note_id)})
         
         # Delete vectors from Qdrant
         delete_from_qdrant(note_id)
+
+        # Delete rendered page images
+        get_page_renderer().invalidate(note_id)
         
         return jsonify({
             'status': 'success',
@@ -486,25 +553,170 @@ def delete_note(current_user, note_id):
 def get_file(filename):
     """Serve the PDF file from the uploads folder."""
     try:
-        # Build the path to the file
-        upload_folder = os.path.abspath(current_app.config['UPLOAD_FOLDER'])
-        file_path = os.path.join(upload_folder, filename)
-        
-        # Ensure the file exists
-        if not os.path.exists(file_path):
-            return jsonify({"error": "File not found"}), 404
-
-        # Return the file with the correct MIME type for PDFs
-        return send_from_directory(
-            upload_folder,  # Folder path
-            filename,  # File name
+        # Range requests let PDF.js fetch pages on demand; ETags make repeat views a 304
+        response = send_upload(
+            filename,
             mimetype='application/pdf',  # MIME type for PDFs
             as_attachment=False  # Set True if you want the file to be downloaded
         )
+
+        # Ensure the file exists
+        if response is None:
+            return jsonify({"error": "File not found"}), 404
+
+        return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@notes_bp.route('/<note_id>/pages/<int:page_num>.<fmt>', methods=['GET'])
+def get_page_image(note_id, page_num, fmt):
+    """Serve a rendered page image, rendering and caching it on first request"""
+    try:
+        size = request.args.get('size', 'preview')
+
+        if fmt not in RENDER_FORMATS:
+            return jsonify({'status': 'error', 'message': f"Unsupported format. Allowed: {', '.join(RENDER_FORMATS)}"}), 400
+        if size not in RENDER_SIZES:
+            return jsonify({'status': 'error', 'message': f"Unsupported size. Allowed: {', '.join(RENDER_SIZES)}"}), 400
+        if not ObjectId.is_valid(note_id):
+            return jsonify({'status': 'error', 'message': 'Invalid note ID format'}), 400
+
+        note = notes_collection.find_one({'_id': ObjectId(note_id)}, {'file_path': 1})
+        if not note or not note.get('file_path') or not os.path.exists(note['file_path']):
+            return jsonify({'status': 'error', 'message': 'Note not found'}), 404
+
+        image_path = get_page_renderer().get_page_image(note_id, note['file_path'], page_num, size, fmt)
+        if image_path is None:
+            return jsonify({'status': 'error', 'message': 'Page not found'}), 404
+
+        # Note files never change after upload, so the rendered pages can be cached for good
+        response = send_file(
+            os.path.abspath(image_path),
+            mimetype=RENDER_FORMATS[fmt],
+            conditional=True,
+            max_age=current_app.config.get('PAGE_CACHE_MAX_AGE', 31536000)
+        )
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    except Exception as e:
+        current_app.logger.error(f"Error rendering page image: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+
+@notes_bp.route('/<note_id>/html', methods=['GET'])
+def get_note_html(note_id):
+    """Get HTML fragments for a range of pages, e.g. ?pages=1-3,7"""
+    try:
+        if not ObjectId.is_valid(note_id):
+            return jsonify({'status': 'error', 'message': 'Invalid note ID format'}), 400
+
+        note = notes_collection.find_one(
+            {'_id': ObjectId(note_id)},
+            {'file_path': 1, 'file_hash': 1, 'total_pages': 1}
+        )
+        if not note:
+            return jsonify({'status': 'error', 'message': 'Note not found'}), 404
+        if not note.get('file_path') or not os.path.exists(note['file_path']):
+            return jsonify({'status': 'error', 'message': 'Note file not found'}), 404
+
+        total_pages = note.get('total_pages')
+        if not total_pages:
+            with fitz.open(note['file_path']) as doc:
+                total_pages = doc.page_count
+
+        pages_spec = request.args.get('pages', '').strip()
+        if not pages_spec:
+            pages_spec = f"1-{current_app.config.get('HTML_DEFAULT_PAGES', 10)}"
+        page_numbers = validate_page_ranges(
+            pages_spec,
+            total_pages,
+            max_pages=current_app.config.get('HTML_MAX_PAGES', 50)
+        )
+
+        pages = get_html_renderer().get_pages(
+            note['file_path'],
+            note_file_hash(note),
+            page_numbers,
+            image_base=f"/api/notes/{note_id}/html/images"
+        )
+
+        return jsonify({
+            'status': 'success',
+            'note_id': note_id,
+            'total_pages': total_pages,
+            'pages': pages
+        })
+
+    except ValidationError as e:
+        return jsonify({'status': 'error', 'message': e.message, 'details': e.details}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error rendering note HTML: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+
+@notes_bp.route('/<note_id>/html/images/<image_name>', methods=['GET'])
+def get_note_html_image(note_id, image_name):
+    """Serve an image referenced by a note's HTML rendition"""
+    try:
+        if not ObjectId.is_valid(note_id):
+            return jsonify({'status': 'error', 'message': 'Invalid note ID format'}), 400
+
+        note = notes_collection.find_one({'_id': ObjectId(note_id)}, {'file_path': 1, 'file_hash': 1})
+        if not note or not note.get('file_path') or not os.path.exists(note['file_path']):
+            return jsonify({'status': 'error', 'message': 'Note not found'}), 404
+
+        image_path = get_html_renderer().image_path(note_file_hash(note), image_name)
+        if not image_path or not os.path.exists(image_path):
+            return jsonify({'status': 'error', 'message': 'Image not found'}), 404
+
+        # Image names are content hashes, so they never change
+        response = send_file(
+            os.path.abspath(image_path),
+            conditional=True,
+            max_age=current_app.config.get('PAGE_CACHE_MAX_AGE', 31536000)
+        )
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    except Exception as e:
+        current_app.logger.error(f"Error serving note HTML image: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+
+@notes_bp.route('/<note_id>/toc', methods=['GET'])
+def get_toc(note_id):
+    """Get the table of contents for a note"""
+    try:
+        if not ObjectId.is_valid(note_id):
+            return jsonify({'status': 'error', 'message': 'Invalid note ID format'}), 400
+
+        toc = tocs_collection.find_one({'note_id': note_id})
+
+        # Notes uploaded before TOCs were stored get theirs built on first request
+        if not toc:
+            note = notes_collection.find_one({'_id': ObjectId(note_id)}, {'file_path': 1})
+            if not note:
+                return jsonify({'status': 'error', 'message': 'Note not found'}), 404
+            if not note.get('file_path') or not os.path.exists(note['file_path']):
+                return jsonify({'status': 'error', 'message': 'Note file not found'}), 404
+            toc = store_toc(note_id, build_toc(note['file_path']))
+
+        return jsonify({
+            'status': 'success',
+            'note_id': note_id,
+            'source': toc['source'],
+            'toc': toc['entries']
+        })
+
+    except Exception as e:
+        current_app.logger.error(f"Error fetching table of contents: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+
 @notes_bp.route('/references/<note_id>', methods=['GET'])
 def get_references(note_id):
     """Get all references for a note"""
@@ -576,6 +788,7 @@ def search_notes():
         note_id = request.args.get('note_id')
         limit = int(request.args.get('limit', 20))
         use_cache = request.args.get('use_cache', 'true').lower() == 'true'
+        projection = build_projection('notes.search', request.args.get('fields'))
         
         if not query:
             return jsonify({'status': 'error', 'message': 'Query parameter is required'}), 400
@@ -589,16 +802,14 @@ def search_notes():
             use_cache=use_cache
         )
         
-        # Get note information for results
+        # Get note information for results, in one query
         note_ids = set(result['note_id'] for result in search_results)
         notes_map = {}
         
-        for note_id in note_ids:
-            note = notes_collection.find_one({'_id': ObjectId(note_id)})
-            if note:
-                formatted_note = format_doc(note)
-                formatted_note['matches'] = []
-                notes_map[note_id] = formatted_note
+        for note in notes_collection.find({'_id': {'$in': [ObjectId(id) for id in note_ids]}}, projection):
+            formatted_note = format_doc(note)
+            formatted_note['matches'] = []
+            notes_map[formatted_note['_id']] = formatted_note
         
         # Group matches by note
         for result in search_results:
@@ -631,6 +842,8 @@ def search_notes():
             'results': notes_list
         })
         
+    except ValidationError as e:
+        return jsonify({'status': 'error', 'message': e.message, 'details': e.details}), 400
     except Exception as e:
         current_app.logger.error(f"Error searching notes: {str(e)}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
@@ -643,33 +856,12 @@ def process_pdf(file_path):
     try:
         text_by_page = {}
         references = []
+        total_pages = 0
         
-        # Open the PDF
-        doc = fitz.open(file_path)
-        total_pages = len(doc)
-        
-        # Process each page
-        for page_num, page in enumerate(doc, 1):
-            # Extract text from the page
-            text = page.get_text()
+        for page_num, text in iter_pdf_pages(file_path):
             text_by_page[page_num] = text
-            
-            # Look for potential references (citations, footnotes, etc.)
-            # This is a basic implementation - you might want to use more sophisticated methods
-            lines = text.split('\n')
-            for i, line in enumerate(lines):
-                # Simple heuristic for references: starts with a number or [X] pattern
-                if (line.strip().startswith('[') and ']' in line) or \
-                   (line.strip() and line.strip()[0].isdigit() and '.' in line[:5]):
-                    
-                    # Create a reference entry
-                    reference = {
-                        'pageNumber': page_num,
-                        'text': line.strip(),
-                        'title': f"Reference on page {page_num}",
-                        'created_at': datetime.now()
-                    }
-                    references.append(reference)
+            references.extend(extract_page_references(text, page_num))
+            total_pages = page_num
         
         return text_by_page, total_pages, references
         
@@ -678,14 +870,54 @@ def process_pdf(file_path):
         raise
 
 
-def store_text_in_qdrant(note_id, text_by_page, use_cache=True, chunk_size=512, overlap=0.2):
-    """Store extracted text in Qdrant for vector search with text chunking"""
+def extract_page_references(text, page_num):
+    """Detect potential references (citations, footnotes, etc.) on a single page"""
+    return extract_references(text, page_num)
+
+
+def store_page_references(pages, note_id):
+    """Pass (page_num, text) pairs through, storing each page's references on the way"""
+    with BulkWriter(references_collection) as writer:
+        for page_num, text in pages:
+            for ref in extract_page_references(text, page_num):
+                ref['note_id'] = note_id
+                writer.insert(ref)
+            
+            yield page_num, text
+    
+    if writer.write_errors:
+        current_app.logger.error(
+            f"{len(writer.write_errors)} references for note {note_id} could not be stored"
+        )
+
+
+def store_toc(note_id, toc):
+    """Save a note's table of contents, replacing any previous one"""
+    document = {
+        'note_id': note_id,
+        'source': toc['source'],
+        'entries': toc['entries'],
+        'updated_at': datetime.now()
+    }
+    tocs_collection.replace_one({'note_id': note_id}, document, upsert=True)
+    return document
+
+
+def store_text_in_qdrant(note_id, text_by_page, use_cache=True, chunk_size=512, overlap=0.2, unit_id=None):
+    """
+    Store extracted text in Qdrant for vector search with text chunking
+    
+    `text_by_page` may be a {page_num: text} dict or any iterable of
+    (page_num, text) pairs; pages are chunked, embedded and upserted as a
+    stream so peak memory does not grow with the size of the document.
+    Chunks carry the note's unit_id so searches can filter by unit.
+    """
     try:
         # Initialize embedding service
         embedding_service = EmbeddingService(use_cache=use_cache)
         
         # Check if collection exists, create if it doesn't
-        collection_name = "notes_content"
+        collection_name = Config.NOTES_COLLECTION
         collections = qdrant_client.get_collections().collections
         collection_exists = any(c.name == collection_name for c in collections)
         
@@ -698,51 +930,28 @@ def store_text_in_qdrant(note_id, text_by_page, use_cache=True, chunk_size=512,
                 collection_name=collection_name,
                 vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE)
             )
+            for field in NOTE_PAYLOAD_INDEXES:
+                qdrant_client.create_payload_index(collection_name, field, field_schema=PayloadSchemaType.KEYWORD)
         
-        # Store each page's text as chunks
-        points = []
+        pages = text_by_page.items() if isinstance(text_by_page, dict) else text_by_page
         
-        for page_num, text in text_by_page.items():
-            # Chunk the text
-            chunks = chunk_text(text, chunk_size=chunk_size, overlap=overlap)
-            
-            # Generate embeddings for all chunks
-            chunk_embeddings = embedding_service.get_embeddings(chunks)
-            
-            for i, (chunk, embedding) in enumerate(zip(chunks, chunk_embeddings)):
-                # Generate a UUID for the point ID
-                point_id = str(uuid.uuid4())
-                
-                # Extract a brief context around the chunk to provide more information
-                start_pos = text.find(chunk)
-                context_start = max(0, start_pos - 50)
-                context_end = min(len(text), start_pos + len(chunk) + 50)
-                context = text[context_start:context_end]
-                
-                point = PointStruct(
-                    id=point_id,
-                    vector=embedding.tolist(),  # Convert numpy array to list
-                    payload={
-                        "note_id": note_id,
-                        "page": page_num,
-                        "chunk_index": i,
-                        "text": chunk,
-                        "context": context,
-                        "chunk_position": start_pos,
-                        "collection_name": collection_name,
-                        "point_id": point_id
-                    }
-                )
-                points.append(point)
-        
-        # Upsert points to Qdrant in batches of 100
-        batch_size = 100
-        for i in range(0, len(points), batch_size):
-            batch = points[i:i+batch_size]
-            qdrant_client.upsert(
-                collection_name=collection_name,
-                points=batch
-            )
+        # pages -> chunks -> embedding batches -> points, all lazily evaluated
+        chunks = iter_page_chunks(pages, chunk_size=chunk_size, overlap=overlap)
+        embedded_batches = iter_embedded_batches(
+            chunks,
+            embedding_service.get_embeddings,
+            batch_size=current_app.config.get('INGEST_EMBED_BATCH_SIZE', 64)
+        )
+        points = iter_chunk_points(note_id, embedded_batches, collection_name=collection_name, unit_id=unit_id)
+        
+        # Upsert batches with a bounded number in flight
+        upsert_streaming(
+            qdrant_client,
+            collection_name,
+            points,
+            batch_size=current_app.config.get('INGEST_UPSERT_BATCH_SIZE', 100),
+            max_in_flight=current_app.config.get('INGEST_MAX_IN_FLIGHT', 2)
+        )
         
         return True
         
@@ -795,7 +1004,7 @@ def perform_vector_search(query, unit_id=None, note_id=None, limit=20, use_cache
         
         # Perform the search
         search_result = qdrant_client.search(
-            collection_name="notes_content",
+            collection_name=Config.NOTES_COLLECTION,
             query_vector=query_embedding.tolist(),
             limit=limit,
             query_filter=search_filter
@@ -822,7 +1031,7 @@ def perform_vector_search(query, unit_id=None, note_id=None, limit=20, use_cache
 def delete_from_qdrant(note_id):
     """Delete a note's vectors from Qdrant"""
     try:
-        collection_name = "notes_content"
+        collection_name = Config.NOTES_COLLECTION
         
         # Build the filter for the note_id
         search_filter = Filter(
@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify, current_app, g, send_file
+from flask import Blueprint, request, jsonify, current_app, g
 from bson.objectid import ObjectId
 from datetime import datetime
 from pymongo.errors import PyMongoError
@@ -7,9 +7,46 @@ import os
 import uuid
 from werkzeug.utils import secure_filename
 from app import mongo
+from app.utils.database import fetch_page, count_total, page_count
+from app.utils.projections import selected_fields
+from app.utils.error_handler import ValidationError
+from app.utils.file_serving import send_upload, file_content_hash
+from app.services.paper_analysis import request_paper_analysis
+from app.services.topic_stats import apply_paper_change
+from app.services.search_tokens import search_filter, paper_search_tokens
 
 pastpapers = Blueprint('pastpapers', __name__, url_prefix='/api/pastpapers')
 
+# Most questions accepted by one batch import
+MAX_BATCH_QUESTIONS = 200
+
+# Question processor (loads the embedding model), created on first use
+_question_processor = None
+
+def get_question_processor():
+    """Return the shared QuestionProcessingService instance"""
+    global _question_processor
+    if _question_processor is None:
+        from app.services.question_processing import QuestionProcessingService
+        _question_processor = QuestionProcessingService()
+    return _question_processor
+
+def format_paper_summary(paper, fields):
+    """List entry of a paper with the selected fields"""
+    summary = {'id': str(paper['_id'])}
+    for field in fields:
+        value = paper.get(field)
+        if field == 'unit_id' and value is not None:
+            value = str(value)
+        elif field == 'topics':
+            value = value or []
+        elif field == 'avg_difficulty_rating':
+            value = value or 0
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        summary[field] = value
+    return summary
+
 # Helper function to check allowed file extensions
 def allowed_file(filename):
     ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx'}
@@ -32,6 +69,9 @@ def get_papers():
     - order: Sort order (asc or desc, default: desc)
     - page: Page number (default: 1)
     - limit: Number of papers per page (default: 20)
+    - cursor: next_cursor of the previous page (instead of page)
+    - include_total: 'false' to skip the total and page count
+    - fields: Comma-separated fields to return (default: the list profile)
     """
     try:
         db = mongo.db
@@ -49,6 +89,9 @@ def get_papers():
         order = request.args.get('order', 'desc')
         page = int(request.args.get('page', 1))
         limit = int(request.args.get('limit', 20))
+        cursor = request.args.get('cursor')
+        include_total = request.args.get('include_total', 'true').lower() != 'false'
+        fields = selected_fields('pastpapers.list', request.args.get('fields'))
         
         # Build query
         query = {}
@@ -75,49 +118,37 @@ def get_papers():
             query['difficulty'] = difficulty
             
         if search:
-            query['$or'] = [
-                {'title': {'$regex': search, '$options': 'i'}},
-                {'topics': {'$in': [{'$regex': search, '$options': 'i'}]}}
-            ]
+            # Indexed prefix search over title and topics
+            search_query = search_filter(search)
+            if search_query is None:
+                return jsonify({"success": False, "error": "Search query has no words"}), 400
+            query.update(search_query)
         
         # Determine sort direction
         sort_direction = -1 if order.lower() == 'desc' else 1
         
-        # Execute query with pagination
-        papers = db.past_papers.find(query).sort(sort, sort_direction).skip((page - 1) * limit).limit(limit)
-        total = db.past_papers.count_documents(query)
+        # Execute query by page number, or after the cursor of the previous page
+        papers, next_cursor = fetch_page(db.past_papers, query, [(sort, sort_direction)], limit,
+                                         page=page, cursor=cursor, projection={'_id': 1, **{f: 1 for f in fields}})
+        total = count_total(db.past_papers, query, include_total)
         
         # Convert to list and format response
-        papers_list = []
-        for paper in papers:
-            papers_list.append({
-                'id': str(paper['_id']),
-                'title': paper['title'],
-                'unit_id': str(paper['unit_id']),
-                'unit_code': paper['unit_code'],
-                'unit_name': paper['unit_name'],
-                'year': paper['year'],
-                'exam_type': paper['exam_type'],
-                'semester': paper['semester'],
-                'faculty_code': paper['faculty_code'],
-                'faculty': paper['faculty'],
-                'difficulty': paper['difficulty'],
-                'topics': paper.get('topics', []),
-                'avg_difficulty_rating': paper.get('avg_difficulty_rating', 0),
-                'created_at': paper['created_at'].isoformat() if 'created_at' in paper else None
-            })
+        papers_list = [format_paper_summary(paper, fields) for paper in papers]
         
         return jsonify({
             'success': True,
             'data': papers_list,
             'pagination': {
-                'page': page,
+                'page': None if cursor else page,
                 'limit': limit,
                 'total': total,
-                'pages': (total + limit - 1) // limit
+                'pages': page_count(total, limit),
+                'next_cursor': next_cursor
             }
         })
     
+    except ValidationError as e:
+        return jsonify({"success": False, "error": e.message, "details": e.details}), 400
     except PyMongoError as e:
         current_app.logger.error(f"Database error: {str(e)}")
         return jsonify({"success": False, "error": "Database error"}), 500
@@ -193,17 +224,19 @@ def download_paper(paper_id):
         if not paper:
             return jsonify({"success": False, "error": "Paper not found"}), 404
             
-        # Check if file exists
-        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], paper['file_path'])
-        if not os.path.exists(file_path):
-            return jsonify({"success": False, "error": "File not found"}), 404
-            
-        # Return file
-        return send_file(
-            file_path,
+        # Return file (conditional and range-aware)
+        response = send_upload(
+            paper['file_path'],
             as_attachment=True,
-            download_name=os.path.basename(paper['file_path'])
+            download_name=os.path.basename(paper['file_path']),
+            file_hash=paper.get('file_hash')
         )
+
+        # Check if file exists
+        if response is None:
+            return jsonify({"success": False, "error": "File not found"}), 404
+
+        return response
     
     except PyMongoError as e:
         current_app.logger.error(f"Database error: {str(e)}")
@@ -281,6 +314,7 @@ def upload_paper():
         # Save file
         file_path = os.path.join(upload_dir, unique_filename)
         file.save(file_path)
+        file_hash = file_content_hash(file_path)
         
         # Create paper document
         new_paper = {
@@ -294,15 +328,35 @@ def upload_paper():
             "faculty_code": unit['faculty_code'],
             "faculty": unit['faculty'],
             "file_path": os.path.join('papers', unique_filename),
+            "file_hash": file_hash,
             "difficulty": difficulty,
             "topics": topics,
             "difficulty_ratings": [],
             "avg_difficulty_rating": 0,
             "created_at": datetime.utcnow()
         }
+        new_paper["search_tokens"] = paper_search_tokens(new_paper)
         
         # Insert paper
         result = db.past_papers.insert_one(new_paper)
+        new_paper['_id'] = result.inserted_id
+        apply_paper_change(None, new_paper)
+        
+        # Pooled paper vector for similarity analysis (non-fatal; computed on demand otherwise)
+        if file_path.lower().endswith('.pdf'):
+            try:
+                from app.services.embedding_service import get_embedding_service
+                from app.services.paper_vectors import store_paper_vector
+                store_paper_vector(new_paper, file_path, get_embedding_service().get_embeddings,
+                                   faculty_code=unit.get('faculty_code'))
+            except Exception as e:
+                current_app.logger.warning(f"Could not compute paper vector: {str(e)}")
+        
+        # Queue the paper analysis (reused if this file was analyzed before)
+        try:
+            request_paper_analysis(new_paper, file_path, file_hash, unit.get('faculty_code'))
+        except Exception as e:
+            current_app.logger.warning(f"Could not queue paper analysis: {str(e)}")
         
         # Return uploaded paper
         paper_data = {
@@ -373,6 +427,9 @@ def update_paper(paper_id):
         if not update_data:
             return jsonify({"success": False, "error": "No valid fields to update"}), 400
         
+        if 'title' in update_data or 'topics' in update_data:
+            update_data['search_tokens'] = paper_search_tokens({**existing_paper, **update_data})
+        
         # Update paper
         result = db.past_papers.update_one(
             {"_id": ObjectId(paper_id)},
@@ -385,6 +442,10 @@ def update_paper(paper_id):
         # Get updated paper
         updated_paper = db.past_papers.find_one({"_id": ObjectId(paper_id)})
         
+        # Keep the unit's topic statistics in step
+        if 'topics' in update_data or 'year' in update_data:
+            apply_paper_change(existing_paper, updated_paper)
+        
         # Format response
         paper_data = {
             'id': str(updated_paper['_id']),
@@ -416,6 +477,87 @@ def update_paper(paper_id):
         current_app.logger.error(f"Error: {str(e)}")
         return jsonify({"success": False, "error": "An error occurred"}), 500
 
+@pastpapers.route('/<paper_id>/questions', methods=['POST'])
+@token_required
+def import_paper_questions(paper_id):
+    """
+    Import the questions of a past paper in one batch
+    Required body parameters:
+    - questions: Array of question texts (or objects with a "text" field)
+    Optional body parameters:
+    - threshold: Similarity above which a question joins an existing group (default: 0.85)
+    """
+    try:
+        # Validate paper_id
+        if not ObjectId.is_valid(paper_id):
+            return jsonify({"success": False, "error": "Invalid paper ID"}), 400
+            
+        db = mongo.db
+        data = request.get_json(silent=True) or {}
+        
+        questions = data.get('questions')
+        if not isinstance(questions, list) or not questions:
+            return jsonify({"success": False, "error": "questions must be a non-empty array"}), 400
+        if len(questions) > MAX_BATCH_QUESTIONS:
+            return jsonify({"success": False, "error": f"At most {MAX_BATCH_QUESTIONS} questions per request"}), 400
+            
+        texts = [q.get('text', '') if isinstance(q, dict) else q for q in questions]
+        if not all(isinstance(text, str) for text in texts):
+            return jsonify({"success": False, "error": "Each question must be a string or have a text field"}), 400
+            
+        try:
+            threshold = float(data.get('threshold', 0.85))
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "error": "threshold must be a number"}), 400
+        
+        # Check if paper exists
+        paper = db.past_papers.find_one({"_id": ObjectId(paper_id)}, {"unit_id": 1, "year": 1, "exam_type": 1})
+        if not paper:
+            return jsonify({"success": False, "error": "Paper not found"}), 404
+        
+        source_type = 'cat' if str(paper.get('exam_type', '')).lower() == 'cat' else 'exam'
+        results = get_question_processor().process_questions_batch(
+            texts,
+            str(paper['unit_id']),
+            source_type,
+            paper_id,
+            year=paper.get('year'),
+            threshold=threshold
+        )
+        
+        # Format response
+        questions_data = [
+            {
+                'id': str(question['_id']),
+                'text': question['text'],
+                'group_id': question['group_id'],
+                'frequency': question['frequency'],
+                'related_notes': [
+                    {
+                        'note_id': str(note.note_id),
+                        'title': note.title,
+                        'similarity': float(note.similarity),
+                        'chunks': note.chunks
+                    }
+                    for note in related_notes
+                ]
+            }
+            for question, related_notes in results
+        ]
+        
+        return jsonify({
+            'success': True,
+            'message': f'{len(questions_data)} questions imported',
+            'data': questions_data
+        }), 201
+    
+    except PyMongoError as e:
+        current_app.logger.error(f"Database error: {str(e)}")
+        return jsonify({"success": False, "error": "Database error"}), 500
+    except Exception as e:
+        current_app.logger.error(f"Error: {str(e)}")
+        return jsonify({"success": False, "error": "An error occurred"}), 500
+
 @pastpapers.route('/unit/<unit_id>', methods=['GET'])
 def get_papers_by_unit(unit_id):
     """
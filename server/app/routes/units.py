@@ -12,6 +12,11 @@ from werkzeug.utils import secure_filename
 
 # Import auth decorators
 from .auth import token_required, role_required
+from app.utils.database import fetch_page, count_total, page_count
+from app.utils.projections import build_projection
+from app.utils.error_handler import ValidationError
+from app.services.topic_tagger import topic_taggers
+from app.services.search_tokens import SEARCH_FIELDS, search_filter, unit_search_tokens
 
 # Initialize MongoDB client
 db = mongo.db
@@ -47,6 +52,9 @@ def get_units():
         search_query = request.args.get('query')
         page = int(request.args.get('page', 1))
         limit = int(request.args.get('limit', 20))
+        cursor = request.args.get('cursor')
+        include_total = request.args.get('include_total', 'true').lower() != 'false'
+        projection = build_projection('units.list', request.args.get('fields'))
         
         # Build the query
         query = {}
@@ -55,21 +63,18 @@ def get_units():
             query['facultyCode'] = faculty
         
         if search_query:
-            # Text search
-            query['$or'] = [
-                {'name': {'$regex': search_query, '$options': 'i'}},
-                {'code': {'$regex': search_query, '$options': 'i'}},
-                {'description': {'$regex': search_query, '$options': 'i'}}
-            ]
-        
-        # Get total count for pagination
-        total_count = units_collection.count_documents(query)
-        
-        # Fetch units with pagination
-        units = list(units_collection.find(query)
-                    .sort('code', 1)
-                    .skip((page - 1) * limit)
-                    .limit(limit))
+            # Indexed prefix search over name, code and description
+            search = search_filter(search_query)
+            if search is None:
+                return jsonify({'status': 'error', 'message': 'Search query has no words'}), 400
+            query.update(search)
+        
+        # Get total count for pagination (estimated or cached)
+        total_count = count_total(units_collection, query, include_total)
+        
+        # Fetch units by page number, or after the cursor of the previous page
+        units, next_cursor = fetch_page(units_collection, query, 'code', limit, page=page, cursor=cursor,
+                                        projection=projection)
         
         # Format units for response
         formatted_units = [format_doc(unit) for unit in units]
@@ -78,11 +83,14 @@ def get_units():
             'status': 'success',
             'units': formatted_units,
             'total': total_count,
-            'page': page,
+            'page': None if cursor else page,
             'limit': limit,
-            'pages': (total_count + limit - 1) // limit  # Ceiling division
+            'pages': page_count(total_count, limit),
+            'next_cursor': next_cursor
         })
         
+    except ValidationError as e:
+        return jsonify({'status': 'error', 'message': e.message, 'details': e.details}), 400
     except Exception as e:
         current_app.logger.error(f"Error fetching units: {str(e)}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
@@ -91,7 +99,7 @@ def get_units():
 def get_unit(unit_id):
     """Get a specific unit by ID"""
     try:
-        unit = units_collection.find_one({'_id': ObjectId(unit_id)})
+        unit = units_collection.find_one({'_id': ObjectId(unit_id)}, {'search_tokens': 0})
         if not unit:
             return jsonify({'status': 'error', 'message': 'Unit not found'}), 404
         
@@ -197,11 +205,16 @@ def create_unit(current_user):
             'created_at': datetime.now(),
             'created_by': str(current_user['_id']),
         }
+        new_unit['search_tokens'] = unit_search_tokens(new_unit)
         
         # Insert unit into database
         result = units_collection.insert_one(new_unit)
         unit_id = str(result.inserted_id)
         
+        # Keywords feed the topic vocabularies
+        if new_unit.get('keywords'):
+            topic_taggers.invalidate()
+        
         current_app.logger.info(f"Successfully created unit with ID: {unit_id}")
         
         return jsonify({
@@ -245,6 +258,8 @@ def update_unit(current_user, unit_id):
         update_data = {k: v for k, v in data.items() if k in allowed_fields}
         update_data['updated_at'] = datetime.now()
         update_data['updated_by'] = str(current_user['_id'])
+        if any(field in update_data for field in SEARCH_FIELDS['units']):
+            update_data['search_tokens'] = unit_search_tokens({**unit, **update_data})
         
         # Update the unit
         units_collection.update_one(
@@ -252,6 +267,10 @@ def update_unit(current_user, unit_id):
             {'$set': update_data}
         )
         
+        # Keywords feed the topic vocabularies
+        if 'keywords' in update_data:
+            topic_taggers.invalidate()
+        
         return jsonify({
             'status': 'success',
             'message': 'Unit updated successfully'
@@ -290,18 +309,19 @@ def get_units_by_faculty(faculty_code):
     try:
         page = int(request.args.get('page', 1))
         limit = int(request.args.get('limit', 20))
+        cursor = request.args.get('cursor')
+        include_total = request.args.get('include_total', 'true').lower() != 'false'
+        projection = build_projection('units.list', request.args.get('fields'))
         
         # Query units by faculty code
         query = {'facultyCode': faculty_code}
         
-        # Get total count for pagination
-        total_count = units_collection.count_documents(query)
+        # Get total count for pagination (estimated or cached)
+        total_count = count_total(units_collection, query, include_total)
         
-        # Fetch units with pagination
-        units = list(units_collection.find(query)
-                    .sort('code', 1)
-                    .skip((page - 1) * limit)
-                    .limit(limit))
+        # Fetch units by page number, or after the cursor of the previous page
+        units, next_cursor = fetch_page(units_collection, query, 'code', limit, page=page, cursor=cursor,
+                                        projection=projection)
         
         # Format units for response
         formatted_units = [format_doc(unit) for unit in units]
@@ -310,11 +330,14 @@ def get_units_by_faculty(faculty_code):
             'status': 'success',
             'units': formatted_units,
             'total': total_count,
-            'page': page,
+            'page': None if cursor else page,
             'limit': limit,
-            'pages': (total_count + limit - 1) // limit  # Ceiling division
+            'pages': page_count(total_count, limit),
+            'next_cursor': next_cursor
         })
         
+    except ValidationError as e:
+        return jsonify({'status': 'error', 'message': e.message, 'details': e.details}), 400
     except Exception as e:
         current_app.logger.error(f"Error fetching units by faculty: {str(e)}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
\ No newline at end of file
@@ -1,11 +1,21 @@
 # app/services/embedding_service.py
+import logging
+from collections import namedtuple
 import numpy as np
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 from app import mongo
 from app.config import Config
+from app.services.question_index import question_index, note_index
+from app.services.note_vectors import search_note_chunks, search_note_chunks_batch
+from app.services.question_clustering import group_unit_questions
+from app.services.question_vectors import get_question_vector_store
 from bson import ObjectId
 
+logger = logging.getLogger(__name__)
+
+# A note related to a question, with its best matching chunks
+RelatedNote = namedtuple('RelatedNote', ['note_id', 'similarity', 'title', 'chunks'])
+
 class EmbeddingService:
     def __init__(self):
         self.model = SentenceTransformer(Config.EMBEDDING_MODEL)
@@ -18,116 +28,127 @@ class EmbeddingService:
         """Generate embeddings for multiple texts"""
         return self.model.encode(texts).tolist()
     
-    def find_similar_questions(self, question_text, unit_id, threshold=0.85):
-        """Find similar questions using embeddings"""
+    def find_similar_questions(self, question_text, unit_id, threshold=0.85, scope='unit', embedding=None):
+        """
+        Find similar questions using embeddings
+        
+        scope='unit' compares against the cached matrix of the unit's questions;
+        scope='global' queries the archive-wide question index across all units.
+        Pass `embedding` if the text has already been encoded.
+        """
         # Get embedding for the new question
-        question_embedding = self.get_embedding(question_text)
-        
-        # Get all questions for the unit
-        questions = list(mongo.db.questions.find({'unit_id': ObjectId(unit_id)}))
-        
-        if not questions:
+        question_embedding = embedding if embedding is not None else self.get_embedding(question_text)
+        
+        if scope == 'global':
+            store = get_question_vector_store()
+            if store is None:
+                return None, question_embedding
+            matches = store.search(question_embedding, limit=1, threshold=threshold)
+            if matches:
+                return ObjectId(matches[0]['question_id']), question_embedding
             return None, question_embedding
         
-        # Extract embeddings from existing questions
-        existing_embeddings = []
-        for q in questions:
-            if 'embedding' in q and q['embedding']:
-                existing_embeddings.append((q['_id'], q['embedding']))
-        
-        if not existing_embeddings:
-            return None, question_embedding
-        
-        # Compare embeddings
-        max_similarity = 0
-        most_similar_question = None
-        
-        for q_id, emb in existing_embeddings:
-            similarity = cosine_similarity(
-                [question_embedding], 
-                [emb]
-            )[0][0]
-            
-            if similarity > max_similarity:
-                max_similarity = similarity
-                most_similar_question = q_id
+        # One matrix-vector product against every question in the unit
+        most_similar_question, max_similarity = question_index.get(unit_id).best_match(question_embedding)
         
         # If similarity is above threshold, return the most similar question
-        if max_similarity >= threshold:
+        if most_similar_question is not None and max_similarity >= threshold:
             return most_similar_question, question_embedding
         
         return None, question_embedding
     
-    def find_related_notes(self, question_text, unit_id, top_k=3):
-        """Find note sections related to a question"""
-        # Get embedding for the question
+    def find_top_similar_questions(self, question_text, unit_id=None, top_k=5, scope='unit'):
+        """Return [(question_id, similarity), ...] for the most similar questions"""
         question_embedding = self.get_embedding(question_text)
         
-        # Get all notes for the unit
-        notes = list(mongo.db.notes.find({'unit_id': ObjectId(unit_id)}))
+        if scope == 'global':
+            store = get_question_vector_store()
+            if store is None:
+                return []
+            matches = store.search(question_embedding, limit=top_k)
+            return [(ObjectId(m['question_id']), m['similarity_score']) for m in matches]
         
-        if not notes:
-            return []
+        return question_index.get(unit_id).top_k(question_embedding, top_k)
+    
+    def find_related_notes(self, question_text, unit_id, top_k=3, chunks_per_note=2, embedding=None):
+        """
+        Find notes related to a question
+        
+        Queries the note chunk vector index filtered by unit, so the cost does
+        not grow with the unit's note library. If the index can't be reached
+        (or has nothing for the unit), falls back to the cached matrix of the
+        unit's note embeddings.
+        
+        Returns:
+            list: RelatedNote(note_id, similarity, title, chunks), best first;
+            chunks is empty for matrix fallback results
+        """
+        question_embedding = embedding if embedding is not None else self.get_embedding(question_text)
+        return self.find_related_notes_batch([question_embedding], unit_id, top_k, chunks_per_note)[0]
+    
+    def find_related_notes_batch(self, embeddings, unit_id, top_k=3, chunks_per_note=2):
+        """
+        find_related_notes for several already-encoded questions
         
-        # Extract embeddings from notes
-        note_embeddings = []
-        for note in notes:
-            if 'embeddings' in note and note['embeddings']:
-                note_embeddings.append((note['_id'], note['embeddings'], note['title']))
+        The vector index is queried once for the whole batch; the fallback is a
+        single matrix product against the unit's note matrix.
         
-        if not note_embeddings:
+        Returns:
+            list: One list of RelatedNote per embedding
+        """
+        if not len(embeddings):
             return []
         
-        # Compare embeddings and find top-k most similar notes
-        similarities = []
-        
-        for note_id, emb, title in note_embeddings:
-            similarity = cosine_similarity(
-                [question_embedding], 
-                [emb]
-            )[0][0]
-            similarities.append((note_id, similarity, title))
-        
-        # Sort by similarity (descending)
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        
-        # Return top-k results
-        return similarities[:top_k]
+        try:
+            if len(embeddings) == 1:
+                matches = [search_note_chunks(embeddings[0], unit_id, top_k=top_k, chunks_per_note=chunks_per_note)]
+            else:
+                matches = search_note_chunks_batch(embeddings, unit_id, top_k=top_k, chunks_per_note=chunks_per_note)
+        except Exception as e:
+            logger.warning(f"Note vector search failed for unit {unit_id}, using cached matrix: {str(e)}")
+            matches = [[] for _ in embeddings]
+        
+        if any(matches):
+            ranked = [
+                [(ObjectId(m['note_id']), m['similarity_score'], m['chunks']) for m in row]
+                for row in matches
+            ]
+        else:
+            ranked = [
+                [(note_id, score, []) for note_id, score in row]
+                for row in note_index.get(unit_id).batch_top_k(np.asarray(embeddings), top_k)
+            ]
+        
+        # Titles for the winners only, in one query
+        note_ids = {note_id for row in ranked for note_id, _, _ in row}
+        if not note_ids:
+            return [[] for _ in ranked]
+        titles = {
+            note['_id']: note.get('title', '')
+            for note in mongo.db.notes.find({'_id': {'$in': list(note_ids)}}, {'title': 1})
+        }
+        
+        return [
+            [RelatedNote(note_id, score, titles[note_id], chunks) for note_id, score, chunks in row if note_id in titles]
+            for row in ranked
+        ]
     
-    def group_similar_questions(self, unit_id, threshold=0.85):
-        """Group similar questions together"""
-        questions = list(mongo.db.questions.find({'unit_id': ObjectId(unit_id)}))
-        
-        if not questions:
-            return
-        
-        # Questions without a group will be assigned to a new group
-        ungrouped = [q for q in questions if not q.get('group_id')]
-        
-        for i, q1 in enumerate(ungrouped):
-            # Skip if this question was assigned to a group in a previous iteration
-            if mongo.db.questions.find_one({'_id': q1['_id']}).get('group_id'):
-                continue
-                
-            # Create a new group ID for this question
-            group_id = str(ObjectId())
-            mongo.db.questions.update_one(
-                {'_id': q1['_id']},
-                {'$set': {'group_id': group_id}}
-            )
-            
-            # Find similar questions and assign them to the same group
-            for j in range(i+1, len(ungrouped)):
-                q2 = ungrouped[j]
-                
-                if q1['embedding'] and q2['embedding']:
-                    similarity = cosine_similarity(
-                        [q1['embedding']], 
-                        [q2['embedding']]
-                    )[0][0]
-                    
-                    if similarity >= threshold:
-                        mongo.db.questions.update_one(
-                            {'_id': q2['_id']},
-                            {'$set': {'group_id': group_id}}
-                        )
+    def group_similar_questions(self, unit_id, threshold=0.85, incremental=False):
+        """
+        Group similar questions together
+        
+        Uses blocked matrix similarity and union-find (see question_clustering);
+        with incremental=True only questions without a group are placed.
+        """
+        return group_unit_questions(unit_id, threshold=threshold, incremental=incremental)
+
+
+_embedding_service = None
+
+
+def get_embedding_service():
+    """Return the shared EmbeddingService (the model is loaded once per process)"""
+    global _embedding_service
+    if _embedding_service is None:
+        _embedding_service = EmbeddingService()
+    return _embedding_service
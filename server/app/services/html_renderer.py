@@ -0,0 +1,202 @@
+# app/services/html_renderer.py
+import os
+import html
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+# Fragments are cached with this placeholder in image URLs, so one cached
+# rendition can be served under any note that shares the same file
+IMAGE_URL_PLACEHOLDER = '{{image_base}}'
+
+# Words that mark a short block as a minor heading
+MINOR_HEADING_PREFIXES = ('topic', 'subject', 'theme')
+
+
+def _atomic_write(path, data):
+    """Write bytes to path via a temp file and rename"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def block_to_html(text):
+    """Convert one text block into an escaped HTML element"""
+    clean_text = text.strip()
+    if not clean_text:
+        return None
+
+    escaped = html.escape(clean_text)
+
+    # Short lines ending in a colon or in capitals are headings
+    if len(clean_text) < 60 and (clean_text.endswith(':') or clean_text.isupper()):
+        return f"<h1>{escaped}</h1>"
+    if len(clean_text) < 100 and clean_text.lower().startswith(MINOR_HEADING_PREFIXES):
+        return f"<h3>{escaped}</h3>"
+    return f"<p>{escaped}</p>"
+
+
+class HtmlRenderer:
+    """
+    Render PDF pages to lightweight HTML fragments for text-first reading
+
+    Fragments and images are cached on disk under the hash of the PDF file:
+        <cache_dir>/<file_hash>/pages/<page>.html
+        <cache_dir>/<file_hash>/images/<content hash>.<ext>
+        <cache_dir>/<file_hash>/images.json   (xref -> image file name)
+
+    Images are written once per distinct content, however many pages or
+    xrefs use them.
+    """
+
+    def __init__(self, cache_dir='html_cache', lock_stripes=64):
+        """Initialize the renderer with its cache directory"""
+        self.cache_dir = cache_dir
+        # Renders of one file share its image manifest and are serialized;
+        # different files map to different locks and render in parallel
+        self._locks = [threading.Lock() for _ in range(lock_stripes)]
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _file_lock(self, file_hash):
+        return self._locks[int(hashlib.md5(file_hash.encode()).hexdigest(), 16) % len(self._locks)]
+
+    def _document_dir(self, file_hash):
+        return os.path.join(self.cache_dir, file_hash)
+
+    def page_path(self, file_hash, page_num):
+        """Location of a cached page fragment"""
+        return os.path.join(self._document_dir(file_hash), 'pages', f"{page_num}.html")
+
+    def image_path(self, file_hash, image_name):
+        """Location of a cached image, or None for names that aren't plain file names"""
+        if os.path.basename(image_name) != image_name or image_name.startswith('.'):
+            return None
+        return os.path.join(self._document_dir(file_hash), 'images', image_name)
+
+    def get_pages(self, file_path, file_hash, page_numbers, image_base=''):
+        """
+        Return HTML fragments for the requested pages, rendering any that aren't cached
+
+        Args:
+            file_path (str): Path to the source PDF
+            file_hash (str): Content hash of the PDF, used as the cache key
+            page_numbers (list): 1-based page numbers
+            image_base (str): URL prefix for image sources
+
+        Returns:
+            list: [{'page': n, 'html': fragment}, ...] in the requested order
+        """
+        fragments = {}
+        missing = []
+
+        for page_num in page_numbers:
+            path = self.page_path(file_hash, page_num)
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    fragments[page_num] = f.read()
+            else:
+                missing.append(page_num)
+
+        if missing:
+            fragments.update(self._render_pages(file_path, file_hash, missing))
+
+        return [
+            {'page': page_num, 'html': fragments[page_num].replace(IMAGE_URL_PLACEHOLDER, image_base)}
+            for page_num in page_numbers
+            if page_num in fragments
+        ]
+
+    def invalidate(self, file_hash):
+        """Remove the cached rendition of a file"""
+        shutil.rmtree(self._document_dir(file_hash), ignore_errors=True)
+
+    def _render_pages(self, file_path, file_hash, page_numbers):
+        """Render and cache the given pages in one open of the document"""
+        rendered = {}
+
+        # The xref manifest is shared by every page of the file; one writer per file at a time
+        with self._file_lock(file_hash), fitz.open(file_path) as doc:
+            manifest_path = os.path.join(self._document_dir(file_hash), 'images.json')
+            manifest = self._load_manifest(manifest_path)
+            manifest_size = len(manifest)
+
+            for page_num in page_numbers:
+                if page_num < 1 or page_num > doc.page_count:
+                    continue
+                fragment = self._render_page(doc, doc[page_num - 1], page_num, file_hash, manifest)
+                _atomic_write(self.page_path(file_hash, page_num), fragment.encode('utf-8'))
+                rendered[page_num] = fragment
+
+            if len(manifest) != manifest_size:
+                _atomic_write(manifest_path, json.dumps(manifest).encode('utf-8'))
+
+        return rendered
+
+    def _render_page(self, doc, page, page_num, file_hash, manifest):
+        """Build one page fragment with a list-join"""
+        parts = [f'<section class="pdf-page" data-page="{page_num}">']
+
+        for img_index, img in enumerate(page.get_images(full=True)):
+            image_name = self._store_image(doc, img[0], file_hash, manifest)
+            if image_name:
+                parts.append(
+                    f'<img src="{IMAGE_URL_PLACEHOLDER}/{image_name}" '
+                    f'alt="Image {img_index + 1} on page {page_num}" loading="lazy">'
+                )
+
+        for block in page.get_text("blocks"):
+            element = block_to_html(block[4])
+            if element:
+                parts.append(element)
+
+        parts.append('</section>')
+        return '\n'.join(parts)
+
+    def _store_image(self, doc, xref, file_hash, manifest):
+        """Write an image once per distinct content and return its file name"""
+        key = str(xref)
+        if key in manifest:
+            return manifest[key]
+
+        try:
+            image = doc.extract_image(xref)
+        except Exception as e:
+            logger.warning(f"Could not extract image xref {xref}: {str(e)}")
+            image = None
+
+        if not image or not image.get('image'):
+            manifest[key] = None
+            return None
+
+        data = image['image']
+        image_name = f"{hashlib.sha1(data).hexdigest()}.{image.get('ext', 'png')}"
+        path = self.image_path(file_hash, image_name)
+        if not os.path.exists(path):
+            _atomic_write(path, data)
+
+        manifest[key] = image_name
+        return image_name
+
+    @staticmethod
+    def _load_manifest(path):
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
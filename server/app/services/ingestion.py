@@ -0,0 +1,136 @@
+# app/services/ingestion.py
+import uuid
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import fitz  # PyMuPDF
+from qdrant_client.http.models import PointStruct
+
+logger = logging.getLogger(__name__)
+
+# Streaming ingestion pipeline: pages -> chunks -> embedding batches -> upsert batches.
+# Every stage is a generator, so at any moment only the current page, one embedding
+# batch and at most `max_in_flight` upsert batches are held in memory, regardless of
+# how many pages the document has.
+
+
+def iter_pdf_pages(file_path):
+    """Yield (page_num, text) pairs one page at a time"""
+    doc = fitz.open(file_path)
+    try:
+        for page_num, page in enumerate(doc, 1):
+            yield page_num, page.get_text()
+    finally:
+        doc.close()
+
+
+def iter_text_chunks(text, chunk_size=512, overlap=0.2):
+    """Yield (start, chunk) pairs of overlapping chunks of the given size"""
+    if len(text) <= chunk_size:
+        yield 0, text
+        return
+
+    step = max(chunk_size - int(chunk_size * overlap), 1)
+    for start in range(0, len(text), step):
+        yield start, text[start:start + chunk_size]
+
+
+def iter_page_chunks(pages, chunk_size=512, overlap=0.2, context_size=50):
+    """
+    Split a stream of (page_num, text) pairs into chunk records
+
+    Args:
+        pages: Iterable of (page_num, text) pairs
+        chunk_size (int): Maximum characters per chunk
+        overlap (float): Fraction of a chunk shared with the next one
+        context_size (int): Characters of surrounding text kept as context
+
+    Yields:
+        dict: Chunk record with page, chunk_index, text, context and chunk_position
+    """
+    for page_num, text in pages:
+        for chunk_index, (start, chunk) in enumerate(iter_text_chunks(text, chunk_size, overlap)):
+            context_start = max(0, start - context_size)
+            context_end = min(len(text), start + len(chunk) + context_size)
+            yield {
+                'page': page_num,
+                'chunk_index': chunk_index,
+                'text': chunk,
+                'context': text[context_start:context_end],
+                'chunk_position': start
+            }
+
+
+def iter_batches(iterable, batch_size):
+    """Yield lists of at most batch_size items from any iterable"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, max(batch_size, 1)))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_embedded_batches(chunks, encode, batch_size=64):
+    """Encode chunk records in fixed-size batches, yielding (chunk_batch, vectors)"""
+    for batch in iter_batches(chunks, batch_size):
+        yield batch, encode([chunk['text'] for chunk in batch])
+
+
+def iter_chunk_points(note_id, embedded_batches, collection_name='notes_content', unit_id=None):
+    """Turn embedded chunk batches into Qdrant points"""
+    for batch, vectors in embedded_batches:
+        for chunk, vector in zip(batch, vectors):
+            point_id = str(uuid.uuid4())
+            yield PointStruct(
+                id=point_id,
+                vector=vector.tolist() if hasattr(vector, 'tolist') else list(vector),
+                payload={
+                    "note_id": note_id,
+                    "unit_id": str(unit_id) if unit_id else None,
+                    "page": chunk['page'],
+                    "chunk_index": chunk['chunk_index'],
+                    "text": chunk['text'],
+                    "context": chunk['context'],
+                    "chunk_position": chunk['chunk_position'],
+                    "collection_name": collection_name,
+                    "point_id": point_id
+                }
+            )
+
+
+def upsert_streaming(client, collection_name, points, batch_size=100, max_in_flight=2):
+    """
+    Upsert a stream of points in batches with a bounded in-flight window
+
+    Upserts run on background threads while the caller keeps producing the
+    next batch (extraction and encoding overlap with network I/O). Once
+    `max_in_flight` batches are pending, the producer blocks on the oldest one,
+    which caps memory at roughly (max_in_flight + 1) * batch_size points.
+
+    Returns:
+        int: Number of points upserted
+    """
+    max_in_flight = max(max_in_flight, 1)
+    total = 0
+    pending = deque()
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for batch in iter_batches(points, batch_size):
+            if len(pending) >= max_in_flight:
+                pending.popleft().result()
+
+            pending.append(executor.submit(
+                client.upsert,
+                collection_name=collection_name,
+                points=batch
+            ))
+            total += len(batch)
+
+        # Drain the window so errors surface before we report success
+        while pending:
+            pending.popleft().result()
+
+    logger.info(f"Upserted {total} points into {collection_name}")
+    return total
@@ -0,0 +1,142 @@
+# app/services/note_vectors.py
+import logging
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import Filter, FieldCondition, MatchValue, PayloadSchemaType, QueryRequest
+from app import mongo, QDRANT_HOST, QDRANT_PORT
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Payload fields of the note chunk collection that searches filter or group on
+NOTE_PAYLOAD_INDEXES = ('note_id', 'unit_id')
+
+_notes_client = None
+
+
+def get_notes_client():
+    """Return the shared Qdrant client for note chunks, created on first use"""
+    global _notes_client
+    if _notes_client is None:
+        _notes_client = QdrantClient(host=QDRANT_HOST, port=int(QDRANT_PORT))
+    return _notes_client
+
+
+def search_note_chunks(embedding, unit_id, top_k=3, chunks_per_note=2, client=None,
+                       collection_name=None):
+    """
+    Find the notes of a unit whose chunks best match an embedding
+
+    Chunks are grouped by note_id inside Qdrant, so one query returns the
+    top-k notes with their best chunks regardless of how many notes the unit has.
+
+    Returns:
+        list: [{'note_id', 'similarity_score', 'chunks': [{'text', 'page', 'similarity_score'}]}],
+        best note first
+    """
+    client = client or get_notes_client()
+    response = client.query_points_groups(
+        collection_name=collection_name or Config.NOTES_COLLECTION,
+        group_by='note_id',
+        query=embedding.tolist() if hasattr(embedding, 'tolist') else list(embedding),
+        query_filter=Filter(must=[FieldCondition(key='unit_id', match=MatchValue(value=str(unit_id)))]),
+        limit=top_k,
+        group_size=chunks_per_note,
+        with_payload=['text', 'page']
+    )
+
+    return [
+        {
+            'note_id': group.id,
+            'similarity_score': group.hits[0].score,
+            'chunks': [
+                {
+                    'text': hit.payload.get('text'),
+                    'page': hit.payload.get('page'),
+                    'similarity_score': hit.score
+                }
+                for hit in group.hits
+            ]
+        }
+        for group in response.groups if group.hits
+    ]
+
+
+def _group_hits(points, top_k, chunks_per_note):
+    """Collapse chunk hits (best first) into the top_k notes with their best chunks"""
+    notes = {}
+    for point in points:
+        note_id = point.payload.get('note_id')
+        note = notes.get(note_id)
+        if note is None:
+            if len(notes) == top_k:
+                continue
+            note = notes[note_id] = {'note_id': note_id, 'similarity_score': point.score, 'chunks': []}
+        if len(note['chunks']) < chunks_per_note:
+            note['chunks'].append({
+                'text': point.payload.get('text'),
+                'page': point.payload.get('page'),
+                'similarity_score': point.score
+            })
+    return list(notes.values())
+
+
+def search_note_chunks_batch(embeddings, unit_id, top_k=3, chunks_per_note=2, oversample=4,
+                             client=None, collection_name=None):
+    """
+    search_note_chunks for many embeddings in a single round trip
+
+    Qdrant can't group a batch query, so each query fetches
+    top_k * chunks_per_note * oversample chunks and they are grouped here.
+
+    Returns:
+        list: One search_note_chunks-style result list per embedding
+    """
+    client = client or get_notes_client()
+    unit_filter = Filter(must=[FieldCondition(key='unit_id', match=MatchValue(value=str(unit_id)))])
+    requests = [
+        QueryRequest(
+            query=embedding.tolist() if hasattr(embedding, 'tolist') else list(embedding),
+            filter=unit_filter,
+            limit=top_k * chunks_per_note * oversample,
+            with_payload=['note_id', 'text', 'page']
+        )
+        for embedding in embeddings
+    ]
+    if not requests:
+        return []
+
+    responses = client.query_batch_points(
+        collection_name=collection_name or Config.NOTES_COLLECTION,
+        requests=requests
+    )
+    return [_group_hits(response.points, top_k, chunks_per_note) for response in responses]
+
+
+def backfill_note_units(client=None, collection_name=None):
+    """
+    Copy each note's unit_id onto its chunks
+
+    Chunks stored before unit_id was part of the payload can't be found by a
+    unit filter until this has run. Also creates the payload indexes.
+
+    Returns:
+        int: Number of notes updated
+    """
+    client = client or get_notes_client()
+    collection_name = collection_name or Config.NOTES_COLLECTION
+
+    for field in NOTE_PAYLOAD_INDEXES:
+        client.create_payload_index(collection_name, field, field_schema=PayloadSchemaType.KEYWORD)
+
+    updated = 0
+    for note in mongo.db.notes.find({'unit_id': {'$nin': [None, '']}}, {'unit_id': 1}):
+        client.set_payload(
+            collection_name=collection_name,
+            payload={'unit_id': str(note['unit_id'])},
+            points=Filter(must=[FieldCondition(key='note_id', match=MatchValue(value=str(note['_id'])))]),
+            wait=False
+        )
+        updated += 1
+
+    logger.info(f"Set unit_id on the chunks of {updated} notes in {collection_name}")
+    return updated
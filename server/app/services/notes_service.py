@@ -3,6 +3,7 @@ from pymongo import MongoClient, DESCENDING, ASCENDING
 from bson import ObjectId
 from datetime import datetime
 import os
+from app.utils.database import fetch_page, count_total, page_count
 
 class NotesService:
     """Service class for handling notes operations with MongoDB"""
@@ -15,30 +16,6 @@ class NotesService:
         self.references_collection = self.db['references']
         self.bookmarks_collection = self.db['bookmarks']
         self.highlights_collection = self.db['highlights']
-        
-        # Create indexes for better query performance
-        self._create_indexes()
-    
-    def _create_indexes(self):
-        """Create MongoDB indexes for better query performance"""
-        # Notes collection indexes
-        self.notes_collection.create_index([('title', 'text'), ('description', 'text')])
-        self.notes_collection.create_index([('facultyCode', ASCENDING)])
-        self.notes_collection.create_index([('type', ASCENDING)])
-        self.notes_collection.create_index([('unit_id', ASCENDING)])
-        self.notes_collection.create_index([('published_at', DESCENDING)])
-        
-        # References collection indexes
-        self.references_collection.create_index([('note_id', ASCENDING)])
-        self.references_collection.create_index([('pageNumber', ASCENDING)])
-        
-        # Bookmarks collection indexes
-        self.bookmarks_collection.create_index([('user_id', ASCENDING)])
-        self.bookmarks_collection.create_index([('note_id', ASCENDING)])
-        
-        # Highlights collection indexes
-        self.highlights_collection.create_index([('user_id', ASCENDING)])
-        self.highlights_collection.create_index([('note_id', ASCENDING)])
     
     def _format_doc(self, doc):
         """Convert MongoDB ObjectId to string and handle date formatting"""
@@ -55,8 +32,8 @@ class NotesService:
         
         return result
     
-    def get_all_notes(self, filters=None, sort_by='recent', page=1, limit=20):
-        """Get all notes with optional filtering and pagination"""
+    def get_all_notes(self, filters=None, sort_by='recent', page=1, limit=20, cursor=None, include_total=True):
+        """Get all notes with optional filtering and pagination (by page or next_cursor)"""
         query = filters or {}
         
         # Define sorting options
@@ -67,14 +44,13 @@ class NotesService:
             'za': [('title', DESCENDING)]
         }
         
-        # Count total documents for pagination
-        total = self.notes_collection.count_documents(query)
+        # Count total documents for pagination (estimated or cached)
+        total = count_total(self.notes_collection, query, include_total)
         
-        # Get notes with pagination
-        notes = list(self.notes_collection.find(query)
-                    .sort(sort_options.get(sort_by, sort_options['recent']))
-                    .skip((page - 1) * limit)
-                    .limit(limit))
+        # Get notes by page number, or after the cursor of the previous page
+        notes, next_cursor = fetch_page(self.notes_collection, query,
+                                        sort_options.get(sort_by, sort_options['recent']),
+                                        limit, page=page, cursor=cursor)
         
         # Format notes
         formatted_notes = [self._format_doc(note) for note in notes]
@@ -82,9 +58,10 @@ class NotesService:
         return {
             'notes': formatted_notes,
             'total': total,
-            'page': page,
+            'page': None if cursor else page,
             'limit': limit,
-            'pages': (total + limit - 1) // limit  # Ceiling division
+            'pages': page_count(total, limit),
+            'next_cursor': next_cursor
         }
     
     def get_note_by_id(self, note_id):
@@ -0,0 +1,119 @@
+# app/services/page_renderer.py
+import os
+import shutil
+import logging
+import tempfile
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+# Zoom factors relative to 72 dpi; thumb is sized for sidebars and list cards,
+# preview for a phone-width first paint, large for zoomed reading
+RENDER_SIZES = {
+    'thumb': 0.3,
+    'preview': 1.0,
+    'large': 2.0
+}
+
+# Output formats and their MIME types
+RENDER_FORMATS = {
+    'webp': 'image/webp',
+    'png': 'image/png'
+}
+
+
+class PageRenderer:
+    """Render PDF pages to cached WebP/PNG images"""
+
+    def __init__(self, cache_dir='page_cache', webp_quality=75):
+        """Initialize the renderer with its cache directory"""
+        self.cache_dir = cache_dir
+        self.webp_quality = webp_quality
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def cache_path(self, note_id, page_num, size='preview', fmt='webp'):
+        """Location of a rendered page in the cache"""
+        return os.path.join(self.cache_dir, str(note_id), size, f"{page_num}.{fmt}")
+
+    def get_page_image(self, note_id, file_path, page_num, size='preview', fmt='webp'):
+        """
+        Return the path of a rendered page image, rendering it on a cache miss
+
+        Args:
+            note_id (str): ID of the note the PDF belongs to
+            file_path (str): Path to the source PDF
+            page_num (int): 1-based page number
+            size (str): One of RENDER_SIZES
+            fmt (str): One of RENDER_FORMATS
+
+        Returns:
+            str: Path to the cached image, or None if the page doesn't exist
+        """
+        if size not in RENDER_SIZES:
+            raise ValueError(f"Unknown size '{size}'. Allowed sizes: {', '.join(RENDER_SIZES)}")
+        if fmt not in RENDER_FORMATS:
+            raise ValueError(f"Unknown format '{fmt}'. Allowed formats: {', '.join(RENDER_FORMATS)}")
+
+        path = self.cache_path(note_id, page_num, size, fmt)
+        if os.path.exists(path):
+            return path
+
+        with fitz.open(file_path) as doc:
+            if page_num < 1 or page_num > doc.page_count:
+                return None
+            self._render(doc[page_num - 1], path, size, fmt)
+
+        return path
+
+    def prerender(self, note_id, file_path, max_pages=3, sizes=('thumb', 'preview'), fmt='webp'):
+        """
+        Render the first pages of a document at upload time
+
+        The rest of the pages are rendered lazily by get_page_image, so upload
+        cost stays bounded for long documents.
+
+        Returns:
+            int: Number of images written
+        """
+        rendered = 0
+        with fitz.open(file_path) as doc:
+            for page_index in range(min(max_pages, doc.page_count)):
+                page = doc[page_index]
+                for size in sizes:
+                    path = self.cache_path(note_id, page_index + 1, size, fmt)
+                    if not os.path.exists(path):
+                        self._render(page, path, size, fmt)
+                        rendered += 1
+
+        return rendered
+
+    def invalidate(self, note_id):
+        """Remove every cached image for a note"""
+        shutil.rmtree(os.path.join(self.cache_dir, str(note_id)), ignore_errors=True)
+
+    def _render(self, page, path, size, fmt):
+        """Rasterize a page and write it to the cache atomically"""
+        zoom = RENDER_SIZES[size]
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+
+        if fmt == 'webp':
+            # PyMuPDF has no native WebP encoder, so hand the pixels to Pillow
+            data = pixmap.pil_tobytes(format='WEBP', quality=self.webp_quality, method=4)
+        else:
+            data = pixmap.tobytes('png')
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        # Write to a temp file and rename, so concurrent readers never see a partial image
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        logger.debug(f"Rendered {path} ({len(data)} bytes)")
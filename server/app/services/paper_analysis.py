@@ -0,0 +1,256 @@
+# app/services/paper_analysis.py
+# Past paper analysis, computed once per file content and cached in `analyses`
+#
+# Analyses are keyed by (file_hash, faculty_code, version): re-uploads of the
+# same file reuse the stored result, and bumping ANALYSIS_VERSION recomputes
+# everything. Work runs on a small background thread pool; callers get the
+# job document back and poll until its status is 'done'.
+
+import re
+import uuid
+import logging
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app import mongo
+from app.config import Config
+from app.services.ingestion import iter_pdf_pages
+from app.services.topic_tagger import get_topic_tagger
+from app.services.topic_stats import apply_paper_change
+from app.services.search_tokens import paper_search_tokens
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_VERSION = 1
+
+# Job states
+PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+
+# Start of a main question: "QUESTION ONE", "Question 2", "Q3", "4." / "4)"
+QUESTION_START = re.compile(
+    r'^\s*(?:QUESTION\s+(?:\d+|[A-Z]+)\b|Q\s*\d+\b|\d{1,2}[.)]\s)',
+    re.IGNORECASE | re.MULTILINE
+)
+SUB_QUESTION = re.compile(r'^\s*\(?(?:[a-h]|i{1,3}|iv|v|vi{0,3})\)\s', re.IGNORECASE | re.MULTILINE)
+CHOICE_LINE = re.compile(r'^\s*\(?[A-D][.)]\s', re.MULTILINE)
+MARKS = re.compile(r'[\[(]\s*(\d{1,3})\s*(?:marks?|mks?)\s*[\])]', re.IGNORECASE)
+DURATION = re.compile(r'\b(?:time|duration)\s*(?:allowed)?\s*[:\-]?\s*(\d+(?:\.\d+)?)\s*(hours?|hrs?|minutes?|mins?)\b', re.IGNORECASE)
+
+# Verbs that suggest each question type; a question can have several types
+QUESTION_TYPE_PATTERNS = {
+    'calculation': re.compile(r'\b(?:calculate|compute|determine the value|solve|find the value|evaluate \d)', re.IGNORECASE),
+    'essay': re.compile(r'\b(?:discuss|critically|evaluate|assess|to what extent|justify)\b', re.IGNORECASE),
+    'short_answer': re.compile(r'\b(?:define|state|list|name|outline|identify|explain briefly)\b', re.IGNORECASE),
+    'case_study': re.compile(r'\bcase\s+study\b', re.IGNORECASE)
+}
+COMPLEX_VERBS = re.compile(
+    r'\b(?:analy[sz]e|evaluate|compare|contrast|design|develop|implement|optimi[sz]e|critically|justify)\b',
+    re.IGNORECASE
+)
+
+
+def split_questions(text):
+    """Main question segments of a paper's text (the whole text if none are found)"""
+    starts = [match.start() for match in QUESTION_START.finditer(text)]
+    if not starts:
+        return [text] if text.strip() else []
+    return [text[start:end] for start, end in zip(starts, starts[1:] + [len(text)])]
+
+
+def question_difficulty(segment):
+    """1-5 difficulty of one question from its length and the verbs it uses"""
+    words = len(segment.split())
+    score = 2.0 + min(len(COMPLEX_VERBS.findall(segment)), 3) * 0.6 + min(words / 150, 1.0)
+    return min(score, 5.0)
+
+
+def analyze_text(pages, faculty_code=None):
+    """
+    Analyze the text of a paper
+
+    Args:
+        pages (list): Text of every page
+        faculty_code (str): Faculty whose topic vocabulary is used
+
+    Returns:
+        dict: Question count, types, marks, estimated time, difficulty,
+        structure flags and topics
+    """
+    text = '\n'.join(pages)
+    segments = split_questions(text)
+
+    question_types = {}
+    for segment in segments:
+        for name, pattern in QUESTION_TYPE_PATTERNS.items():
+            if pattern.search(segment):
+                question_types[name] = question_types.get(name, 0) + 1
+    if len(CHOICE_LINE.findall(text)) >= 3:
+        question_types['multiple_choice'] = max(len(CHOICE_LINE.findall(text)) // 4, 1)
+
+    total_marks = sum(int(m) for m in MARKS.findall(text))
+
+    duration = DURATION.search(text)
+    if duration:
+        amount = float(duration.group(1))
+        minutes = int(amount * 60) if duration.group(2).lower().startswith('h') else int(amount)
+    else:
+        # Roughly a minute and a half per mark, or 20 minutes per question
+        minutes = int(total_marks * 1.5) if total_marks else len(segments) * 20
+
+    difficulties = [question_difficulty(segment) for segment in segments]
+
+    return {
+        'question_count': len(segments),
+        'sub_question_count': len(SUB_QUESTION.findall(text)),
+        'total_marks': total_marks,
+        'estimated_completion_time': minutes,
+        'difficulty_score': round(sum(difficulties) / len(difficulties), 2) if difficulties else None,
+        'question_types': question_types,
+        'structure_analysis': {
+            'has_multiple_choice': 'multiple_choice' in question_types,
+            'has_short_answer': 'short_answer' in question_types,
+            'has_long_answer': 'essay' in question_types or any(len(s.split()) > 80 for s in segments),
+            'has_calculation': 'calculation' in question_types
+        },
+        'topics_detected': list(get_topic_tagger(faculty_code).count(pages))[:10],
+        'page_count': len(pages)
+    }
+
+
+def analysis_key(file_hash, faculty_code=None):
+    """Filter identifying the analysis of one file content"""
+    return {'file_hash': file_hash, 'faculty_code': faculty_code, 'version': ANALYSIS_VERSION}
+
+
+class AnalysisRunner:
+    """Runs analyses on a bounded background thread pool, at most once per key"""
+
+    def __init__(self, max_workers=2):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='analysis')
+            return self._executor
+
+    def request(self, app, paper, file_path, file_hash, faculty_code=None):
+        """
+        Return the analysis job for a paper's file, queueing it if needed
+
+        A finished analysis is returned as is. A pending or running one is
+        returned unless it has been stuck longer than ANALYSIS_JOB_TIMEOUT.
+        Failed analyses are retried up to ANALYSIS_MAX_ATTEMPTS times.
+        """
+        collection = mongo.db.analyses
+        key = analysis_key(file_hash, faculty_code)
+        job = collection.find_one(key)
+
+        if job:
+            if job['status'] == DONE:
+                return job
+            stale_before = datetime.utcnow() - timedelta(seconds=Config.ANALYSIS_JOB_TIMEOUT)
+            if job['status'] in (PENDING, RUNNING) and job['updated_at'] > stale_before:
+                return job
+            if job['status'] == FAILED and job.get('attempts', 0) >= Config.ANALYSIS_MAX_ATTEMPTS:
+                return job
+
+            # Claim the retry; another worker may have claimed it first
+            job = collection.find_one_and_update(
+                {'_id': job['_id'], 'updated_at': job['updated_at']},
+                {'$set': {'status': PENDING, 'updated_at': datetime.utcnow()}},
+                return_document=ReturnDocument.AFTER
+            )
+            if job is None:
+                return collection.find_one(key)
+        else:
+            job = dict(key, status=PENDING, attempts=0, result=None, error=None,
+                       paper_id=paper['_id'], created_at=datetime.utcnow(), updated_at=datetime.utcnow())
+            try:
+                job['_id'] = collection.insert_one(job).inserted_id
+            except DuplicateKeyError:
+                return collection.find_one(key)
+
+        self._get_executor().submit(self._run, app, job['_id'], paper['_id'], file_path, faculty_code)
+        return job
+
+    def _run(self, app, job_id, paper_id, file_path, faculty_code):
+        """
+        Worker: analyze the file and store the result on the job
+
+        The run owns the job through its run_id and refreshes updated_at while
+        it works, so a long analysis isn't taken for stuck and queued again.
+        If another run took the job over anyway, this one's result is dropped.
+        """
+        with app.app_context():
+            collection = mongo.db.analyses
+            owned = {'_id': job_id, 'run_id': uuid.uuid4().hex}
+            collection.update_one(
+                {'_id': job_id},
+                {'$set': {'status': RUNNING, 'run_id': owned['run_id'],
+                          'started_at': datetime.utcnow(), 'updated_at': datetime.utcnow()},
+                 '$inc': {'attempts': 1}}
+            )
+            stop = threading.Event()
+            threading.Thread(target=self._heartbeat, args=(collection, owned, stop), daemon=True).start()
+            try:
+                if not file_path.lower().endswith('.pdf'):
+                    raise ValueError('Only PDF papers can be analyzed')
+                pages = [text for _, text in iter_pdf_pages(file_path)]
+                result = analyze_text(pages, faculty_code)
+            except Exception as e:
+                logger.error(f"Analysis of paper {paper_id} failed: {str(e)}")
+                collection.update_one(
+                    owned,
+                    {'$set': {'status': FAILED, 'error': str(e), 'updated_at': datetime.utcnow()}}
+                )
+                return
+            finally:
+                stop.set()
+
+            finished = collection.update_one(
+                owned,
+                {'$set': {'status': DONE, 'result': result, 'error': None,
+                          'finished_at': datetime.utcnow(), 'updated_at': datetime.utcnow()}}
+            )
+            if finished.matched_count == 0:
+                logger.warning(f"Analysis of paper {paper_id} was taken over by another run; result dropped")
+                return
+            apply_detected_topics(paper_id, result['topics_detected'])
+
+    @staticmethod
+    def _heartbeat(collection, owned, stop):
+        """Refresh updated_at of a running job until stop is set"""
+        interval = max(Config.ANALYSIS_JOB_TIMEOUT / 3, 1)
+        while not stop.wait(interval):
+            try:
+                collection.update_one(owned, {'$set': {'updated_at': datetime.utcnow()}})
+            except Exception as e:
+                logger.warning(f"Analysis heartbeat failed: {str(e)}")
+
+
+def apply_detected_topics(paper_id, topics):
+    """Fill a paper's topics from its analysis if it has none yet"""
+    if not topics:
+        return
+    paper = mongo.db.past_papers.find_one_and_update(
+        {'_id': paper_id, '$or': [{'topics': {'$exists': False}}, {'topics': {'$size': 0}}, {'topics': None}]},
+        {'$set': {'topics': topics}}
+    )
+    if paper:
+        updated = {**paper, 'topics': topics}
+        mongo.db.past_papers.update_one({'_id': paper_id}, {'$set': {'search_tokens': paper_search_tokens(updated)}})
+        apply_paper_change(paper, updated)
+
+
+analysis_runner = AnalysisRunner(max_workers=Config.ANALYSIS_WORKERS)
+
+
+def request_paper_analysis(paper, file_path, file_hash, faculty_code=None):
+    """Shared-runner shortcut; must be called inside an app context"""
+    from flask import current_app
+    return analysis_runner.request(current_app._get_current_object(), paper, file_path, file_hash, faculty_code)
@@ -0,0 +1,126 @@
+# app/services/paper_vectors.py
+import logging
+from datetime import datetime
+import numpy as np
+from bson import ObjectId
+from app import mongo
+from app.config import Config
+from app.services.ingestion import iter_pdf_pages, iter_page_chunks, iter_embedded_batches
+from app.services.question_index import normalize_rows
+from app.services.topic_tagger import get_topic_tagger
+from app.utils.embeddings import encode_embedding, decode_embedding
+
+logger = logging.getLogger(__name__)
+
+# Share of the paper similarity that comes from topic overlap
+TOPIC_WEIGHT = 0.2
+
+
+def compute_paper_vector(file_path, encode, faculty_code=None, batch_size=64):
+    """
+    Pool a paper's chunk embeddings into fixed-size vectors
+
+    Chunks are encoded in batches and folded into a running sum and maximum,
+    so the paper's chunk matrix is never held in memory. Topics are counted
+    per page with the faculty's tagger.
+
+    Args:
+        file_path (str): Path to the PDF
+        encode: Callable mapping a list of texts to embeddings
+        faculty_code (str): Faculty whose topic vocabulary is used
+
+    Returns:
+        dict: mean and max pooled embeddings, {topic: pages} and chunk count,
+        or None if the paper has no text
+    """
+    pages = []
+
+    def remember(pages_iter):
+        for page_num, text in pages_iter:
+            pages.append(text)
+            yield page_num, text
+
+    chunks = (c for c in iter_page_chunks(remember(iter_pdf_pages(file_path))) if c['text'].strip())
+
+    total = None
+    maximum = None
+    count = 0
+    for _, vectors in iter_embedded_batches(chunks, encode, batch_size=batch_size):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        batch_sum, batch_max = vectors.sum(axis=0), vectors.max(axis=0)
+        total = batch_sum if total is None else total + batch_sum
+        maximum = batch_max if maximum is None else np.maximum(maximum, batch_max)
+        count += len(vectors)
+
+    if not count:
+        return None
+
+    return {
+        'mean': total / count,
+        'max': maximum,
+        'topics': get_topic_tagger(faculty_code).count(pages),
+        'chunk_count': count
+    }
+
+
+def store_paper_vector(paper, file_path, encode, faculty_code=None):
+    """Compute and save the vector document of a past paper"""
+    vector = compute_paper_vector(file_path, encode, faculty_code=faculty_code)
+    if vector is None:
+        return None
+
+    document = {
+        'paper_id': paper['_id'],
+        'file_hash': paper.get('file_hash'),
+        'model': Config.EMBEDDING_MODEL,
+        'mean': encode_embedding(vector['mean'], Config.EMBEDDING_STORAGE_DTYPE),
+        'max': encode_embedding(vector['max'], Config.EMBEDDING_STORAGE_DTYPE),
+        'topics': vector['topics'],
+        'chunk_count': vector['chunk_count'],
+        'created_at': datetime.utcnow()
+    }
+    mongo.db.paper_vectors.replace_one({'paper_id': paper['_id']}, document, upsert=True)
+    return document
+
+
+def load_paper_vectors(paper_ids):
+    """{paper_id: vector document} for the papers that have one, in one query"""
+    ids = [ObjectId(paper_id) for paper_id in paper_ids]
+    return {
+        document['paper_id']: document
+        for document in mongo.db.paper_vectors.find({'paper_id': {'$in': ids}})
+    }
+
+
+def paper_similarity_matrix(documents, topic_weight=TOPIC_WEIGHT):
+    """
+    N x N similarity of papers from their stored vectors
+
+    Content similarity averages the cosine of the mean-pooled and of the
+    max-pooled embeddings. Where both papers have topics, topic cosine is
+    blended in with `topic_weight`.
+
+    Returns:
+        np.ndarray: Symmetric matrix with ones on the diagonal
+    """
+    means = normalize_rows([decode_embedding(d['mean']) for d in documents])
+    maxes = normalize_rows([decode_embedding(d['max']) for d in documents])
+    content = (means @ means.T + maxes @ maxes.T) / 2
+
+    vocabulary = sorted({topic for d in documents for topic in d.get('topics') or {}})
+    if not vocabulary or not topic_weight:
+        similarity = content
+    else:
+        column = {topic: i for i, topic in enumerate(vocabulary)}
+        counts = np.zeros((len(documents), len(vocabulary)), dtype=np.float32)
+        for row, d in enumerate(documents):
+            for topic, pages in (d.get('topics') or {}).items():
+                counts[row, column[topic]] = pages
+        has_topics = counts.any(axis=1)
+        topics = normalize_rows(counts)
+        both = np.outer(has_topics, has_topics)
+        similarity = np.where(both, (1 - topic_weight) * content + topic_weight * (topics @ topics.T), content)
+
+    similarity = np.clip(similarity, -1.0, 1.0)
+    np.fill_diagonal(similarity, 1.0)
+    return similarity
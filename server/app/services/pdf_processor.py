@@ -1,14 +1,15 @@
 # pdf_processor.py
 import os
-import re
 import fitz  # PyMuPDF
-from datetime import datetime
 import uuid
 import hashlib
 from sentence_transformers import SentenceTransformer
 import nltk
 from nltk.tokenize import sent_tokenize
 import logging
+from app.services.ingestion import iter_batches
+from app.services.toc import match_headings
+from app.services.references import extract_references
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -120,102 +121,22 @@ class PDFProcessor:
         """
         Extract potential references from text
         
-        This function uses various heuristics to identify references:
+        Uses the shared single-pass engine in app.services.references, which identifies:
         1. Citation patterns like [1], [Smith et al., 2020]
         2. Footnote markers like ¹, ², ³
-        3. Section headers that might indicate references
+        3. Numbered reference lines like [3] or 12.
+        4. Section headers that might indicate references, and the entries after them
         """
-        references = []
-        
-        # Split text into lines
-        lines = text.split('\n')
-        
-        # Patterns for references
-        citation_pattern = r'\[\d+\]|\[\w+\s+et\s+al\.?,\s+\d{4}\]'
-        footnote_pattern = r'[¹²³⁴⁵⁶⁷⁸⁹]'
-        reference_section_patterns = [
-            r'^references$', 
-            r'^bibliography$',
-            r'^works cited$',
-            r'^citations$'
-        ]
-        
-        # Check if this page contains a references section
-        is_reference_section = False
-        for i, line in enumerate(lines):
-            line_lower = line.strip().lower()
-            for pattern in reference_section_patterns:
-                if re.match(pattern, line_lower):
-                    is_reference_section = True
-                    # Add the section header as a reference
-                    reference = {
-                        'id': str(uuid.uuid4()),
-                        'pageNumber': page_num,
-                        'text': f"References section starts here: {line.strip()}",
-                        'title': "References Section",
-                        'type': 'section',
-                        'created_at': datetime.now()
-                    }
-                    references.append(reference)
-                    break
-        
-        # Process lines for references
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Check for citation pattern
-            citations = re.findall(citation_pattern, line)
-            if citations:
-                reference = {
-                    'id': str(uuid.uuid4()),
-                    'pageNumber': page_num,
-                    'text': line,
-                    'title': f"Citation on page {page_num}",
-                    'type': 'citation',
-                    'created_at': datetime.now()
-                }
-                references.append(reference)
-                continue
-            
-            # Check for footnote pattern
-            if re.search(footnote_pattern, line):
-                reference = {
-                    'id': str(uuid.uuid4()),
-                    'pageNumber': page_num,
-                    'text': line,
-                    'title': f"Footnote on page {page_num}",
-                    'type': 'footnote',
-                    'created_at': datetime.now()
-                }
-                references.append(reference)
-                continue
-            
-            # If we're in a reference section, each line could be a reference
-            if is_reference_section and len(line) > 30:  # Minimum length to be a reference
-                reference = {
-                    'id': str(uuid.uuid4()),
-                    'pageNumber': page_num,
-                    'text': line,
-                    'title': f"Reference from bibliography",
-                    'type': 'bibliography',
-                    'created_at': datetime.now()
-                }
-                references.append(reference)
-        
-        return references
+        return extract_references(text, page_num)
     
-    def _generate_embeddings(self, text_by_page):
-        """Generate embeddings for each chunk of text"""
-        self._load_model()  # Ensure model is loaded
-        
-        embeddings = {}
-        chunks = []
-        chunk_metadata = []
+    def iter_chunks(self, pages):
+        """
+        Split a stream of (page_num, text) pairs into sentence chunks
         
-        # Process each page into sentence chunks
-        for page_num, text in text_by_page.items():
+        Yields:
+            tuple: (chunk_text, chunk_metadata)
+        """
+        for page_num, text in pages:
             # Skip if text is too short
             if len(text) < 10:
                 continue
@@ -234,31 +155,53 @@ class PDFProcessor:
                 if len(current_chunk) + len(sentence) < 512:
                     current_chunk += sentence + " "
                 else:
-                    # Store the chunk and start a new one
+                    # Emit the chunk and start a new one
                     if current_chunk:
-                        chunks.append(current_chunk.strip())
-                        chunk_metadata.append({
-                            'page': page_num,
-                            'text': current_chunk[:100] + "..." if len(current_chunk) > 100 else current_chunk
-                        })
+                        yield current_chunk.strip(), self._chunk_metadata(page_num, current_chunk)
                     current_chunk = sentence + " "
             
-            # Add the last chunk if not empty
+            # Emit the last chunk if not empty
             if current_chunk:
-                chunks.append(current_chunk.strip())
-                chunk_metadata.append({
-                    'page': page_num,
-                    'text': current_chunk[:100] + "..." if len(current_chunk) > 100 else current_chunk
-                })
+                yield current_chunk.strip(), self._chunk_metadata(page_num, current_chunk)
+    
+    def _chunk_metadata(self, page_num, chunk):
+        """Build the metadata stored alongside a chunk embedding"""
+        return {
+            'page': page_num,
+            'text': chunk[:100] + "..." if len(chunk) > 100 else chunk
+        }
+    
+    def iter_embedding_batches(self, pages, batch_size=64):
+        """
+        Encode sentence chunks in fixed-size batches
         
-        # Generate embeddings for all chunks
-        if chunks:
-            chunk_embeddings = self.model.encode(chunks)
-            
-            # Store embeddings with metadata
+        Only one batch of chunks and vectors is alive at a time, so memory
+        stays flat however many pages are streamed through.
+        
+        Yields:
+            tuple: (embeddings, chunk_metadata) for each batch
+        """
+        self._load_model()  # Ensure model is loaded
+        
+        for batch in iter_batches(self.iter_chunks(pages), batch_size):
+            chunks = [chunk for chunk, _ in batch]
+            yield self.model.encode(chunks), [metadata for _, metadata in batch]
+    
+    def _generate_embeddings(self, text_by_page):
+        """Generate embeddings for each chunk of text"""
+        embeddings = {}
+        all_embeddings = []
+        all_metadata = []
+        
+        for batch_embeddings, batch_metadata in self.iter_embedding_batches(text_by_page.items()):
+            all_embeddings.extend(batch_embeddings.tolist())
+            all_metadata.extend(batch_metadata)
+        
+        # Store embeddings with metadata
+        if all_embeddings:
             embeddings = {
-                'embeddings': chunk_embeddings.tolist(),
-                'metadata': chunk_metadata
+                'embeddings': all_embeddings,
+                'metadata': all_metadata
             }
         
         return embeddings
@@ -266,60 +209,29 @@ class PDFProcessor:
     def extract_chapters_and_sections(self, text_by_page):
         """Extract chapters and sections from the PDF"""
         chapters = []
-        
-        # Patterns for chapter and section headings
-        chapter_patterns = [
-            r'^Chapter\s+\d+[\.:]\s+(.+)$',
-            r'^CHAPTER\s+\d+[\.:]\s+(.+)$',
-            r'^\d+[\.:]\s+(.+)$'
-        ]
-        
-        section_patterns = [
-            r'^\d+\.\d+[\.:]\s+(.+)$',
-            r'^[A-Z]\.\s+(.+)$',
-            r'^\d+\.\s+(.+)$'
-        ]
-        
         current_chapter = None
         
-        # Process each page
+        # Process each page with a single scan of the combined heading pattern
         for page_num, text in text_by_page.items():
-            lines = text.split('\n')
-            
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                
-                # Check for chapter patterns
-                for pattern in chapter_patterns:
-                    match = re.match(pattern, line, re.IGNORECASE)
-                    if match:
-                        title = match.group(1) if match.groups() else line
-                        current_chapter = {
-                            'id': str(uuid.uuid4()),
-                            'title': title,
-                            'pageNumber': page_num,
-                            'type': 'chapter',
-                            'sections': []
-                        }
-                        chapters.append(current_chapter)
-                        break
+            for heading in match_headings(text, page_num):
+                if heading['level'] == 1:
+                    current_chapter = {
+                        'id': str(uuid.uuid4()),
+                        'title': heading['title'],
+                        'pageNumber': page_num,
+                        'type': 'chapter',
+                        'sections': []
+                    }
+                    chapters.append(current_chapter)
                 
-                # Check for section patterns if we have a current chapter
-                if current_chapter:
-                    for pattern in section_patterns:
-                        match = re.match(pattern, line, re.IGNORECASE)
-                        if match:
-                            title = match.group(1) if match.groups() else line
-                            section = {
-                                'id': str(uuid.uuid4()),
-                                'title': title,
-                                'pageNumber': page_num,
-                                'type': 'section'
-                            }
-                            current_chapter['sections'].append(section)
-                            break
+                # Sections only count once a chapter has been seen
+                elif current_chapter:
+                    current_chapter['sections'].append({
+                        'id': str(uuid.uuid4()),
+                        'title': heading['title'],
+                        'pageNumber': page_num,
+                        'type': 'section'
+                    })
         
         return chapters
     
@@ -0,0 +1,212 @@
+# app/services/question_clustering.py
+import logging
+from collections import Counter, defaultdict
+import numpy as np
+from bson import ObjectId
+from pymongo import UpdateMany
+from app import mongo
+from app.utils.database import BulkWriter
+from app.services.question_index import normalize_rows
+from app.utils.embeddings import decode_embedding
+
+logger = logging.getLogger(__name__)
+
+
+class UnionFind:
+    """Disjoint sets over 0..n-1 with path halving and union by size"""
+
+    def __init__(self, n):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+
+    def labels(self):
+        """Root of every element"""
+        return [self.find(x) for x in range(len(self.parent))]
+
+
+def iter_similar_pairs(matrix, threshold, block_size=1024):
+    """
+    Yield (i, j) arrays of row pairs with i < j and similarity >= threshold
+
+    Rows must be normalized. Only one block_size x n slice of the similarity
+    matrix exists at a time, so memory stays O(block_size * n).
+    """
+    n = matrix.shape[0]
+    for start in range(0, n, block_size):
+        end = min(start + block_size, n)
+        sims = matrix[start:end] @ matrix[start:].T
+
+        # Keep the strict upper triangle: column offset must exceed row offset
+        sims[:, :end - start][np.tril_indices(end - start)] = -1.0
+
+        rows, cols = np.nonzero(sims >= threshold)
+        if len(rows):
+            yield rows + start, cols + start
+
+
+def cluster_embeddings(vectors, threshold=0.85, block_size=1024):
+    """
+    Group embeddings into connected components of the similarity graph
+
+    Args:
+        vectors: (n, d) array-like of embeddings
+        threshold (float): Minimum cosine similarity for two rows to be linked
+        block_size (int): Rows compared per matrix product
+
+    Returns:
+        list: Component label for every row
+    """
+    n = len(vectors)
+    if n == 0:
+        return []
+
+    matrix = normalize_rows(vectors)
+    groups = UnionFind(n)
+    for rows, cols in iter_similar_pairs(matrix, threshold, block_size):
+        for i, j in zip(rows.tolist(), cols.tolist()):
+            groups.union(i, j)
+
+    return groups.labels()
+
+
+def _group_writes(assignments, current):
+    """One UpdateMany per group for the questions whose group_id changes"""
+    by_group = defaultdict(list)
+    for question_id, group_id in assignments.items():
+        if current.get(question_id) != group_id:
+            by_group[group_id].append(question_id)
+    return [
+        UpdateMany({'_id': {'$in': ids}}, {'$set': {'group_id': group_id}})
+        for group_id, ids in by_group.items()
+    ]
+
+
+def _persist(operations):
+    """Send every group update in a single bulk_write"""
+    if not operations:
+        return {'modified': 0, 'round_trips': 0}
+    with BulkWriter(mongo.db.questions, batch_size=len(operations)) as writer:
+        for operation in operations:
+            writer.add(operation)
+    return writer.summary()
+
+
+def assign_group_ids(components, current):
+    """
+    Group id of every component: an existing id where possible, else a new one
+
+    Each existing group_id goes to at most one component, the one with the
+    most members carrying it, so a stale group spread over dissimilar
+    components is split. Components left without an id get a fresh ObjectId.
+
+    Args:
+        components (list): Lists of question ids
+        current (dict): {question_id: group_id or None}
+
+    Returns:
+        list: One group id per component
+    """
+    claims = []
+    for index, ids in enumerate(components):
+        for group_id, count in Counter(current[i] for i in ids if current.get(i)).items():
+            claims.append((-count, index, str(group_id), group_id))
+
+    chosen = {}
+    taken = set()
+    for _, index, _, group_id in sorted(claims):
+        if index not in chosen and group_id not in taken:
+            chosen[index] = group_id
+            taken.add(group_id)
+
+    return [chosen.get(index) or str(ObjectId()) for index in range(len(components))]
+
+
+def group_unit_questions(unit_id, threshold=0.85, incremental=False, block_size=1024):
+    """
+    Assign group ids to a unit's questions
+
+    Full mode clusters every question in the unit. Each resulting group keeps
+    an existing group_id of its members where possible, so regrouping is
+    stable, but no id is shared by two groups (see assign_group_ids).
+
+    Incremental mode only places questions without a group_id: each joins the
+    group of its most similar grouped question when that similarity reaches
+    the threshold, and the rest are clustered among themselves.
+
+    Returns:
+        dict: Number of questions considered, groups touched and documents modified
+    """
+    questions = list(mongo.db.questions.find(
+        {'unit_id': ObjectId(unit_id)},
+        {'embedding': 1, 'group_id': 1}
+    ))
+    if not questions:
+        return {'questions': 0, 'groups': 0, 'modified': 0}
+
+    for q in questions:
+        q['embedding'] = decode_embedding(q.get('embedding'))
+
+    current = {q['_id']: q.get('group_id') for q in questions}
+    assignments = {}
+
+    if incremental:
+        grouped = [q for q in questions if q.get('group_id') and q['embedding'] is not None]
+        to_place = [q for q in questions if not q.get('group_id')]
+
+        # Attach new questions to existing groups with one matrix product
+        if grouped and to_place:
+            placeable = [q for q in to_place if q['embedding'] is not None]
+            if placeable:
+                sims = normalize_rows([q['embedding'] for q in placeable]) @ \
+                    normalize_rows([q['embedding'] for q in grouped]).T
+                best = sims.argmax(axis=1)
+                for q, column, row in zip(placeable, best, sims):
+                    if row[column] >= threshold:
+                        assignments[q['_id']] = grouped[column]['group_id']
+
+        candidates = [q for q in to_place if q['_id'] not in assignments]
+    else:
+        candidates = questions
+
+    # Cluster whatever is left; questions without embeddings are groups of one
+    with_embeddings = [q for q in candidates if q['embedding'] is not None]
+    labels = cluster_embeddings([q['embedding'] for q in with_embeddings], threshold, block_size)
+
+    members = defaultdict(list)
+    for q, label in zip(with_embeddings, labels):
+        members[label].append(q['_id'])
+    for q in candidates:
+        if q['embedding'] is None:
+            members[('single', q['_id'])].append(q['_id'])
+
+    for ids, group_id in zip(members.values(), assign_group_ids(list(members.values()), current)):
+        for question_id in ids:
+            assignments[question_id] = group_id
+
+    operations = _group_writes(assignments, current)
+    summary = _persist(operations)
+
+    logger.info(f"Grouped {len(assignments)} questions for unit {unit_id} "
+                f"({len(operations)} groups changed, incremental={incremental})")
+
+    return {
+        'questions': len(assignments),
+        'groups': len(set(assignments.values())),
+        'modified': summary.get('modified', 0)
+    }
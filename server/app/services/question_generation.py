@@ -0,0 +1,269 @@
+# app/services/question_generation.py
+# Practice question generators and a shared cache in front of them
+#
+# Generators share one interface, generate(unit, topics, difficulty, count),
+# and are picked by name from GENERATORS. Results are cached per
+# (unit, sorted topics, difficulty, count, generator) so a class asking for
+# the same set is served one generation; identical requests that arrive
+# while it runs wait for it instead of generating again.
+
+import re
+import json
+import random
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from app.config import Config
+from app.utils.cache import FallbackCache
+
+logger = logging.getLogger(__name__)
+
+QUESTION_TYPES = ["multiple_choice", "short_answer", "essay", "calculation"]
+
+# Question types used at each difficulty
+DIFFICULTY_TYPES = {
+    "easy": ["multiple_choice", "short_answer"],
+    "medium": ["multiple_choice", "short_answer", "calculation"],
+    "hard": ["short_answer", "essay", "calculation"]
+}
+
+TEMPLATES = {
+    "multiple_choice": [
+        "Which of the following best describes {topic}?",
+        "What is the primary characteristic of {topic}?",
+        "Which statement about {topic} is correct?"
+    ],
+    "short_answer": [
+        "Define {topic} and provide an example.",
+        "Explain the significance of {topic} in relation to {unit_name}.",
+        "Describe the key features of {topic}."
+    ],
+    "essay": [
+        "Critically analyze the role of {topic} in the field of {unit_name}.",
+        "Compare and contrast different approaches to {topic}.",
+        "Discuss the implications of {topic} for future developments in {unit_name}."
+    ],
+    "calculation": [
+        "Calculate the results for the following problem related to {topic}: [problem details]",
+        "Using {topic} principles, solve this equation: [equation]",
+        "Apply {topic} techniques to find the solution to this problem: [problem details]"
+    ]
+}
+
+
+class QuestionGenerator(ABC):
+    """Interface of practice question generators"""
+
+    name = None
+
+    @abstractmethod
+    def generate(self, unit, topics, difficulty, count):
+        """
+        Generate practice questions
+
+        Returns:
+            list: [{'type', 'question', 'topics', 'difficulty'}, ...]
+        """
+
+
+class LocalQuestionGenerator(QuestionGenerator):
+    """Fills question templates locally; no external calls"""
+
+    name = 'local'
+
+    def generate(self, unit, topics, difficulty, count):
+        q_types = DIFFICULTY_TYPES.get(difficulty, DIFFICULTY_TYPES['hard'])
+        questions = []
+        for _ in range(count):
+            q_type = random.choice(q_types)
+            topic = random.choice(topics)
+            questions.append({
+                "type": q_type,
+                "question": random.choice(TEMPLATES[q_type]).format(topic=topic, unit_name=unit['name']),
+                "topics": [topic],
+                "difficulty": difficulty
+            })
+        return questions
+
+
+class OpenAIQuestionGenerator(QuestionGenerator):
+    """Asks the OpenAI chat API for questions"""
+
+    name = 'openai'
+
+    def __init__(self, api_key=None, model="gpt-3.5-turbo"):
+        self.api_key = api_key
+        self.model = model
+
+    def generate(self, unit, topics, difficulty, count):
+        import openai
+        openai.api_key = self.api_key
+
+        prompt = f"""Generate {count} practice questions for a university course on {unit['name']} ({unit['code']}).
+
+Topics to focus on:
+{', '.join(topics)}
+
+Difficulty level: {difficulty}
+
+For each question, provide:
+1. The question text
+2. The question type (multiple_choice, short_answer, essay, calculation)
+3. Topic tags
+4. Difficulty rating
+5. A sample answer or solution
+
+Format the questions as a JSON array of objects with the keys
+"question", "type", "topics", "difficulty" and "answer"."""
+
+        response = openai.ChatCompletion.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": "You are a helpful academic assistant that generates exam questions."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+            max_tokens=2000
+        )
+        return parse_generated_questions(response.choices[0].message.content, topics, difficulty, count)
+
+
+def parse_generated_questions(text, topics, difficulty, count):
+    """
+    Questions from a model's reply: a JSON array, or JSON objects in the text
+
+    Raises:
+        ValueError: If no question could be read
+    """
+    try:
+        items = json.loads(text)
+        items = items if isinstance(items, list) else [items]
+    except (json.JSONDecodeError, TypeError):
+        items = []
+        for block in re.findall(r'\{[^{}]*\}', text or ''):
+            try:
+                items.append(json.loads(block))
+            except json.JSONDecodeError:
+                continue
+
+    questions = []
+    for item in items:
+        if not isinstance(item, dict) or not str(item.get('question') or '').strip():
+            continue
+        item_topics = item.get('topics')
+        question = {
+            "type": item.get('type') if item.get('type') in QUESTION_TYPES else "short_answer",
+            "question": str(item['question']).strip(),
+            "topics": item_topics if isinstance(item_topics, list) and item_topics else topics[:1],
+            "difficulty": difficulty
+        }
+        if item.get('answer'):
+            question["answer"] = item['answer']
+        questions.append(question)
+
+    if not questions:
+        raise ValueError("No questions found in the generated text")
+    return questions[:count]
+
+
+GENERATORS = {
+    LocalQuestionGenerator.name: LocalQuestionGenerator,
+    OpenAIQuestionGenerator.name: OpenAIQuestionGenerator
+}
+
+
+def get_question_generator(name=None):
+    """
+    Return the configured generator
+
+    QUESTION_GENERATOR picks one by name; when it is unset, OpenAI is used if
+    an API key is configured and the local generator otherwise.
+    """
+    name = name or Config.QUESTION_GENERATOR or ('openai' if Config.OPENAI_API_KEY else 'local')
+    if name not in GENERATORS:
+        raise ValueError(f"Unknown question generator: {name}")
+    if name == OpenAIQuestionGenerator.name:
+        return OpenAIQuestionGenerator(api_key=Config.OPENAI_API_KEY)
+    return GENERATORS[name]()
+
+
+def normalize_topics(topics):
+    """Topics stripped, de-duplicated case-insensitively and sorted"""
+    unique = {}
+    for topic in topics:
+        topic = topic.strip() if isinstance(topic, str) else ''
+        if topic:
+            unique.setdefault(topic.lower(), topic)
+    return [unique[key] for key in sorted(unique)]
+
+
+class PracticeQuestionCache:
+    """
+    Cached, single-flight practice question generation
+
+    Results live in Redis when it is available, so every worker shares them,
+    and in a small in-process LRU otherwise. If the chosen generator fails,
+    the local generator answers instead and that result is not cached.
+    """
+
+    def __init__(self, ttl=3600, max_local_entries=256):
+        self.ttl = ttl
+        self._cache = FallbackCache(ttl, max_local_entries)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def key(self, unit_id, topics, difficulty, count, generator_name):
+        digest = hashlib.md5(json.dumps([t.lower() for t in topics]).encode()).hexdigest()
+        return f"practice_questions:{unit_id}:{digest}:{difficulty}:{count}:{generator_name}"
+
+    def get(self, unit, topics, difficulty, count, generator=None):
+        """
+        Return (questions, cached) for a request
+
+        cached is True when the questions came from the cache or from an
+        identical request that was already generating them.
+        """
+        generator = generator or get_question_generator()
+        topics = normalize_topics(topics)
+        key = self.key(unit['_id'], topics, difficulty, count, generator.name)
+
+        questions = self._cache.get(key)
+        if questions is not None:
+            return questions, True
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            questions = self._generate(key, unit, topics, difficulty, count, generator)
+            future.set_result(questions)
+            return questions, False
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def _generate(self, key, unit, topics, difficulty, count, generator):
+        try:
+            questions = generator.generate(unit, topics, difficulty, count)
+        except Exception as e:
+            if generator.name == LocalQuestionGenerator.name:
+                raise
+            logger.error(f"{generator.name} question generation failed: {str(e)}")
+            return LocalQuestionGenerator().generate(unit, topics, difficulty, count)
+
+        self._cache.set(key, questions)
+        return questions
+
+
+practice_questions = PracticeQuestionCache(ttl=Config.PRACTICE_QUESTIONS_CACHE_TTL)
@@ -0,0 +1,203 @@
+# app/services/question_index.py
+import time
+import logging
+import threading
+import numpy as np
+from bson import ObjectId
+from app import mongo
+from app.config import Config
+from app.utils.embeddings import decode_embedding
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_rows(vectors):
+    """Return float32 rows scaled to unit length (zero rows stay zero)"""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class EmbeddingMatrix:
+    """
+    Normalized float32 embedding matrix with the ids of its rows
+
+    Rows are stored in a buffer that grows by doubling, so appending one
+    embedding is amortized O(d) instead of copying the whole matrix.
+    """
+
+    def __init__(self, ids=None, vectors=None, dim=None):
+        self.ids = list(ids or [])
+        self._id_set = set(self.ids)
+        if vectors is not None and len(self.ids):
+            self._buffer = normalize_rows(vectors)
+        else:
+            self._buffer = np.zeros((0, dim or 0), dtype=np.float32)
+        self.size = len(self.ids)
+
+    @property
+    def matrix(self):
+        """View of the filled rows"""
+        return self._buffer[:self.size]
+
+    @property
+    def dim(self):
+        return self._buffer.shape[1]
+
+    def append(self, item_id, vector):
+        """Add one embedding as a new row (ignored if the id is already present)"""
+        if item_id in self._id_set:
+            return
+        row = normalize_rows(vector)[0]
+
+        if self.size == 0 and self._buffer.shape[1] != row.shape[0]:
+            self._buffer = np.zeros((0, row.shape[0]), dtype=np.float32)
+        if row.shape[0] != self.dim:
+            raise ValueError(f"Embedding has {row.shape[0]} dimensions, matrix has {self.dim}")
+
+        if self.size == self._buffer.shape[0]:
+            grown = np.zeros((max(2 * self.size, 16), self.dim), dtype=np.float32)
+            grown[:self.size] = self._buffer[:self.size]
+            self._buffer = grown
+
+        self._buffer[self.size] = row
+        self.ids.append(item_id)
+        self._id_set.add(item_id)
+        self.size += 1
+
+    def scores(self, vector):
+        """Cosine similarity of every row against one vector"""
+        if self.size == 0:
+            return np.zeros(0, dtype=np.float32)
+        return self.matrix @ normalize_rows(vector)[0]
+
+    def best_match(self, vector):
+        """Return (id, score) of the most similar row, or (None, 0.0) if empty"""
+        scores = self.scores(vector)
+        if not len(scores):
+            return None, 0.0
+        best = int(np.argmax(scores))
+        return self.ids[best], float(scores[best])
+
+    def top_k(self, vector, k=5):
+        """Return [(id, score), ...] for the k most similar rows, best first"""
+        scores = self.scores(vector)
+        if not len(scores):
+            return []
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[i], float(scores[i])) for i in top]
+
+    def batch_scores(self, vectors):
+        """(m, size) cosine similarities of several vectors against every row"""
+        if self.size == 0:
+            return np.zeros((len(vectors), 0), dtype=np.float32)
+        return normalize_rows(vectors) @ self.matrix.T
+
+    def batch_top_k(self, vectors, k=5):
+        """top_k for several vectors with one matrix product"""
+        scores = self.batch_scores(vectors)
+        if not scores.shape[1]:
+            return [[] for _ in range(len(scores))]
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in zip(scores, top):
+            candidates = candidates[np.argsort(-row[candidates])]
+            results.append([(self.ids[i], float(row[i])) for i in candidates])
+        return results
+
+
+class QuestionIndex:
+    """
+    In-process cache of one EmbeddingMatrix per unit
+
+    A unit's matrix is loaded from MongoDB on first use and kept current by
+    `add` as questions are created in this process. Matrices are reloaded
+    after `ttl` seconds so questions written by other workers are picked up.
+    """
+
+    collection_name = 'questions'
+    field = 'embedding'
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._units = {}
+        self._lock = threading.Lock()
+
+    def _unit_query(self, unit_id):
+        """Filter selecting a unit's documents"""
+        return {'unit_id': ObjectId(unit_id)}
+
+    def _load(self, unit_id):
+        """Build a unit's matrix from the collection, reading only the embeddings"""
+        ids, vectors = [], []
+        query = self._unit_query(unit_id)
+        query[self.field] = {'$ne': None}
+        for document in mongo.db[self.collection_name].find(query, {self.field: 1}):
+            embedding = decode_embedding(document.get(self.field))
+            if embedding is not None:
+                ids.append(document['_id'])
+                vectors.append(embedding)
+
+        matrix = EmbeddingMatrix(ids, vectors if vectors else None)
+        logger.debug(f"Loaded {matrix.size} {self.collection_name} embeddings for unit {unit_id}")
+        return matrix
+
+    def get(self, unit_id):
+        """Return the unit's matrix, loading or refreshing it when needed"""
+        key = str(unit_id)
+        with self._lock:
+            entry = self._units.get(key)
+            if entry and time.monotonic() - entry[0] < self.ttl:
+                return entry[1]
+
+            matrix = self._load(key)
+            self._units[key] = (time.monotonic(), matrix)
+            return matrix
+
+    def add(self, unit_id, item_id, embedding):
+        """Append a newly created document to its unit's matrix, if that unit is cached"""
+        if embedding is None or len(embedding) == 0:
+            return
+        with self._lock:
+            entry = self._units.get(str(unit_id))
+            if entry:
+                entry[1].append(item_id, embedding)
+
+    def extend(self, unit_id, items):
+        """Append several (id, embedding) pairs to a cached unit matrix"""
+        with self._lock:
+            entry = self._units.get(str(unit_id))
+            if entry:
+                for item_id, embedding in items:
+                    if embedding is not None and len(embedding):
+                        entry[1].append(item_id, embedding)
+
+    def invalidate(self, unit_id=None):
+        """Drop one unit's matrix, or all of them"""
+        with self._lock:
+            if unit_id is None:
+                self._units.clear()
+            else:
+                self._units.pop(str(unit_id), None)
+
+
+class NoteIndex(QuestionIndex):
+    """Per-unit matrix of note embeddings, used when the vector index is unavailable"""
+
+    collection_name = 'notes'
+    field = 'embeddings'
+
+    def _unit_query(self, unit_id):
+        # Notes uploaded through the API store unit_id as a string
+        return {'unit_id': {'$in': [ObjectId(unit_id), str(unit_id)]}}
+
+
+# Shared by the embedding service and the Question/Note models
+question_index = QuestionIndex(ttl=Config.QUESTION_INDEX_TTL)
+note_index = NoteIndex(ttl=Config.NOTE_INDEX_TTL)
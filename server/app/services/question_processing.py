@@ -1,28 +1,40 @@
 # app/services/question_processing.py
 import re
+import numpy as np
+from collections import Counter
 from app import mongo
-from app.services.embedding_service import EmbeddingService
+from app.services.embedding_service import get_embedding_service
+from app.services.question_index import question_index, normalize_rows
+from app.utils.database import BulkWriter
 from bson import ObjectId
 from app.models.question import Question
-from app.models.note import Note
+from app.config import Config
+from app.utils.cache import FallbackCache
+from app.utils.embeddings import decode_embedding
+from app.services.sentence_index import load_sentence_indexes
+from app.services.topic_tagger import get_topic_tagger
+
+# Highlights per question, shared through Redis or kept in process without it
+highlight_cache = FallbackCache(ttl=Config.HIGHLIGHT_CACHE_TTL, max_local_entries=512)
 
 class QuestionProcessingService:
     def __init__(self):
-        self.embedding_service = EmbeddingService()
+        self.embedding_service = get_embedding_service()
     
     def process_new_question(self, question_text, unit_id, source_type, source_id, year=None):
         """Process a new question and find related information"""
-        # Get embedding for the question
-        similar_question_id, embedding = self.embedding_service.find_similar_questions(
-            question_text, unit_id
+        # Encode once; both lookups reuse the embedding
+        embedding = self.embedding_service.get_embedding(question_text)
+        similar_question_id, _ = self.embedding_service.find_similar_questions(
+            question_text, unit_id, embedding=embedding
         )
         
         # Find related notes
         related_notes = self.embedding_service.find_related_notes(
-            question_text, unit_id
+            question_text, unit_id, embedding=embedding
         )
         
-        related_section_ids = [str(note_id) for note_id, _, _ in related_notes]
+        related_section_ids = [str(note.note_id) for note in related_notes]
         
         if similar_question_id:
             # If similar question exists, update its frequency
@@ -58,28 +70,104 @@ class QuestionProcessingService:
         
         return question, related_notes
     
-    def identify_question_topics(self, question_text):
+    def process_questions_batch(self, question_texts, unit_id, source_type, source_id, year=None,
+                                threshold=0.85):
         """
-        Identify potential topics in a question using keyword extraction
-        This is a simple implementation that could be enhanced with NLP techniques
+        Process many questions of one paper at once
+        
+        Gives the same grouping as calling process_new_question for each text
+        in order, but with one encode pass, the similarity and related-note
+        lookups done as matrix operations, and the writes sent as one
+        insert_many plus one bulk update of matched questions.
+        
+        Returns:
+            list: (question, related_notes) for every non-empty text, in order
         """
-        # Simple keyword extraction (could be improved with NLP)
-        common_topics = [
-            "algorithm", "data structure", "function", "class", "method",
-            "inheritance", "polymorphism", "encapsulation", "abstraction",
-            "database", "SQL", "normalization", "transaction", "ACID",
-            "network", "protocol", "TCP/IP", "OSI", "security",
-            "cryptography", "hash", "encryption", "authentication",
-            "operating system", "process", "thread", "scheduling", "memory",
-            "file system", "distributed", "concurrent", "parallel"
-        ]
-        
-        found_topics = []
-        for topic in common_topics:
-            if re.search(rf'\b{re.escape(topic)}\b', question_text, re.IGNORECASE):
-                found_topics.append(topic)
-                
-        return found_topics
+        texts = [text.strip() for text in question_texts if text and text.strip()]
+        if not texts:
+            return []
+        
+        embeddings = np.asarray(self.embedding_service.get_embeddings(texts), dtype=np.float32)
+        normalized = normalize_rows(embeddings)
+        
+        # Best existing question for every text, and similarities within the batch
+        existing = question_index.get(unit_id)
+        existing_scores = existing.batch_scores(normalized)
+        batch_scores = normalized @ normalized.T
+        
+        related = self.embedding_service.find_related_notes_batch(normalized, unit_id)
+        
+        matched_ids = set()
+        if existing_scores.shape[1]:
+            best_existing = existing_scores.argmax(axis=1)
+            matched_ids = {
+                existing.ids[column] for row, column in enumerate(best_existing)
+                if existing_scores[row, column] >= threshold
+            }
+        current_groups = {
+            q['_id']: q.get('group_id')
+            for q in mongo.db.questions.find({'_id': {'$in': list(matched_ids)}}, {'group_id': 1})
+        } if matched_ids else {}
+        
+        documents = []
+        frequency = Counter()
+        new_groups = {}
+        
+        for i, text in enumerate(texts):
+            existing_id, existing_score = None, -1.0
+            if existing_scores.shape[1]:
+                column = int(best_existing[i])
+                existing_id, existing_score = existing.ids[column], float(existing_scores[i, column])
+            
+            # Earlier questions of this batch count as existing ones, as they would one at a time
+            earlier, earlier_score = None, -1.0
+            if i:
+                earlier = int(batch_scores[i, :i].argmax())
+                earlier_score = float(batch_scores[i, earlier])
+            
+            if max(existing_score, earlier_score) < threshold:
+                group_id = str(ObjectId())
+            elif existing_score >= earlier_score:
+                frequency[existing_id] += 1
+                group_id = current_groups.get(existing_id) or new_groups.setdefault(existing_id, str(ObjectId()))
+            else:
+                documents[earlier]['frequency'] += 1
+                group_id = documents[earlier]['group_id']
+            
+            documents.append(Question.build(
+                text=text,
+                unit_id=unit_id,
+                source_type=source_type,
+                source_id=source_id,
+                year=year,
+                embedding=embeddings[i],
+                related_sections=[str(note.note_id) for note in related[i]],
+                frequency=1,
+                group_id=group_id
+            ))
+        
+        if frequency or new_groups:
+            with BulkWriter(mongo.db.questions) as writer:
+                for question_id, count in frequency.items():
+                    writer.update_one({'_id': question_id}, {'$inc': {'frequency': count}})
+                for question_id, group_id in new_groups.items():
+                    writer.update_one({'_id': question_id}, {'$set': {'group_id': group_id}})
+        
+        Question.create_many(documents)
+        
+        return list(zip(documents, related))
+    
+    def identify_question_topics(self, question_text, faculty_code=None):
+        """
+        Identify potential topics in a question
+        
+        Uses the faculty's compiled topic vocabulary (defaults plus unit keywords)
+        """
+        return get_topic_tagger(faculty_code).tag(question_text)
+    
+    def identify_questions_topics(self, question_texts, faculty_code=None):
+        """Topics of many questions in a single pass, one list per question"""
+        return get_topic_tagger(faculty_code).tag_many(question_texts)
     
     def analyze_question_difficulty(self, question_text):
         """
@@ -110,38 +198,44 @@ class QuestionProcessingService:
             return "easy"
     
     def get_question_highlights(self, question_id):
-        """Get highlighted sections of notes for a question"""
+        """
+        Get highlighted sections of notes for a question
+        
+        Sentences are scored against each note's precomputed sentence index
+        (see sentence_index) and the result is cached per question.
+        """
+        cache_key = f"highlights:{question_id}"
+        cached = highlight_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         question = Question.get_by_id(question_id)
         if not question or not question.get('related_sections'):
             return []
         
+        section_ids = [ObjectId(s) for s in question['related_sections'] if ObjectId.is_valid(str(s))]
+        notes = {
+            note['_id']: note
+            for note in mongo.db.notes.find(
+                {'_id': {'$in': section_ids}},
+                {'title': 1, 'content': 1, 'page_numbers': 1}
+            )
+        }
+        
+        use_embeddings = Config.SENTENCE_EMBEDDINGS
+        encode = self.embedding_service.get_embeddings if use_embeddings else None
+        indexes = load_sentence_indexes(notes.values(), encode=encode)
+        query_embedding = decode_embedding(question.get('embedding')) if use_embeddings else None
+        
         highlighted_sections = []
         
-        for section_id in question['related_sections']:
-            note = Note.get_by_id(section_id)
+        for section_id in section_ids:
+            note = notes.get(section_id)
             if note:
-                # Extract the most relevant part of the note
-                # This is a simple implementation that could be improved
-                sentences = re.split(r'[.!?]+', note['content'])
-                
-                # Score each sentence based on word overlap with question
-                question_words = set(question['text'].lower().split())
-                scored_sentences = []
-                
-                for sentence in sentences:
-                    if len(sentence.strip()) < 10:  # Skip very short sentences
-                        continue
-                    
-                    sentence_words = set(sentence.lower().split())
-                    overlap = len(question_words.intersection(sentence_words))
-                    score = overlap / max(len(sentence_words), 1)  # Normalize by sentence length
-                    scored_sentences.append((sentence, score))
-                
-                # Sort by score (descending)
-                scored_sentences.sort(key=lambda x: x[1], reverse=True)
+                index = indexes.get(str(section_id))
                 
                 # Take top 3 sentences as highlights
-                top_sentences = [s for s, _ in scored_sentences[:3]]
+                top_sentences = index.top_sentences(question['text'], query_embedding, limit=3) if index else []
                 
                 highlighted_sections.append({
                     'note_id': str(note['_id']),
@@ -150,4 +244,5 @@ class QuestionProcessingService:
                     'page_numbers': note.get('page_numbers', [])
                 })
         
-        return highlighted_sections
\ No newline at end of file
+        highlight_cache.set(cache_key, highlighted_sections)
+        return highlighted_sections
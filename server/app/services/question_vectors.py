@@ -0,0 +1,236 @@
+# app/services/question_vectors.py
+import time
+import uuid
+import logging
+import threading
+from contextlib import nullcontext
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import (
+    Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue,
+    PointIdsList, PayloadSchemaType
+)
+from bson import ObjectId
+from app import mongo, QDRANT_HOST, QDRANT_PORT
+from app.config import Config
+from app.services.ingestion import iter_batches, upsert_streaming
+from app.utils.embeddings import decode_embedding
+
+logger = logging.getLogger(__name__)
+
+# Payload fields that searches filter on
+PAYLOAD_INDEXES = {
+    'unit_id': PayloadSchemaType.KEYWORD,
+    'source_type': PayloadSchemaType.KEYWORD,
+    'year': PayloadSchemaType.KEYWORD
+}
+
+
+def question_point_id(question_id):
+    """Stable Qdrant point id for a question (Qdrant ids must be UUIDs or integers)"""
+    return str(uuid.uuid5(uuid.NAMESPACE_OID, str(question_id)))
+
+
+class QuestionVectorStore:
+    """
+    Archive-wide ANN index of question embeddings
+
+    Every question is a point in one collection with unit_id, year and
+    source_type in its payload, so duplicates can be found across units
+    without scanning MongoDB. backend='server' talks to the Qdrant server;
+    backend='local' runs Qdrant embedded, persisted under `path`. Embedded
+    Qdrant locks `path` to one process, so 'local' only suits a single
+    worker; run the server backend behind several workers.
+    """
+
+    def __init__(self, backend='server', collection_name='questions', path='question_vectors',
+                 embedding_dim=None, client=None):
+        """Connect to the vector backend and make sure the collection exists"""
+        if client is not None:
+            self.client = client
+        elif backend == 'local':
+            self.client = QdrantClient(path=path)
+        else:
+            self.client = QdrantClient(host=QDRANT_HOST, port=int(QDRANT_PORT))
+
+        self.backend = backend
+        # The embedded backend isn't thread-safe; the server handles its own concurrency
+        self._lock = threading.Lock() if backend == 'local' else nullcontext()
+        self.collection_name = collection_name
+        self.embedding_dim = embedding_dim or Config.EMBEDDING_DIMENSION
+        self._ensure_collection()
+
+    def _ensure_collection(self):
+        """Create the collection and its payload indexes if missing"""
+        if self.client.collection_exists(self.collection_name):
+            return
+
+        logger.info(f"Creating question collection: {self.collection_name}")
+        self.client.create_collection(
+            collection_name=self.collection_name,
+            vectors_config=VectorParams(size=self.embedding_dim, distance=Distance.COSINE)
+        )
+
+        # Embedded mode has no payload indexes; filters still work, just unindexed
+        if self.backend != 'local':
+            for field, schema in PAYLOAD_INDEXES.items():
+                self.client.create_payload_index(self.collection_name, field, field_schema=schema)
+
+    @staticmethod
+    def _point(question):
+        """Build the point for a question document"""
+        embedding = decode_embedding(question['embedding'])
+        return PointStruct(
+            id=question_point_id(question['_id']),
+            vector=embedding.tolist(),
+            payload={
+                'question_id': str(question['_id']),
+                'unit_id': str(question.get('unit_id', '')),
+                'year': str(question['year']) if question.get('year') is not None else None,
+                'source_type': question.get('source_type')
+            }
+        )
+
+    def index_question(self, question):
+        """Add or replace one question"""
+        if decode_embedding(question.get('embedding')) is None:
+            return False
+        with self._lock:
+            self.client.upsert(collection_name=self.collection_name, points=[self._point(question)])
+        return True
+
+    def index_questions(self, questions, batch_size=256, max_in_flight=2):
+        """Add or replace many questions, streaming them in batches"""
+        points = (
+            self._point(q) for q in questions
+            if decode_embedding(q.get('embedding')) is not None
+        )
+
+        # The embedded backend gets plain sequential upserts
+        if self.backend == 'local':
+            total = 0
+            for batch in iter_batches(points, batch_size):
+                with self._lock:
+                    self.client.upsert(collection_name=self.collection_name, points=batch)
+                total += len(batch)
+            return total
+
+        return upsert_streaming(
+            self.client, self.collection_name, points,
+            batch_size=batch_size, max_in_flight=max_in_flight
+        )
+
+    def delete_questions(self, question_ids):
+        """Remove questions from the index"""
+        ids = [question_point_id(qid) for qid in question_ids]
+        for batch in iter_batches(ids, 1000):
+            with self._lock:
+                self.client.delete(
+                    collection_name=self.collection_name,
+                    points_selector=PointIdsList(points=batch)
+                )
+
+    def search(self, embedding, limit=5, threshold=None, unit_id=None, source_type=None,
+               exclude_question_id=None):
+        """
+        Find the nearest questions across the archive
+
+        Args:
+            embedding: Query embedding
+            limit (int): Maximum number of matches
+            threshold (float): Minimum cosine similarity
+            unit_id (str): Restrict to one unit
+            source_type (str): Restrict to 'exam' or 'cat'
+            exclude_question_id: Question to leave out (e.g. the query itself)
+
+        Returns:
+            list: Matches with question_id, unit_id, year, source_type and similarity_score
+        """
+        must = []
+        if unit_id:
+            must.append(FieldCondition(key='unit_id', match=MatchValue(value=str(unit_id))))
+        if source_type:
+            must.append(FieldCondition(key='source_type', match=MatchValue(value=source_type)))
+
+        must_not = []
+        if exclude_question_id:
+            must_not.append(FieldCondition(key='question_id', match=MatchValue(value=str(exclude_question_id))))
+
+        query_filter = Filter(must=must or None, must_not=must_not or None) if (must or must_not) else None
+
+        with self._lock:
+            response = self.client.query_points(
+                collection_name=self.collection_name,
+                query=embedding.tolist() if hasattr(embedding, 'tolist') else list(embedding),
+                limit=limit,
+                query_filter=query_filter,
+                score_threshold=threshold,
+                with_payload=True
+            )
+
+        return [
+            {
+                'question_id': point.payload['question_id'],
+                'unit_id': point.payload.get('unit_id'),
+                'year': point.payload.get('year'),
+                'source_type': point.payload.get('source_type'),
+                'similarity_score': point.score
+            }
+            for point in response.points
+        ]
+
+    def sync_from_mongo(self, unit_id=None, batch_size=256):
+        """Index every question with an embedding (optionally for one unit)"""
+        query = {'embedding': {'$ne': None}}
+        if unit_id:
+            query['unit_id'] = ObjectId(unit_id)
+
+        cursor = mongo.db.questions.find(
+            query,
+            {'embedding': 1, 'unit_id': 1, 'year': 1, 'source_type': 1}
+        ).batch_size(batch_size)
+
+        total = self.index_questions(cursor, batch_size=batch_size)
+        logger.info(f"Indexed {total} questions into {self.collection_name}")
+        return total
+
+
+_question_vector_store = None
+_unavailable_until = 0.0
+_store_lock = threading.Lock()
+
+
+def get_question_vector_store():
+    """
+    Return the shared QuestionVectorStore, created on first use
+
+    If the backend can't be reached, None is returned without retrying for
+    QUESTION_VECTOR_RETRY_SECONDS, so callers skip indexing and global search
+    instead of each waiting on the connection. A local store that can't be
+    opened (usually because another worker holds its path) is not retried.
+    """
+    global _question_vector_store, _unavailable_until
+    if _question_vector_store is not None:
+        return _question_vector_store
+
+    with _store_lock:
+        if _question_vector_store is None:
+            if time.monotonic() < _unavailable_until:
+                return None
+            backend = Config.QUESTION_VECTOR_BACKEND
+            try:
+                _question_vector_store = QuestionVectorStore(
+                    backend=backend,
+                    collection_name=Config.QUESTION_COLLECTION,
+                    path=Config.QUESTION_VECTOR_PATH
+                )
+            except Exception as e:
+                if backend == 'local':
+                    _unavailable_until = float('inf')
+                    logger.error(f"Local question vector store unavailable in this process (the local "
+                                 f"backend serves one worker; use 'server' with several): {str(e)}")
+                else:
+                    _unavailable_until = time.monotonic() + Config.QUESTION_VECTOR_RETRY_SECONDS
+                    logger.warning(f"Question vector store unavailable, retrying in "
+                                   f"{Config.QUESTION_VECTOR_RETRY_SECONDS}s: {str(e)}")
+                return None
+    return _question_vector_store
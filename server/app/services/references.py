@@ -0,0 +1,130 @@
+# app/services/references.py
+import os
+import re
+from datetime import datetime
+
+# Every kind of reference marker in one pattern, so a page is scanned once.
+# Every alternative starts with one of '[', '\n' or a superscript digit, which lets
+# the regex engine skip straight to candidate positions instead of trying each
+# character. The text is wrapped in newlines so line starts are always '\n'.
+#   citation  - [12] or [Smith et al., 2020] anywhere in a line
+#   footnote  - a superscript footnote marker anywhere in a line
+#   section   - a whole line reading "References", "Bibliography", ...
+#   numbered  - a line starting like a list reference: "[3] ..." or "12. ..."
+# The numbered check is a lookahead so the rest of its line is still scanned for citations.
+REFERENCE_PATTERN = re.compile(
+    r'[\[\n¹²³⁴⁵⁶⁷⁸⁹](?:'
+    r'(?<=\[)(?P<citation>(?:\d+|\w+\s+et\s+al\.?,\s+\d{4})\])'
+    r'|(?<=\n)[ \t]*(?:'
+    r'(?P<section>references|bibliography|works[ \t]+cited|citations)[ \t]*(?=\n)'
+    r'|(?P<numbered>(?=\[[^\n]*\]|\d[^\n]{0,3}?\.)))'
+    r'|(?<=[¹²³⁴⁵⁶⁷⁸⁹])(?P<footnote>)'
+    r')',
+    re.IGNORECASE
+)
+
+# When a line has several markers, the lowest number decides its type
+REFERENCE_PRIORITY = {
+    'section': 0,
+    'citation': 1,
+    'footnote': 2,
+    'numbered': 3
+}
+
+# Lines after a references header longer than this are taken as bibliography entries
+MIN_BIBLIOGRAPHY_LENGTH = 30
+
+# Title template for each reference type
+REFERENCE_TITLES = {
+    'section': "References Section",
+    'citation': "Citation on page {page}",
+    'footnote': "Footnote on page {page}",
+    'numbered': "Reference on page {page}",
+    'bibliography': "Reference from bibliography"
+}
+
+# Hex digit -> RFC 4122 variant digit (10xx)
+_VARIANT_DIGITS = {digit: '89ab'[int(digit, 16) & 3] for digit in '0123456789abcdef'}
+
+
+def _batch_ids(count):
+    """Generate `count` random UUID4 strings from a single urandom call"""
+    digits = os.urandom(16 * count).hex()
+    ids = []
+    for i in range(0, 32 * count, 32):
+        h = digits[i:i + 32]
+        ids.append(f"{h[:8]}-{h[8:12]}-4{h[13:16]}-{_VARIANT_DIGITS[h[16]]}{h[17:20]}-{h[20:]}")
+    return ids
+
+
+def iter_reference_matches(text):
+    """
+    Scan a page once and yield (type, line) for every reference line, in page order
+
+    Lines over 30 characters that follow a references section header on the
+    same page are reported as bibliography entries.
+    """
+    text = f"\n{text}\n"
+
+    # line start offset -> (priority, type)
+    lines = {}
+    section_end = None
+
+    for match in REFERENCE_PATTERN.finditer(text):
+        kind = match.lastgroup
+        if kind in ('section', 'numbered'):
+            line_start = match.start() + 1
+        else:
+            line_start = text.rfind('\n', 0, match.start()) + 1
+
+        priority = REFERENCE_PRIORITY[kind]
+        if line_start not in lines or priority < lines[line_start][0]:
+            lines[line_start] = (priority, kind)
+
+        if kind == 'section' and section_end is None:
+            section_end = match.end()
+
+    # Bibliography entries have no marker of their own, so walk the lines after the header
+    if section_end is not None:
+        pos = section_end + 1
+        while pos < len(text):
+            end = text.find('\n', pos)
+            if pos not in lines and len(text[pos:end].strip()) > MIN_BIBLIOGRAPHY_LENGTH:
+                lines[pos] = (4, 'bibliography')
+            pos = end + 1
+
+    for line_start in sorted(lines):
+        yield lines[line_start][1], text[line_start:text.find('\n', line_start)].strip()
+
+
+def extract_references(text, page_num, created_at=None):
+    """
+    Extract references from the text of one page
+
+    Args:
+        text (str): Page text
+        page_num (int): 1-based page number
+        created_at (datetime): Timestamp for the whole batch; defaults to now
+
+    Returns:
+        list: References with id, pageNumber, text, title, type and created_at
+    """
+    matches = list(iter_reference_matches(text))
+    if not matches:
+        return []
+
+    created_at = created_at or datetime.now()
+    ids = _batch_ids(len(matches))
+
+    references = []
+    for ref_id, (kind, line) in zip(ids, matches):
+        references.append({
+            'id': ref_id,
+            'pageNumber': page_num,
+            'text': f"References section starts here: {line}" if kind == 'section' else line,
+            'title': REFERENCE_TITLES[kind].format(page=page_num),
+            'type': kind,
+            'created_at': created_at
+        })
+
+    return references
@@ -0,0 +1,112 @@
+# app/services/search_tokens.py
+# Prefix tokens for indexed catalog search (units and past papers)
+#
+# Each searchable document keeps a `search_tokens` array with every prefix of
+# every word of its searchable fields, lower-cased. The array has a multikey
+# B-tree index, so a search for "data struc" becomes
+#   {'search_tokens': {'$all': ['data', 'struc']}}
+# which is answered from the index instead of a regex scan over the
+# collection. User input is only split into words; it never becomes a regex.
+
+import re
+import logging
+from app import mongo
+from app.utils.database import BulkWriter
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r'\w+')
+
+# Longest prefix stored; longer query words are cut to it
+MAX_PREFIX = 15
+
+# Words of one field that are tokenized (long descriptions are cut off)
+MAX_FIELD_WORDS = 200
+
+# Query words used; the rest are ignored
+MAX_QUERY_WORDS = 8
+
+# Searchable fields per collection
+SEARCH_FIELDS = {
+    'units': ('name', 'code', 'description'),
+    'past_papers': ('title', 'topics')
+}
+
+
+def words(text):
+    """Lower-cased words of a text"""
+    return WORD_PATTERN.findall(text.lower()) if isinstance(text, str) else []
+
+
+def _prefixes(word):
+    return (word[:length] for length in range(1, min(len(word), MAX_PREFIX) + 1))
+
+
+def search_tokens(document, fields):
+    """
+    Sorted prefix tokens of a document's searchable fields
+
+    Besides every word, short multi-word values are also tokenized with their
+    words joined, so "CS 101", "CS-101" and "cs101" find each other.
+    """
+    tokens = set()
+    for field in fields:
+        values = document.get(field)
+        for value in values if isinstance(values, list) else [values]:
+            value_words = words(value)[:MAX_FIELD_WORDS]
+            for word in value_words:
+                tokens.update(_prefixes(word))
+            joined = ''.join(value_words)
+            if 1 < len(value_words) and len(joined) <= MAX_PREFIX:
+                tokens.update(_prefixes(joined))
+    return sorted(tokens)
+
+
+def search_filter(search):
+    """
+    Filter matching documents that have a token for every query word
+
+    A multi-word query short enough to be a joined token also matches it, so
+    "CS 101" finds a unit stored as "CS101" as well as the other way round.
+
+    Returns:
+        dict: MongoDB filter, or None if the search has no words
+    """
+    query_words = list(dict.fromkeys(word[:MAX_PREFIX] for word in words(search)))[:MAX_QUERY_WORDS]
+    if not query_words:
+        return None
+    if len(query_words) == 1:
+        return {'search_tokens': query_words[0]}
+
+    every_word = {'search_tokens': {'$all': query_words}}
+    joined = ''.join(query_words)
+    if len(joined) <= MAX_PREFIX:
+        return {'$or': [every_word, {'search_tokens': joined}]}
+    return every_word
+
+
+def unit_search_tokens(unit):
+    return search_tokens(unit, SEARCH_FIELDS['units'])
+
+
+def paper_search_tokens(paper):
+    return search_tokens(paper, SEARCH_FIELDS['past_papers'])
+
+
+def backfill_search_tokens(collection_name, batch_size=500):
+    """
+    (Re)compute search_tokens of every document of a collection
+
+    Returns:
+        int: Number of documents updated
+    """
+    fields = SEARCH_FIELDS[collection_name]
+    collection = mongo.db[collection_name]
+    projection = {field: 1 for field in fields}
+
+    with BulkWriter(collection, batch_size=batch_size) as writer:
+        for document in collection.find({}, projection):
+            writer.update_one({'_id': document['_id']}, {'$set': {'search_tokens': search_tokens(document, fields)}})
+    modified = writer.summary()['modified']
+    logger.info(f"Updated search tokens of {modified} {collection_name} documents")
+    return modified
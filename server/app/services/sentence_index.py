@@ -0,0 +1,173 @@
+# app/services/sentence_index.py
+import re
+import zlib
+import hashlib
+import logging
+from datetime import datetime
+import numpy as np
+from bson.binary import Binary
+from app import mongo
+from app.utils.embeddings import encode_embedding, decode_embedding
+
+logger = logging.getLogger(__name__)
+
+# Sentence boundaries and the shortest sentence worth highlighting
+SENTENCE_PATTERN = re.compile(r'[.!?]+')
+MIN_SENTENCE_LENGTH = 10
+
+# Bump when the tokenization or stored layout changes so old indexes are rebuilt
+SENTENCE_INDEX_VERSION = 1
+
+
+def token_id(token):
+    """Stable 32-bit id of a normalized token (the same in every process)"""
+    return zlib.crc32(token.encode('utf-8'))
+
+
+def token_ids(text):
+    """Sorted unique ids of the lowercased whitespace tokens of a text"""
+    return np.unique(np.fromiter((token_id(t) for t in text.lower().split()), dtype=np.uint32))
+
+
+def content_hash(content):
+    """Hash of note content, used to tell whether an index is stale"""
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def split_sentences(content):
+    """Yield (start, end) offsets of the sentences long enough to highlight"""
+    start = 0
+    for match in SENTENCE_PATTERN.finditer(content):
+        if len(content[start:match.start()].strip()) >= MIN_SENTENCE_LENGTH:
+            yield start, match.start()
+        start = match.end()
+    if len(content[start:].strip()) >= MIN_SENTENCE_LENGTH:
+        yield start, len(content)
+
+
+def _pack(array):
+    return Binary(np.ascontiguousarray(array).tobytes())
+
+
+def _unpack(value, dtype):
+    return np.frombuffer(value, dtype=dtype)
+
+
+def build_sentence_index(note_id, content, encode=None):
+    """
+    Build the sentence index document of a note
+
+    Stores sentence (start, end) offsets into the content, the unique token
+    ids of every sentence as one flat array with per-sentence boundaries,
+    and, when `encode` is given, a matrix of sentence embeddings.
+
+    Args:
+        note_id: ID of the note
+        content (str): Note text
+        encode: Optional callable mapping a list of sentences to embeddings
+
+    Returns:
+        dict: Document for the sentence_indexes collection
+    """
+    offsets = list(split_sentences(content))
+    sentence_tokens = [token_ids(content[start:end]) for start, end in offsets]
+
+    bounds = np.zeros(len(offsets) + 1, dtype=np.int32)
+    if sentence_tokens:
+        bounds[1:] = np.cumsum([len(tokens) for tokens in sentence_tokens])
+    flat = np.concatenate(sentence_tokens) if sentence_tokens else np.zeros(0, dtype=np.uint32)
+
+    embeddings = None
+    if encode is not None and offsets:
+        embeddings = encode_embedding(np.asarray(encode([content[s:e] for s, e in offsets]), dtype=np.float32))
+
+    return {
+        'note_id': str(note_id),
+        'version': SENTENCE_INDEX_VERSION,
+        'content_hash': content_hash(content),
+        'count': len(offsets),
+        'offsets': _pack(np.asarray(offsets, dtype=np.int32).reshape(-1, 2)),
+        'token_ids': _pack(flat.astype(np.uint32)),
+        'token_bounds': _pack(bounds),
+        'embeddings': embeddings,
+        'updated_at': datetime.utcnow()
+    }
+
+
+class SentenceIndex:
+    """Decoded sentence index of one note, with vectorized scoring"""
+
+    def __init__(self, document, content):
+        self.content = content
+        self.count = document['count']
+        self.offsets = _unpack(document['offsets'], np.int32).reshape(-1, 2)
+        self.token_ids = _unpack(document['token_ids'], np.uint32)
+        self.bounds = _unpack(document['token_bounds'], np.int32)
+        self.lengths = np.diff(self.bounds)
+        embeddings = decode_embedding(document.get('embeddings'))
+        self.embeddings = embeddings.reshape(self.count, -1) if embeddings is not None and self.count else None
+
+    def sentence(self, i):
+        start, end = self.offsets[i]
+        return self.content[start:end]
+
+    def overlap_scores(self, query_ids):
+        """Share of each sentence's unique tokens that appear in the query"""
+        if not self.count:
+            return np.zeros(0, dtype=np.float32)
+        hits = np.isin(self.token_ids, query_ids).astype(np.int32)
+        overlap = np.add.reduceat(hits, self.bounds[:-1]) if len(hits) else np.zeros(self.count, dtype=np.int32)
+        return overlap / np.maximum(self.lengths, 1)
+
+    def similarity_scores(self, query_embedding):
+        """Cosine similarity of each sentence to the query embedding"""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norms = np.linalg.norm(self.embeddings, axis=1) * (np.linalg.norm(query) or 1.0)
+        norms[norms == 0] = 1.0
+        return (self.embeddings @ query) / norms
+
+    def top_sentences(self, query_text, query_embedding=None, limit=3):
+        """
+        Best sentences for a query, best first
+
+        Uses embedding similarity when both sides have embeddings, otherwise
+        token overlap. Ties keep document order.
+        """
+        if self.embeddings is not None and query_embedding is not None:
+            scores = self.similarity_scores(query_embedding)
+        else:
+            scores = self.overlap_scores(token_ids(query_text))
+        order = np.argsort(-scores, kind='stable')[:limit]
+        return [self.sentence(i) for i in order]
+
+
+def store_sentence_index(note_id, content, encode=None):
+    """Build and save a note's sentence index, replacing any previous one"""
+    document = build_sentence_index(note_id, content, encode=encode)
+    mongo.db.sentence_indexes.replace_one({'note_id': str(note_id)}, document, upsert=True)
+    return document
+
+
+def load_sentence_indexes(notes, encode=None):
+    """
+    Return {note_id: SentenceIndex} for note documents with content
+
+    Indexes are read in one query. Missing or stale ones (content changed,
+    older layout) are rebuilt and saved on the way.
+    """
+    notes = [note for note in notes if note.get('content')]
+    stored = {
+        document['note_id']: document
+        for document in mongo.db.sentence_indexes.find({'note_id': {'$in': [str(n['_id']) for n in notes]}})
+    }
+
+    indexes = {}
+    for note in notes:
+        note_id = str(note['_id'])
+        document = stored.get(note_id)
+        if (document is None or document.get('version') != SENTENCE_INDEX_VERSION
+                or document.get('content_hash') != content_hash(note['content'])):
+            logger.debug(f"Building sentence index for note {note_id}")
+            document = store_sentence_index(note_id, note['content'], encode=encode)
+        indexes[note_id] = SentenceIndex(document, note['content'])
+    return indexes
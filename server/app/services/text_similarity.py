@@ -0,0 +1,110 @@
+# app/services/text_similarity.py
+import numpy as np
+from app.services.question_index import normalize_rows
+
+# Score dtypes the sparse modes can return
+SCORE_DTYPES = {
+    'float32': np.float32,
+    'float16': np.float16
+}
+
+
+def iter_row_blocks(matrix, block_size=512):
+    """
+    Yield (start, block) where block is rows start..start+block_size of matrix @ matrix.T
+
+    Rows must be normalized. Only one block_size x n slice exists at a time.
+    """
+    n = matrix.shape[0]
+    for start in range(0, n, block_size):
+        yield start, matrix[start:start + block_size] @ matrix.T
+
+
+def mean_similarity(matrix):
+    """Mean of all n x n cosine similarities (diagonal included) without building the matrix"""
+    n = matrix.shape[0]
+    if not n:
+        return 0.0
+    total = matrix.sum(axis=0)
+    return float(total @ total) / (n * n)
+
+
+def top_k_neighbors(vectors, k=10, threshold=None, block_size=512, dtype='float32'):
+    """
+    The k most similar other rows of every row, computed block by block
+
+    Args:
+        vectors: (n, d) embeddings
+        k (int): Neighbors per row
+        threshold (float): Optionally drop neighbors below this similarity
+        block_size (int): Rows per matrix product (memory is O(block_size * n))
+        dtype (str): 'float32' or 'float16' scores
+
+    Returns:
+        list: For every row, [[neighbor_index, score], ...] best first
+    """
+    matrix = normalize_rows(vectors)
+    n = matrix.shape[0]
+    k = min(k, n - 1)
+    if k <= 0:
+        return [[] for _ in range(n)]
+
+    neighbors = []
+    for start, sims in iter_row_blocks(matrix, block_size):
+        rows = np.arange(sims.shape[0])
+        sims[rows, rows + start] = -np.inf  # a row is not its own neighbor
+
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(sims, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1).astype(SCORE_DTYPES[dtype])
+
+        for indices, scores in zip(top.tolist(), top_scores.tolist()):
+            neighbors.append([
+                [index, score] for index, score in zip(indices, scores)
+                if threshold is None or score >= threshold
+            ])
+
+    return neighbors
+
+
+def threshold_edges(vectors, threshold=0.8, block_size=512, max_edges=None, dtype='float32'):
+    """
+    Pairs (i < j) with similarity >= threshold, computed block by block
+
+    Returns:
+        tuple: ([[i, j, score], ...] strongest first, truncated) where truncated
+        is True if more than max_edges pairs qualified
+    """
+    matrix = normalize_rows(vectors)
+    edges_i, edges_j, edges_s = [], [], []
+    pruned = False
+
+    for start, sims in iter_row_blocks(matrix, block_size):
+        # Strict upper triangle only
+        sims[np.tril_indices(sims.shape[0], k=start, m=sims.shape[1])] = -np.inf
+        rows, cols = np.nonzero(sims >= threshold)
+        edges_i.append(rows + start)
+        edges_j.append(cols)
+        edges_s.append(sims[rows, cols])
+
+        # Keep the running edge list bounded to the strongest max_edges
+        if max_edges is not None and sum(len(s) for s in edges_s) > 2 * max_edges:
+            edges_i, edges_j, edges_s = _strongest(edges_i, edges_j, edges_s, max_edges)
+            pruned = True
+
+    if not edges_s:
+        return [], False
+
+    i, j, s = (np.concatenate(a) for a in (edges_i, edges_j, edges_s))
+    truncated = pruned or (max_edges is not None and len(s) > max_edges)
+    order = np.argsort(-s, kind='stable')[:max_edges]
+    scores = s[order].astype(SCORE_DTYPES[dtype]).tolist()
+    return [[a, b, c] for a, b, c in zip(i[order].tolist(), j[order].tolist(), scores)], truncated
+
+
+def _strongest(edges_i, edges_j, edges_s, limit):
+    i, j, s = (np.concatenate(a) for a in (edges_i, edges_j, edges_s))
+    keep = np.argpartition(-s, limit - 1)[:limit] if len(s) > limit else slice(None)
+    return [i[keep]], [j[keep]], [s[keep]]
@@ -0,0 +1,136 @@
+# app/services/toc.py
+import re
+import logging
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+# Headings longer than this are almost always numbered sentences, not titles
+MAX_TITLE_LENGTH = 120
+
+# Upper bound on entries kept for a note, so the stored TOC stays small
+MAX_TOC_ENTRIES = 500
+
+# One pattern for every heading shape, applied to a whole page in a single scan.
+# Alternatives are ordered so that "2.1 Title" is a section, not chapter "2." + ".1 Title":
+#   Chapter 3: Title / CHAPTER 3. Title   -> chapter
+#   2.1 Title / 2.1. Title / 2.1: Title    -> section
+#   3. Title / 3: Title                    -> chapter
+#   A. Title                               -> section
+HEADING_PATTERN = re.compile(
+    r'^[ \t]*(?:'
+    r'chapter[ \t]+\d+[.:][ \t]+(?P<chapter>\S[^\n]*?)'
+    r'|\d+\.\d+[.:]?[ \t]+(?P<section>\S[^\n]*?)'
+    r'|\d+[.:][ \t]+(?P<numbered>\S[^\n]*?)'
+    r'|[A-Z]\.[ \t]+(?P<lettered>\S[^\n]*?)'
+    r')[ \t]*$',
+    re.IGNORECASE | re.MULTILINE
+)
+
+# Heading level for each named group
+HEADING_LEVELS = {
+    'chapter': 1,
+    'numbered': 1,
+    'section': 2,
+    'lettered': 2
+}
+
+
+def match_headings(text, page_num):
+    """
+    Find chapter and section headings on a page
+
+    Args:
+        text (str): Page text
+        page_num (int): 1-based page number
+
+    Yields:
+        dict: Entry with level, title and page
+    """
+    for match in HEADING_PATTERN.finditer(text):
+        kind = match.lastgroup
+        title = match.group(kind).strip()
+        if len(title) > MAX_TITLE_LENGTH:
+            continue
+        yield {'level': HEADING_LEVELS[kind], 'title': title, 'page': page_num}
+
+
+def extract_outline(doc):
+    """
+    Read the PDF's embedded outline (bookmarks)
+
+    Args:
+        doc: Open fitz document
+
+    Returns:
+        list: Entries with level, title and page; empty if the PDF has no outline
+    """
+    try:
+        outline = doc.get_toc(simple=True)
+    except Exception as e:
+        logger.warning(f"Could not read PDF outline: {str(e)}")
+        return []
+
+    entries = []
+    for level, title, page in outline:
+        title = ' '.join(str(title).split())
+        # Outline items can point nowhere (page -1) or at external targets
+        if not title or page < 1:
+            continue
+        entries.append({'level': level, 'title': title[:MAX_TITLE_LENGTH], 'page': page})
+        if len(entries) >= MAX_TOC_ENTRIES:
+            break
+
+    return entries
+
+
+class TocCollector:
+    """
+    Build a note's table of contents during ingestion
+
+    Prefers the embedded outline; when there isn't one, headings are matched
+    on each page as the text streams past, so the document is never read twice.
+
+    Usage:
+        collector = TocCollector.from_document(doc)
+        pages = collector.watch(iter_pdf_pages(file_path))
+        ...consume pages...
+        toc = collector.result()
+    """
+
+    def __init__(self, outline=None):
+        self.outline = outline or []
+        self.headings = []
+
+    @classmethod
+    def from_document(cls, doc):
+        """Create a collector seeded with the document's outline"""
+        return cls(extract_outline(doc))
+
+    @property
+    def source(self):
+        """'outline' when the PDF has bookmarks, 'headings' otherwise"""
+        return 'outline' if self.outline else 'headings'
+
+    def watch(self, pages):
+        """Pass (page_num, text) pairs through, collecting headings if there's no outline"""
+        for page_num, text in pages:
+            if not self.outline and len(self.headings) < MAX_TOC_ENTRIES:
+                self.headings.extend(match_headings(text, page_num))
+            yield page_num, text
+
+    def result(self):
+        """Return the compact TOC as {'source': ..., 'entries': [...]}"""
+        entries = self.outline or self.headings[:MAX_TOC_ENTRIES]
+        return {'source': self.source, 'entries': entries}
+
+
+def build_toc(file_path):
+    """Build the TOC for a PDF file in one pass"""
+    with fitz.open(file_path) as doc:
+        collector = TocCollector.from_document(doc)
+        if collector.outline:
+            return collector.result()
+        for _ in collector.watch((page_num, page.get_text()) for page_num, page in enumerate(doc, 1)):
+            pass
+    return collector.result()
@@ -0,0 +1,201 @@
+# app/services/topic_stats.py
+# Materialized per-unit topic frequencies of past papers (unit_topic_stats)
+#
+# One document per unit:
+#   {_id: unit_id, paper_count, topics: {topic: papers},
+#    years: {year: {topic: papers}}, year_papers: {year: papers}, updated_at}
+# kept current with $inc deltas as papers change, and rebuilt with a $merge
+# aggregation for backfills.
+
+import logging
+from collections import Counter
+from datetime import datetime
+from bson import ObjectId
+from app import mongo
+
+logger = logging.getLogger(__name__)
+
+# Topic names become field names, so '.' and '$' are swapped for full-width look-alikes
+KEY_ESCAPES = {'.': '．', '$': '＄'}
+
+
+def topic_key(topic):
+    """Field-name-safe form of a topic"""
+    for char, escape in KEY_ESCAPES.items():
+        topic = topic.replace(char, escape)
+    return topic
+
+
+def topic_name(key):
+    """Inverse of topic_key"""
+    for char, escape in KEY_ESCAPES.items():
+        key = key.replace(escape, char)
+    return key
+
+
+def _paper_increments(paper, sign):
+    """$inc entries contributed by one paper (sign=1 to add it, -1 to remove it)"""
+    year = topic_key(str(paper.get('year')))
+    increments = Counter({'paper_count': sign, f'year_papers.{year}': sign})
+    for topic in set(paper.get('topics') or []):
+        if isinstance(topic, str) and topic:
+            key = topic_key(topic)
+            increments[f'topics.{key}'] += sign
+            increments[f'years.{year}.{key}'] += sign
+    return increments
+
+
+def apply_paper_change(old_paper=None, new_paper=None):
+    """
+    Update unit_topic_stats for a paper that was added, edited or removed
+
+    Pass the paper before the change (None for uploads) and after it (None
+    for deletions). Only the difference is written, as $inc on the unit's
+    document(s). Units without a stats document are left alone; theirs is
+    built from scratch on first read.
+    """
+    by_unit = {}
+    for paper, sign in ((old_paper, -1), (new_paper, 1)):
+        if paper and paper.get('unit_id'):
+            by_unit.setdefault(ObjectId(paper['unit_id']), Counter()).update(_paper_increments(paper, sign))
+
+    for unit_id, increments in by_unit.items():
+        increments = {field: count for field, count in increments.items() if count}
+        if not increments:
+            continue
+        mongo.db.unit_topic_stats.update_one(
+            {'_id': unit_id},
+            {'$inc': increments, '$set': {'updated_at': datetime.utcnow()}}
+        )
+
+
+def _escaped(expression):
+    """Aggregation expression applying topic_key to a string expression"""
+    for char, escape in KEY_ESCAPES.items():
+        expression = {'$replaceAll': {'input': expression, 'find': char, 'replacement': escape}}
+    return expression
+
+
+def _count_topics(array_expression):
+    """Aggregation expression turning an array of topics into {topic_key: occurrences}"""
+    return {'$arrayToObject': {'$map': {
+        'input': {'$setUnion': [array_expression, []]},
+        'as': 'topic',
+        'in': {
+            'k': _escaped('$$topic'),
+            'v': {'$size': {'$filter': {'input': array_expression, 'cond': {'$eq': ['$$this', '$$topic']}}}}
+        }
+    }}}
+
+
+def rebuild_unit_topic_stats(unit_id=None):
+    """
+    Recompute unit_topic_stats from past_papers with one aggregation
+
+    Results are written with $merge, replacing each unit's document, so the
+    job is safe to re-run. Covers one unit or, with no unit_id, all of them.
+    """
+    match = {'unit_id': ObjectId(unit_id)} if unit_id else {'unit_id': {'$ne': None}}
+    flatten = {'$reduce': {'input': '$lists', 'initialValue': [], 'in': {'$concatArrays': ['$$value', '$$this']}}}
+
+    pipeline = [
+        {'$match': match},
+        {'$project': {
+            'unit_id': 1,
+            # Same key as str(year) in apply_paper_change
+            'year': _escaped({'$ifNull': [{'$toString': '$year'}, 'None']}),
+            # A topic counts once per paper
+            'topics': {'$filter': {
+                'input': {'$setUnion': [{'$ifNull': ['$topics', []]}, []]},
+                'cond': {'$and': [{'$eq': [{'$type': '$$this'}, 'string']}, {'$ne': ['$$this', '']}]}
+            }}
+        }},
+        {'$group': {'_id': {'unit_id': '$unit_id', 'year': '$year'}, 'papers': {'$sum': 1}, 'lists': {'$push': '$topics'}}},
+        {'$project': {'papers': 1, 'all': flatten}},
+        {'$group': {
+            '_id': '$_id.unit_id',
+            'paper_count': {'$sum': '$papers'},
+            'year_papers': {'$push': {'k': '$_id.year', 'v': '$papers'}},
+            'years': {'$push': {'k': '$_id.year', 'v': _count_topics('$all')}},
+            'lists': {'$push': '$all'}
+        }},
+        {'$project': {
+            'paper_count': 1,
+            'topics': _count_topics(flatten),
+            'years': {'$arrayToObject': '$years'},
+            'year_papers': {'$arrayToObject': '$year_papers'},
+            'updated_at': '$$NOW'
+        }},
+        {'$merge': {'into': 'unit_topic_stats', 'on': '_id', 'whenMatched': 'replace', 'whenNotMatched': 'insert'}}
+    ]
+    mongo.db.past_papers.aggregate(pipeline)
+
+    # Units whose papers are all gone keep no stale document
+    if unit_id and not mongo.db.past_papers.find_one(match, {'_id': 1}):
+        mongo.db.unit_topic_stats.delete_one({'_id': ObjectId(unit_id)})
+
+    logger.info(f"Rebuilt topic stats for {'unit ' + str(unit_id) if unit_id else 'all units'}")
+
+
+def get_unit_topic_stats(unit_id):
+    """The unit's stats document, built on first request if it doesn't exist yet"""
+    stats = mongo.db.unit_topic_stats.find_one({'_id': ObjectId(unit_id)})
+    if stats is None:
+        rebuild_unit_topic_stats(unit_id)
+        stats = mongo.db.unit_topic_stats.find_one({'_id': ObjectId(unit_id)})
+    return stats
+
+
+def recent_years(stats, min_papers=5):
+    """Keys of the most recent years that together hold at least min_papers papers, newest first"""
+    years = []
+    papers = 0
+    # Numeric years newest first; papers without a year come last
+    for year in sorted((stats or {}).get('year_papers', {}), key=lambda y: (y.isdigit(), y), reverse=True):
+        years.append(year)
+        papers += stats['year_papers'][year]
+        if papers >= min_papers:
+            break
+    return years
+
+
+def recent_topic_counts(stats, min_papers=5):
+    """
+    {topic: papers} over the most recent years that together hold at least
+    min_papers papers (see recent_years), most frequent first
+    """
+    counts = Counter()
+    for year in recent_years(stats, min_papers):
+        for key, count in stats.get('years', {}).get(year, {}).items():
+            if count > 0:
+                counts[topic_name(key)] += count
+    return dict(counts.most_common())
+
+
+def year_filter(year_keys):
+    """past_papers filter on the years behind year keys (str(year), 'None' for no year)"""
+    values = []
+    for key in year_keys:
+        year = topic_name(key)
+        if year == 'None':
+            values.append(None)
+        else:
+            values.append(year)
+            if year.lstrip('-').isdigit():
+                values.append(int(year))
+    return {'year': {'$in': values}}
+
+
+def topic_frequencies(counts):
+    """[{'topic', 'count'}, ...] sorted by count, as returned by the API"""
+    return [{'topic': topic, 'count': count} for topic, count in counts.items() if count > 0]
+
+
+def topic_trends(stats):
+    """Per-year series: {topic: [{'year', 'count'}, ...]} in year order"""
+    trends = {}
+    for year in sorted((stats or {}).get('years', {})):
+        for key, count in stats['years'][year].items():
+            if count > 0:
+                trends.setdefault(topic_name(key), []).append({'year': topic_name(year), 'count': count})
+    return trends
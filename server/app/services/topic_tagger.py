@@ -0,0 +1,161 @@
+# app/services/topic_tagger.py
+import os
+import re
+import time
+import bisect
+import logging
+import threading
+from app import mongo
+
+logger = logging.getLogger(__name__)
+
+# Topics every faculty's vocabulary starts from
+DEFAULT_TOPICS = [
+    "algorithm", "data structure", "function", "class", "method",
+    "inheritance", "polymorphism", "encapsulation", "abstraction",
+    "database", "SQL", "normalization", "transaction", "ACID",
+    "network", "protocol", "TCP/IP", "OSI", "security",
+    "cryptography", "hash", "encryption", "authentication",
+    "operating system", "process", "thread", "scheduling", "memory",
+    "file system", "distributed", "concurrent", "parallel"
+]
+
+# Joins batch texts; contains no word characters, so no topic can span it
+BATCH_SEPARATOR = '\n\x00\n'
+
+
+class TopicTagger:
+    """
+    Finds vocabulary topics in text with one compiled pattern
+
+    The pattern is a single lookahead alternation, longest topic first, so
+    one scan tries every start position once instead of running a search per
+    topic. A match also implies the shorter topics it contains ("hash table"
+    contains "hash"), which keeps results identical to searching for every
+    topic separately.
+    """
+
+    def __init__(self, topics):
+        # First spelling wins; matching is case-insensitive
+        self.topics = []
+        self._canonical = {}
+        for topic in topics:
+            topic = topic.strip() if isinstance(topic, str) else ''
+            if topic and topic.lower() not in self._canonical:
+                self._canonical[topic.lower()] = topic
+                self.topics.append(topic)
+        self._order = {topic: i for i, topic in enumerate(self.topics)}
+
+        if self.topics:
+            alternatives = '|'.join(re.escape(t.lower()) for t in sorted(self._canonical, key=len, reverse=True))
+            self.pattern = re.compile(rf'(?<!\w)(?=({alternatives})(?!\w))', re.IGNORECASE)
+        else:
+            self.pattern = None
+
+        self._implied = {
+            key: {
+                self._canonical[other] for other in self._canonical
+                if other != key and other in key and re.search(rf'(?<!\w){re.escape(other)}(?!\w)', key)
+            }
+            for key in self._canonical
+        }
+
+    def _sorted(self, found):
+        return sorted(found, key=self._order.__getitem__)
+
+    def _add_match(self, found, match):
+        key = match.group(1).lower()
+        found.add(self._canonical[key])
+        found.update(self._implied[key])
+
+    def tag(self, text):
+        """Topics found in one text, in vocabulary order"""
+        if not self.pattern or not text:
+            return []
+        found = set()
+        for match in self.pattern.finditer(text):
+            self._add_match(found, match)
+        return self._sorted(found)
+
+    def tag_many(self, texts):
+        """
+        Topics of many texts (questions, paper pages, ...) in one scan
+
+        Returns:
+            list: One topic list per text
+        """
+        texts = [text or '' for text in texts]
+        results = [set() for _ in texts]
+        if not self.pattern or not texts:
+            return [[] for _ in texts]
+
+        starts = []
+        position = 0
+        for text in texts:
+            starts.append(position)
+            position += len(text) + len(BATCH_SEPARATOR)
+
+        for match in self.pattern.finditer(BATCH_SEPARATOR.join(texts)):
+            self._add_match(results[bisect.bisect_right(starts, match.start()) - 1], match)
+
+        return [self._sorted(found) for found in results]
+
+    def count(self, texts):
+        """{topic: number of texts it appears in}, most frequent first"""
+        counts = {}
+        for topics in self.tag_many(texts):
+            for topic in topics:
+                counts[topic] = counts.get(topic, 0) + 1
+        return dict(sorted(counts.items(), key=lambda item: item[1], reverse=True))
+
+
+class TopicTaggerRegistry:
+    """
+    One compiled TopicTagger per faculty
+
+    A faculty's vocabulary is DEFAULT_TOPICS plus the keywords of its units.
+    Taggers are rebuilt after `ttl` seconds so keyword edits are picked up.
+    """
+
+    def __init__(self, ttl=600, defaults=None):
+        self.ttl = ttl
+        self.defaults = list(DEFAULT_TOPICS if defaults is None else defaults)
+        self._taggers = {}
+        self._lock = threading.Lock()
+
+    def vocabulary(self, faculty_code=None):
+        """Default topics followed by the faculty's unit keywords"""
+        # Units created through the API store the code as facultyCode
+        query = {'$or': [{'faculty_code': faculty_code}, {'facultyCode': faculty_code}]} if faculty_code else {}
+        keywords = [k for k in mongo.db.units.distinct('keywords', query) if isinstance(k, str)]
+        return self.defaults + sorted(keywords)
+
+    def get(self, faculty_code=None):
+        """Return the faculty's tagger, compiling it when missing or expired"""
+        key = faculty_code or ''
+        with self._lock:
+            entry = self._taggers.get(key)
+            if entry and time.monotonic() - entry[0] < self.ttl:
+                return entry[1]
+
+        tagger = TopicTagger(self.vocabulary(faculty_code))
+        logger.debug(f"Compiled {len(tagger.topics)} topics for faculty '{key or 'all'}'")
+        with self._lock:
+            self._taggers[key] = (time.monotonic(), tagger)
+        return tagger
+
+    def invalidate(self, faculty_code=None):
+        """Drop one faculty's tagger, or all of them"""
+        with self._lock:
+            if faculty_code is None:
+                self._taggers.clear()
+            else:
+                self._taggers.pop(faculty_code, None)
+
+
+topic_taggers = TopicTaggerRegistry(ttl=int(os.environ.get('TOPIC_TAGGER_TTL', 600)))
+
+
+def get_topic_tagger(faculty_code=None):
+    """Return the shared tagger for a faculty (or for all units)"""
+    return topic_taggers.get(faculty_code)
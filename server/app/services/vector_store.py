@@ -5,6 +5,7 @@ import numpy as np
 import uuid
 import logging
 from pdf_processor import PDFProcessor
+from app.services.ingestion import upsert_streaming
 from typing import List, Dict, Any, Optional, Union
 
 # Setup logging
@@ -39,40 +40,59 @@ class VectorStore:
                 )
             )
     
-    def index_document(self, note_id: str, text_by_page: Dict[int, str], metadata: Dict[str, Any]) -> bool:
+    def index_document(self, note_id: str, text_by_page: Dict[int, str], metadata: Dict[str, Any],
+                       batch_size: int = 100, max_in_flight: int = 2) -> bool:
         """
         Index document text in the vector store
         
         Args:
             note_id (str): Unique identifier for the note
-            text_by_page (dict): Dictionary mapping page numbers to text content
+            text_by_page (dict): Dictionary mapping page numbers to text content,
+                or any iterable of (page_num, text) pairs for streaming ingestion
             metadata (dict): Additional metadata for the document
+            batch_size (int): Number of chunks embedded and upserted per batch
+            max_in_flight (int): Maximum number of upsert batches pending at once
             
         Returns:
             bool: Success status
         """
         try:
-            # Generate embeddings for document chunks
-            embeddings_data = self.pdf_processor._generate_embeddings(text_by_page)
+            pages = text_by_page.items() if isinstance(text_by_page, dict) else text_by_page
+            
+            # Embedding batches are produced lazily and turned into points as they arrive
+            embedding_batches = self.pdf_processor.iter_embedding_batches(pages, batch_size=batch_size)
+            points = self._iter_points(note_id, embedding_batches, metadata)
+            
+            total = upsert_streaming(
+                self.client,
+                self.collection_name,
+                points,
+                batch_size=batch_size,
+                max_in_flight=max_in_flight
+            )
             
-            if not embeddings_data or 'embeddings' not in embeddings_data:
+            if not total:
                 logger.warning(f"No embeddings generated for note: {note_id}")
                 return False
             
-            # Prepare points for Qdrant
-            points = []
+            logger.info(f"Indexed {total} chunks for note: {note_id}")
+            return True
             
-            for i, (embedding, chunk_metadata) in enumerate(zip(
-                embeddings_data['embeddings'], 
-                embeddings_data['metadata']
-            )):
+        except Exception as e:
+            logger.error(f"Error indexing document: {str(e)}")
+            return False
+    
+    def _iter_points(self, note_id: str, embedding_batches, metadata: Dict[str, Any]):
+        """Turn (embeddings, chunk_metadata) batches into Qdrant points"""
+        i = 0
+        for embeddings, chunk_metadata_batch in embedding_batches:
+            for embedding, chunk_metadata in zip(embeddings, chunk_metadata_batch):
                 # Create a unique ID for this chunk
                 chunk_id = f"{note_id}_{chunk_metadata['page']}_{i}"
                 
-                # Create the point
-                point = PointStruct(
+                yield PointStruct(
                     id=chunk_id,
-                    vector=embedding,
+                    vector=embedding.tolist(),
                     payload={
                         "note_id": note_id,
                         "page": chunk_metadata['page'],
@@ -87,24 +107,7 @@ class VectorStore:
                         "type": metadata.get('type', 'notes')
                     }
                 )
-                
-                points.append(point)
-            
-            # Upsert points to Qdrant in batches
-            batch_size = 100
-            for i in range(0, len(points), batch_size):
-                batch = points[i:i+batch_size]
-                self.client.upsert(
-                    collection_name=self.collection_name,
-                    points=batch
-                )
-            
-            logger.info(f"Indexed {len(points)} chunks for note: {note_id}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error indexing document: {str(e)}")
-            return False
+                i += 1
     
     def search(self, 
                query: str, 
@@ -8,7 +8,10 @@ import hashlib
 from functools import wraps
 from datetime import datetime, timedelta
 import os
+import time
 import logging
+import threading
+from collections import OrderedDict
 
 logger = logging.getLogger(__name__)
 
@@ -152,6 +155,42 @@ class CacheService:
 # Global cache instance
 cache = CacheService()
 
+class FallbackCache:
+    """
+    Values cached for `ttl` seconds in Redis when it is available, so every
+    worker shares them, and in a small in-process LRU otherwise
+    """
+    
+    def __init__(self, ttl, max_local_entries=256, backend=None):
+        self.ttl = ttl
+        self.max_local_entries = max_local_entries
+        self.backend = backend or cache
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """Cached value, or None"""
+        if self.backend.available:
+            return self.backend.get(key)
+        with self._lock:
+            entry = self._local.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._local.move_to_end(key)
+                return entry[1]
+            self._local.pop(key, None)
+        return None
+    
+    def set(self, key, value):
+        """Cache a value for `ttl` seconds"""
+        if self.backend.available:
+            self.backend.set(key, value, self.ttl)
+            return
+        with self._lock:
+            self._local[key] = (time.monotonic() + self.ttl, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_local_entries:
+                self._local.popitem(last=False)
+
 def cached(ttl=None, key_func=None):
     """Decorator for caching function results"""
     def decorator(func):
@@ -2,11 +2,16 @@
 # Database utilities and transaction support
 
 from contextlib import contextmanager
-from pymongo import MongoClient
-from pymongo.errors import PyMongoError
+from pymongo import MongoClient, InsertOne, UpdateOne, UpdateMany, ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError, BulkWriteError
+from bson import json_util
 from app import mongo
-from .error_handler import AppError
+from app.config import Config
+from .error_handler import AppError, ValidationError
+from .cache import FallbackCache
 from datetime import datetime, timedelta
+import base64
+import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
@@ -74,76 +79,300 @@ def safe_delete_one(collection, query, error_message="Failed to delete document"
         logger.error(f"Database delete failed: {str(e)}")
         raise AppError(error_message, 500)
 
-def paginate_query(collection, query, page=1, limit=20, sort=None):
+def keyset_sort(sort=None):
+    """
+    Normalize a sort spec to [(field, direction), ...] ending with _id
+
+    Accepts a field name, a (field, direction) pair or a list of pairs. The
+    _id tiebreaker makes the order total, which keyset cursors rely on.
+    """
+    if not sort:
+        sort = []
+    elif isinstance(sort, str):
+        sort = [(sort, ASCENDING)]
+    elif isinstance(sort, tuple):
+        sort = [sort]
+    sort = [(field, direction) for field, direction in sort]
+    if not any(field == '_id' for field, _ in sort):
+        sort.append(('_id', sort[-1][1] if sort else ASCENDING))
+    return sort
+
+def encode_cursor(document, sort):
+    """Opaque cursor pointing just after `document` in `sort` order"""
+    payload = {'s': [field for field, _ in sort], 'v': [document.get(field) for field, _ in sort]}
+    return base64.urlsafe_b64encode(json_util.dumps(payload).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, sort):
+    """Sort values stored in a cursor; raises ValidationError if it doesn't fit `sort`"""
+    try:
+        payload = json_util.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        values = payload['v']
+        fields = payload['s']
+    except Exception:
+        raise ValidationError("Invalid cursor")
+    if fields != [field for field, _ in sort] or len(values) != len(sort):
+        raise ValidationError("Cursor does not match the sort order")
+    return values
+
+def keyset_filter(sort, values):
+    """
+    Filter for documents after the cursor position `values` in `sort` order
+
+    Missing and null values sort before everything else, so they are matched
+    explicitly: comparison operators never match them.
+    """
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        value = values[i]
+        equal = {f: values[j] for j, (f, _) in enumerate(sort[:i])}
+        if value is None:
+            if direction == ASCENDING:
+                clauses.append({**equal, field: {'$ne': None}})
+            continue
+        after = {field: {'$gt' if direction == ASCENDING else '$lt': value}}
+        if direction == DESCENDING:
+            after = {'$or': [after, {field: None}]}
+        clauses.append({**equal, **after})
+    return {'$or': clauses} if clauses else {'_id': {'$exists': False}}
+
+def fetch_page(collection, query, sort=None, limit=20, page=1, cursor=None, projection=None):
+    """
+    Fetch one page of documents by page number or keyset cursor
+
+    With a cursor the query resumes from the last document of the previous
+    page using the sort index, so every page costs the same. Page numbers
+    still work for shallow pages; offsets beyond MAX_PAGE_OFFSET must use
+    the cursor instead. `projection` must be an inclusion projection.
+
+    Returns:
+        tuple: (documents, next_cursor) where next_cursor is None on the last page
+    """
+    sort = keyset_sort(sort)
+    if cursor:
+        after = keyset_filter(sort, decode_cursor(cursor, sort))
+        query = {'$and': [query, after]} if query else after
+        skip = 0
+    else:
+        skip = (page - 1) * limit
+        if skip > Config.MAX_PAGE_OFFSET:
+            raise ValidationError("Page is too deep; follow next_cursor instead")
+
+    # The cursor needs the sort values even when the projection leaves them out
+    hidden = []
+    if projection:
+        hidden = [field for field, _ in sort if field not in projection]
+        projection = {**projection, **{field: 1 for field in hidden}}
+
+    documents = list(collection.find(query, projection).sort(sort).skip(skip).limit(limit + 1))
+    next_cursor = encode_cursor(documents[limit - 1], sort) if len(documents) > limit else None
+    documents = documents[:limit]
+    for document in documents:
+        for field in hidden:
+            document.pop(field, None)
+    return documents, next_cursor
+
+def _normalize_filter(value):
+    """Filter with $in/$nin/$all lists sorted, so equivalent filters share a key"""
+    if isinstance(value, dict):
+        return {
+            k: sorted((_normalize_filter(v) for v in value[k]), key=repr)
+            if k in ('$in', '$nin', '$all') and isinstance(value[k], list) else _normalize_filter(value[k])
+            for k in value
+        }
+    if isinstance(value, list):
+        return [_normalize_filter(v) for v in value]
+    return value
+
+class TotalCounter:
+    """
+    Totals for paginated lists without a full count on every page
+
+    Unfiltered totals come from the collection metadata
+    (estimated_document_count). Filtered totals are exact counts cached for
+    `ttl` seconds per collection and normalized filter, in Redis when it is
+    available and in a small in-process LRU otherwise.
+    """
+
+    def __init__(self, ttl=30, max_local_entries=1024):
+        self.ttl = ttl
+        self._cache = FallbackCache(ttl, max_local_entries)
+
+    def key(self, collection, query):
+        digest = hashlib.md5(json_util.dumps(_normalize_filter(query), sort_keys=True).encode()).hexdigest()
+        return f"count:{collection.name}:{digest}"
+
+    def count(self, collection, query=None):
+        """Total number of documents matching query"""
+        if not query:
+            return collection.estimated_document_count()
+
+        key = self.key(collection, query)
+        total = self._cache.get(key)
+        if total is None:
+            total = collection.count_documents(query)
+            self._cache.set(key, total)
+        return total
+
+total_counter = TotalCounter(ttl=Config.COUNT_CACHE_TTL)
+
+def count_total(collection, query=None, include_total=True):
+    """Total for a paginated list, or None when the client opted out with include_total=false"""
+    return total_counter.count(collection, query) if include_total else None
+
+def page_count(total, limit):
+    """Number of pages of `limit` documents, or None when the total is unknown"""
+    return None if total is None else (total + limit - 1) // limit
+
+def paginate_query(collection, query, page=1, limit=20, sort=None, cursor=None, include_total=True):
     """Execute paginated query with consistent error handling"""
     try:
-        # Get total count
-        total_count = collection.count_documents(query)
+        # Get total count (estimated or cached; skipped when not wanted)
+        total_count = count_total(collection, query, include_total)
         
         # Calculate pagination
-        skip = (page - 1) * limit
-        total_pages = (total_count + limit - 1) // limit
+        total_pages = page_count(total_count, limit)
         
         # Execute query
-        cursor = collection.find(query).skip(skip).limit(limit)
-        
-        if sort:
-            cursor = cursor.sort(sort)
-        
-        documents = list(cursor)
+        documents, next_cursor = fetch_page(collection, query, sort, limit, page=page, cursor=cursor)
         
         return {
             'documents': documents,
             'pagination': {
                 'total': total_count,
-                'page': page,
+                'page': None if cursor else page,
                 'limit': limit,
                 'pages': total_pages,
-                'has_next': page < total_pages,
-                'has_prev': page > 1
+                'has_next': next_cursor is not None,
+                'has_prev': bool(cursor) or page > 1,
+                'next_cursor': next_cursor
             }
         }
     except PyMongoError as e:
         logger.error(f"Paginated query failed: {str(e)}")
         raise AppError("Database query failed", 500)
 
+class BulkWriter:
+    """
+    Buffer write operations and send them to MongoDB in unordered batches
+
+    Operations are flushed with a single bulk_write round-trip whenever the
+    buffer reaches batch_size, and once more when the writer is closed (or
+    its `with` block exits). Write errors from every batch are aggregated
+    instead of aborting the remaining writes.
+
+    Usage:
+        with BulkWriter(db.references) as writer:
+            for ref in references:
+                writer.insert(ref)
+    """
+
+    def __init__(self, collection, batch_size=1000, raise_on_error=False):
+        self.collection = collection
+        self.batch_size = max(int(batch_size), 1)
+        self.raise_on_error = raise_on_error
+        self._operations = []
+        self._submitted = 0
+
+        self.inserted_count = 0
+        self.matched_count = 0
+        self.modified_count = 0
+        self.upserted_count = 0
+        self.deleted_count = 0
+        self.round_trips = 0
+        self.write_errors = []
+
+    def add(self, operation):
+        """Queue any pymongo write operation (InsertOne, UpdateOne, ...)"""
+        self._operations.append(operation)
+        if len(self._operations) >= self.batch_size:
+            self.flush()
+
+    def insert(self, document):
+        """Queue a document insert; `_id` is assigned in place when the batch is sent"""
+        self.add(InsertOne(document))
+
+    def update_one(self, query, update, upsert=False):
+        """Queue a single-document update"""
+        self.add(UpdateOne(query, update, upsert=upsert))
+
+    def update_many(self, query, update, upsert=False):
+        """Queue a multi-document update"""
+        self.add(UpdateMany(query, update, upsert=upsert))
+
+    def flush(self):
+        """Send the buffered operations in one unordered bulk_write"""
+        if not self._operations:
+            return
+
+        operations, self._operations = self._operations, []
+        offset = self._submitted
+        self._submitted += len(operations)
+        self.round_trips += 1
+
+        try:
+            result = self.collection.bulk_write(operations, ordered=False)
+            self._add_counts(result.bulk_api_result)
+        except BulkWriteError as e:
+            # Unordered mode: everything except the failed operations was applied
+            self._add_counts(e.details)
+            for error in e.details.get('writeErrors', []):
+                error = dict(error)
+                error['index'] = offset + error.get('index', 0)
+                error.pop('op', None)
+                self.write_errors.append(error)
+            logger.error(f"Bulk write to {self.collection.name} had "
+                         f"{len(e.details.get('writeErrors', []))} errors")
+        except PyMongoError as e:
+            logger.error(f"Bulk write to {self.collection.name} failed: {str(e)}")
+            raise AppError("Database bulk write failed", 500)
+
+    def _add_counts(self, details):
+        self.inserted_count += details.get('nInserted', 0)
+        self.matched_count += details.get('nMatched', 0)
+        self.modified_count += details.get('nModified', 0)
+        self.upserted_count += details.get('nUpserted', 0)
+        self.deleted_count += details.get('nRemoved', 0)
+
+    def close(self):
+        """Flush remaining operations and return a summary of the writes"""
+        self.flush()
+
+        if self.write_errors and self.raise_on_error:
+            raise AppError(
+                f"{len(self.write_errors)} bulk write operations failed",
+                500,
+                'BULK_WRITE_ERROR',
+                details=self.write_errors
+            )
+
+        return self.summary()
+
+    def summary(self):
+        """Counts of everything written so far"""
+        return {
+            'inserted': self.inserted_count,
+            'matched': self.matched_count,
+            'modified': self.modified_count,
+            'upserted': self.upserted_count,
+            'deleted': self.deleted_count,
+            'round_trips': self.round_trips,
+            'errors': self.write_errors
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        # Don't push half-finished work when the caller is failing
+        if exc_type is None:
+            self.close()
+        return False
+
 def create_indexes():
-    """Create database indexes for better performance"""
+    """Create database indexes for better performance (see utils/indexes.py)"""
+    from .indexes import sync_indexes
     try:
-        db = mongo.db
-        
-        # Notes collection indexes
-        db.notes.create_index([("unit_id", 1)])
-        db.notes.create_index([("faculty", 1)])
-        db.notes.create_index([("type", 1)])
-        db.notes.create_index([("created_at", -1)])
-        db.notes.create_index([("title", "text"), ("description", "text")])
-        
-        # Users collection indexes
-        db.users.create_index([("email", 1)], unique=True)
-        db.users.create_index([("faculty", 1)])
-        db.users.create_index([("role", 1)])
-        
-        # Refresh tokens indexes
-        db.refresh_tokens.create_index([("user_id", 1)])
-        db.refresh_tokens.create_index([("expires_at", 1)], expireAfterSeconds=0)
-        db.refresh_tokens.create_index([("token", 1)])
-        
-        # Password resets indexes
-        db.password_resets.create_index([("user_id", 1)])
-        db.password_resets.create_index([("token", 1)])
-        db.password_resets.create_index([("expires_at", 1)], expireAfterSeconds=0)
-        
-        # References collection indexes
-        db.references.create_index([("note_id", 1)])
-        
-        # Units collection indexes
-        db.units.create_index([("course_id", 1)])
-        db.units.create_index([("code", 1)])
-        db.units.create_index([("name", "text"), ("description", "text")])
-        
-        logger.info("Database indexes created successfully")
-        
+        return sync_indexes()
     except PyMongoError as e:
         logger.error(f"Failed to create indexes: {str(e)}")
         raise AppError("Failed to create database indexes", 500)
@@ -0,0 +1,116 @@
+# server/app/utils/embeddings.py
+# Compact binary storage for embedding vectors
+
+import logging
+import numpy as np
+import bson
+from bson.binary import Binary
+from .database import BulkWriter
+
+logger = logging.getLogger(__name__)
+
+# User-defined BSON binary subtypes; the subtype is the dtype tag, so a stored
+# value is self-describing and needs no sibling field
+EMBEDDING_SUBTYPES = {
+    'float32': 0x80,
+    'float16': 0x81
+}
+
+# Explicit little-endian layouts, independent of the host
+EMBEDDING_DTYPES = {
+    0x80: np.dtype('<f4'),
+    0x81: np.dtype('<f2')
+}
+
+
+def encode_embedding(vector, dtype='float32'):
+    """
+    Pack an embedding into a BSON Binary
+
+    Args:
+        vector: List or array of floats (None passes through)
+        dtype (str): 'float32' or 'float16'
+
+    Returns:
+        Binary: Raw little-endian values tagged with the dtype subtype
+    """
+    if vector is None:
+        return None
+    if isinstance(vector, Binary) and vector.subtype in EMBEDDING_DTYPES:
+        return vector
+    if dtype not in EMBEDDING_SUBTYPES:
+        raise ValueError(f"Unsupported embedding dtype '{dtype}'. Allowed: {', '.join(EMBEDDING_SUBTYPES)}")
+
+    subtype = EMBEDDING_SUBTYPES[dtype]
+    array = np.asarray(vector, dtype=EMBEDDING_DTYPES[subtype]).ravel()
+    return Binary(array.tobytes(), subtype)
+
+
+def decode_embedding(value, as_float32=True):
+    """
+    Read an embedding stored in any supported format
+
+    float32 values are returned as a zero-copy view over the stored bytes
+    (read-only). float16 values are widened to float32 unless as_float32 is
+    False. Legacy arrays of floats are converted for compatibility.
+
+    Returns:
+        np.ndarray or None if there is no embedding
+    """
+    if value is None:
+        return None
+
+    if isinstance(value, Binary) and value.subtype in EMBEDDING_DTYPES:
+        array = np.frombuffer(value, dtype=EMBEDDING_DTYPES[value.subtype])
+        if as_float32 and array.dtype != np.float32:
+            array = array.astype(np.float32)
+    else:
+        array = np.asarray(value, dtype=np.float32)
+
+    return array if array.size else None
+
+
+def is_binary_embedding(value):
+    """True if the value is already in the compact format"""
+    return isinstance(value, Binary) and value.subtype in EMBEDDING_DTYPES
+
+
+def migrate_embeddings(collection, field, dtype='float32', batch_size=500, dry_run=False):
+    """
+    Rewrite array-of-float embeddings in a collection as compact BSON Binary
+
+    Args:
+        collection: pymongo collection
+        field (str): Name of the embedding field
+        dtype (str): Storage dtype for the converted values
+        batch_size (int): Updates per bulk_write round-trip
+        dry_run (bool): Only measure; don't write
+
+    Returns:
+        dict: Documents converted and field bytes before/after
+    """
+    converted = 0
+    bytes_before = 0
+    bytes_after = 0
+
+    cursor = collection.find({field: {'$type': 'array'}}, {field: 1}).batch_size(batch_size)
+    with BulkWriter(collection, batch_size=batch_size, raise_on_error=True) as writer:
+        for document in cursor:
+            value = document.get(field)
+            encoded = encode_embedding(value, dtype) if value else None
+
+            bytes_before += len(bson.encode({field: value}))
+            bytes_after += len(bson.encode({field: encoded}))
+            converted += 1
+
+            if not dry_run:
+                writer.update_one({'_id': document['_id']}, {'$set': {field: encoded}})
+
+    logger.info(f"{'Measured' if dry_run else 'Converted'} {converted} {collection.name}.{field} values: "
+                f"{bytes_before} -> {bytes_after} bytes")
+
+    return {
+        'documents': converted,
+        'bytes_before': bytes_before,
+        'bytes_after': bytes_after
+    }
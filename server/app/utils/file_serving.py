@@ -0,0 +1,143 @@
+# server/app/utils/file_serving.py
+# Conditional, range-aware serving of uploaded files
+
+import os
+import hashlib
+import mimetypes
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from flask import current_app, request, send_file
+from werkzeug.security import safe_join
+
+logger = logging.getLogger(__name__)
+
+# In-process memo of file hashes keyed by absolute path, invalidated by mtime/size
+_HASH_CACHE_SIZE = 1024
+_hash_cache = OrderedDict()
+_hash_lock = threading.Lock()
+
+
+def file_content_hash(file_path, chunk_size=1024 * 1024):
+    """
+    Compute the SHA-256 hex digest of a file without loading it into memory
+
+    Args:
+        file_path (str): Path to the file
+        chunk_size (int): Bytes read per iteration
+
+    Returns:
+        str: Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cached_content_hash(file_path):
+    """Return the content hash of a file, reusing it while the file is unchanged"""
+    file_path = os.path.abspath(file_path)
+    stat = os.stat(file_path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    with _hash_lock:
+        cached = _hash_cache.get(file_path)
+        if cached and cached[0] == signature:
+            _hash_cache.move_to_end(file_path)
+            return cached[1]
+
+    content_hash = file_content_hash(file_path)
+
+    with _hash_lock:
+        _hash_cache[file_path] = (signature, content_hash)
+        _hash_cache.move_to_end(file_path)
+        while len(_hash_cache) > _HASH_CACHE_SIZE:
+            _hash_cache.popitem(last=False)
+
+    return content_hash
+
+
+def resolve_upload(relative_path):
+    """
+    Resolve a path inside the upload folder
+
+    Returns:
+        str: Absolute path of the file, or None if it escapes the upload
+             folder or doesn't exist
+    """
+    upload_folder = os.path.abspath(current_app.config['UPLOAD_FOLDER'])
+    file_path = safe_join(upload_folder, relative_path)
+    if file_path is None or not os.path.isfile(file_path):
+        return None
+    return file_path
+
+
+def send_upload(relative_path, mimetype=None, as_attachment=False, download_name=None, file_hash=None):
+    """
+    Send a file from the upload folder with validators and byte-range support
+
+    The response carries a strong ETag derived from the file contents and a
+    Last-Modified date, answers If-None-Match / If-Modified-Since with 304 and
+    honours Range requests. When FILE_SERVE_OFFLOAD is set to 'x-accel' or
+    'x-sendfile' the body is left to the front proxy instead.
+
+    Args:
+        relative_path (str): Path of the file relative to UPLOAD_FOLDER
+        mimetype (str): Content type; guessed from the name when omitted
+        as_attachment (bool): Send with Content-Disposition: attachment
+        download_name (str): File name presented to the client
+        file_hash (str): Content hash stored at upload time, if known
+
+    Returns:
+        Response, or None if the file doesn't exist
+    """
+    file_path = resolve_upload(relative_path)
+    if file_path is None:
+        return None
+
+    etag = file_hash or cached_content_hash(file_path)
+    max_age = current_app.config.get('FILE_CACHE_MAX_AGE', 3600)
+    offload = current_app.config.get('FILE_SERVE_OFFLOAD', '').lower()
+
+    if offload == 'x-accel':
+        return _accel_redirect_response(
+            file_path, relative_path, mimetype, as_attachment, download_name, etag, max_age
+        )
+
+    # 'x-sendfile' is handled by send_file itself through USE_X_SENDFILE
+    return send_file(
+        file_path,
+        mimetype=mimetype,
+        as_attachment=as_attachment,
+        download_name=download_name,
+        conditional=True,
+        etag=etag,
+        max_age=max_age
+    )
+
+
+def _accel_redirect_response(file_path, relative_path, mimetype, as_attachment, download_name, etag, max_age):
+    """Build an empty response that tells nginx to serve the file from an internal location"""
+    download_name = download_name or os.path.basename(file_path)
+    if mimetype is None:
+        mimetype = mimetypes.guess_type(download_name)[0] or 'application/octet-stream'
+
+    response = current_app.response_class(mimetype=mimetype)
+    response.headers.set(
+        'Content-Disposition',
+        'attachment' if as_attachment else 'inline',
+        filename=download_name
+    )
+
+    prefix = current_app.config.get('X_ACCEL_PREFIX', '/protected-uploads/')
+    response.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + relative_path.replace(os.sep, '/').lstrip('/')
+    response.set_etag(etag)
+    response.last_modified = datetime.fromtimestamp(os.path.getmtime(file_path), tz=timezone.utc)
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+
+    # Validators are still checked here, so a 304 never reaches the proxy
+    return response.make_conditional(request)
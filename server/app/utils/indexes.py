@@ -0,0 +1,208 @@
+# server/app/utils/indexes.py
+# Declarative MongoDB index registry, startup sync and missing-index report
+#
+# Every index the app relies on is listed in INDEXES, per collection. Syncing
+# creates the ones that are missing and leaves existing ones alone, so it is
+# safe on every startup. QUERY_SHAPES lists the hot queries; the report runs
+# `explain` on them and flags those that still scan the whole collection or
+# sort in memory.
+
+import logging
+from bson import ObjectId
+from pymongo import IndexModel, ASCENDING, DESCENDING, TEXT
+from pymongo.errors import OperationFailure, PyMongoError
+from app import mongo
+
+logger = logging.getLogger(__name__)
+
+INDEXES = {
+    'notes': [
+        IndexModel([('unit_id', ASCENDING), ('published_at', DESCENDING), ('_id', DESCENDING)]),
+        IndexModel([('faculty', ASCENDING)]),
+        IndexModel([('facultyCode', ASCENDING)]),
+        IndexModel([('type', ASCENDING)]),
+        IndexModel([('created_at', DESCENDING)]),
+        # List sorts, with the _id tiebreaker used by keyset cursors
+        IndexModel([('published_at', DESCENDING), ('_id', DESCENDING)]),
+        IndexModel([('relevance_score', DESCENDING), ('_id', DESCENDING)]),
+        IndexModel([('title', ASCENDING), ('_id', ASCENDING)]),
+        IndexModel([('title', TEXT), ('description', TEXT)])
+    ],
+    'references': [
+        IndexModel([('note_id', ASCENDING)]),
+        IndexModel([('pageNumber', ASCENDING)])
+    ],
+    'bookmarks': [
+        IndexModel([('user_id', ASCENDING)]),
+        IndexModel([('note_id', ASCENDING)])
+    ],
+    'highlights': [
+        IndexModel([('user_id', ASCENDING)]),
+        IndexModel([('note_id', ASCENDING)])
+    ],
+    'tocs': [
+        IndexModel([('note_id', ASCENDING)], unique=True)
+    ],
+    'sentence_indexes': [
+        IndexModel([('note_id', ASCENDING)], unique=True)
+    ],
+    'users': [
+        IndexModel([('email', ASCENDING)], unique=True),
+        IndexModel([('faculty', ASCENDING)]),
+        IndexModel([('role', ASCENDING)])
+    ],
+    'refresh_tokens': [
+        IndexModel([('user_id', ASCENDING)]),
+        IndexModel([('expires_at', ASCENDING)], expireAfterSeconds=0),
+        IndexModel([('token', ASCENDING)])
+    ],
+    'password_resets': [
+        IndexModel([('user_id', ASCENDING)]),
+        IndexModel([('token', ASCENDING)]),
+        IndexModel([('expires_at', ASCENDING)], expireAfterSeconds=0)
+    ],
+    'units': [
+        IndexModel([('course_id', ASCENDING)]),
+        IndexModel([('code', ASCENDING), ('_id', ASCENDING)]),
+        IndexModel([('facultyCode', ASCENDING), ('code', ASCENDING), ('_id', ASCENDING)]),
+        # Prefix search (see services/search_tokens.py)
+        IndexModel([('search_tokens', ASCENDING)]),
+        IndexModel([('name', TEXT), ('description', TEXT)])
+    ],
+    'past_papers': [
+        # Unit lookups, unit + year filters and per-unit lists newest first
+        IndexModel([('unit_id', ASCENDING), ('year', DESCENDING), ('_id', DESCENDING)]),
+        IndexModel([('faculty_code', ASCENDING), ('year', DESCENDING), ('_id', DESCENDING)]),
+        IndexModel([('year', DESCENDING), ('_id', DESCENDING)]),
+        IndexModel([('search_tokens', ASCENDING)])
+    ],
+    'paper_vectors': [
+        IndexModel([('paper_id', ASCENDING)], unique=True)
+    ],
+    'analyses': [
+        IndexModel([('file_hash', ASCENDING), ('faculty_code', ASCENDING), ('version', ASCENDING)], unique=True)
+    ],
+    'questions': [
+        IndexModel([('unit_id', ASCENDING), ('group_id', ASCENDING)]),
+        IndexModel([('unit_id', ASCENDING), ('frequency', DESCENDING)]),
+        IndexModel([('group_id', ASCENDING)]),
+        IndexModel([('pastpaper_id', ASCENDING)])
+    ],
+    'saved_items': [
+        IndexModel([('user_id', ASCENDING), ('item_type', ASCENDING), ('item_id', ASCENDING)]),
+        IndexModel([('user_id', ASCENDING), ('saved_at', DESCENDING)])
+    ]
+}
+
+# Options that must match for an existing index to count as the registered one
+INDEX_OPTIONS = ('unique', 'sparse', 'expireAfterSeconds')
+
+# Hot query shapes checked by the missing-index report: (collection, filter, sort)
+QUERY_SHAPES = {
+    'notes by unit, recent': ('notes', {'unit_id': 'unit'}, [('published_at', DESCENDING), ('_id', DESCENDING)]),
+    'notes, recent': ('notes', {}, [('published_at', DESCENDING), ('_id', DESCENDING)]),
+    'references of a note': ('references', {'note_id': 'note'}, None),
+    'units, by code': ('units', {}, [('code', ASCENDING), ('_id', ASCENDING)]),
+    'units of a faculty, by code': ('units', {'facultyCode': 'SCI'}, [('code', ASCENDING), ('_id', ASCENDING)]),
+    'past papers of a unit and year': ('past_papers', {'unit_id': ObjectId(), 'year': '2024'}, None),
+    'past papers of a unit, newest first': (
+        'past_papers', {'unit_id': ObjectId()}, [('year', DESCENDING), ('_id', DESCENDING)]
+    ),
+    'past papers, newest first': ('past_papers', {}, [('year', DESCENDING), ('_id', DESCENDING)]),
+    'past paper search': ('past_papers', {'search_tokens': {'$all': ['data', 'struc']}}, None),
+    'unit search': ('units', {'search_tokens': 'algor'}, None),
+    'saved item lookup': ('saved_items', {'user_id': ObjectId(), 'item_type': 'note', 'item_id': ObjectId()}, None),
+    'saved items of a user': ('saved_items', {'user_id': ObjectId()}, [('saved_at', DESCENDING)]),
+    'questions of a unit group': ('questions', {'unit_id': ObjectId(), 'group_id': 'group'}, None),
+    'frequent questions of a unit': ('questions', {'unit_id': ObjectId(), 'frequency': {'$gte': 2}}, None),
+    'user by email': ('users', {'email': 'user@example.com'}, None),
+    'refresh token lookup': ('refresh_tokens', {'token': 'token'}, None)
+}
+
+
+def sync_indexes(db=None, collections=None):
+    """
+    Create every registered index that doesn't exist yet
+
+    Indexes are created one by one so a conflict (an existing index with the
+    same keys but other options) is reported without stopping the rest.
+    Conflicting and unregistered indexes are listed but never dropped.
+
+    Returns:
+        dict: {collection: {'created': [...], 'existing': [...],
+        'conflicts': [...], 'unregistered': [...]}}
+    """
+    db = db if db is not None else mongo.db
+    report = {}
+
+    for name, models in INDEXES.items():
+        if collections and name not in collections:
+            continue
+        collection = db[name]
+        existing = {index['name']: index for index in collection.list_indexes()}
+        result = report[name] = {'created': [], 'existing': [], 'conflicts': [], 'unregistered': []}
+
+        registered = set()
+        for model in models:
+            index_name = model.document['name']
+            registered.add(index_name)
+            if index_name in existing:
+                same = all(existing[index_name].get(option) == model.document.get(option) for option in INDEX_OPTIONS)
+                result['existing' if same else 'conflicts'].append(index_name)
+                continue
+            try:
+                collection.create_indexes([model])
+                result['created'].append(index_name)
+            except OperationFailure as e:
+                logger.warning(f"Index {name}.{index_name} conflicts with an existing index: {str(e)}")
+                result['conflicts'].append(index_name)
+
+        result['unregistered'] = sorted(set(existing) - registered - {'_id_'})
+
+    created = sum(len(r['created']) for r in report.values())
+    logger.info(f"Index sync: {created} created in {len(report)} collections")
+    return report
+
+
+def _plan_stages(plan):
+    """Stage names of a query plan tree, root first"""
+    stages = [plan.get('stage')]
+    for child in ('inputStage', 'queryPlan'):
+        if child in plan:
+            stages.extend(_plan_stages(plan[child]))
+    for child in plan.get('inputStages', []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+def missing_index_report(db=None):
+    """
+    Explain every registered query shape and flag the unindexed ones
+
+    Returns:
+        list: [{'shape', 'collection', 'stages', 'collection_scan',
+        'in_memory_sort'}, ...] with problem shapes first
+    """
+    db = db if db is not None else mongo.db
+    report = []
+
+    for shape, (name, query, sort) in QUERY_SHAPES.items():
+        cursor = db[name].find(query).limit(20)
+        if sort:
+            cursor = cursor.sort(sort)
+        try:
+            plan = cursor.explain()['queryPlanner']['winningPlan']
+        except (PyMongoError, KeyError) as e:
+            logger.warning(f"Could not explain '{shape}': {str(e)}")
+            continue
+
+        stages = _plan_stages(plan)
+        report.append({
+            'shape': shape,
+            'collection': name,
+            'stages': stages,
+            'collection_scan': 'COLLSCAN' in stages,
+            'in_memory_sort': 'SORT' in stages
+        })
+
+    return sorted(report, key=lambda r: not (r['collection_scan'] or r['in_memory_sort']))
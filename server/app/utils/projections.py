@@ -0,0 +1,86 @@
+# server/app/utils/projections.py
+# Per-endpoint projection profiles and `fields=` sparse fieldsets
+#
+# List and search endpoints fetch only the fields they return instead of
+# whole documents (note metadata, rating arrays, embeddings, ...). Each
+# profile has the fields returned by default and optional ones a client can
+# ask for; `fields=title,year` narrows the response to those fields.
+
+from .error_handler import ValidationError
+
+PROJECTION_PROFILES = {
+    'notes.list': {
+        'default': [
+            'title', 'description', 'url', 'source_name', 'published_at', 'type',
+            'faculty', 'facultyCode', 'unit_id', 'unit_name', 'unit_code', 'categories',
+            'author', 'institution', 'total_pages', 'created_at', 'created_by',
+            'image_url', 'relevance_score'
+        ],
+        'optional': ['metadata', 'file_path']
+    },
+    'notes.search': {
+        'default': [
+            'title', 'description', 'url', 'published_at', 'type', 'facultyCode',
+            'unit_id', 'unit_name', 'unit_code', 'total_pages'
+        ],
+        'optional': [
+            'source_name', 'faculty', 'categories', 'author', 'institution',
+            'created_at', 'image_url', 'metadata'
+        ]
+    },
+    'units.list': {
+        'default': ['name', 'code', 'description', 'faculty', 'facultyCode', 'keywords', 'credits', 'level'],
+        'optional': [
+            'course_id', 'syllabus', 'prerequisites', 'instructors',
+            'created_at', 'created_by', 'updated_at'
+        ]
+    },
+    'pastpapers.list': {
+        'default': [
+            'title', 'unit_id', 'unit_code', 'unit_name', 'year', 'exam_type', 'semester',
+            'faculty_code', 'faculty', 'difficulty', 'topics', 'avg_difficulty_rating', 'created_at'
+        ],
+        'optional': ['file_path', 'stream', 'session', 'updated_at']
+    }
+}
+
+
+def parse_fields(fields):
+    """Field names from a `fields=a,b` parameter (None when absent or empty)"""
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    return names or None
+
+
+def selected_fields(profile, fields=None):
+    """
+    Fields an endpoint returns: its defaults, or the requested sparse fieldset
+
+    Args:
+        profile (str): Key of PROJECTION_PROFILES
+        fields (str): Raw `fields=` parameter
+
+    Raises:
+        ValidationError: If a requested field is not available on the endpoint
+    """
+    spec = PROJECTION_PROFILES[profile]
+    requested = parse_fields(fields)
+    if requested is None:
+        return list(spec['default'])
+
+    available = set(spec['default']) | set(spec['optional'])
+    # '_id'/'id' is always returned
+    requested = [name for name in requested if name not in ('_id', 'id')]
+    unknown = sorted(set(requested) - available)
+    if unknown:
+        raise ValidationError(
+            f"Unknown fields: {', '.join(unknown)}",
+            details={'available': sorted(available)}
+        )
+    return list(dict.fromkeys(requested))
+
+
+def build_projection(profile, fields=None):
+    """MongoDB inclusion projection for an endpoint's selected fields"""
+    return {'_id': 1, **{name: 1 for name in selected_fields(profile, fields)}}
@@ -118,6 +118,33 @@ def validate_pagination(page=None, limit=None, max_limit=100):
     
     return page, limit
 
+def validate_page_ranges(spec, total_pages, max_pages=50):
+    """Parse a page selection like "1-3,7" into a sorted list of page numbers"""
+    pages = set()
+    
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        
+        try:
+            if '-' in part:
+                start, end = (int(x) for x in part.split('-', 1))
+            else:
+                start = end = int(part)
+        except ValueError:
+            raise ValidationError(f"Invalid page range: {part}")
+        
+        if start < 1 or end < start:
+            raise ValidationError(f"Invalid page range: {part}")
+        
+        # Pages past the end of the document are ignored
+        pages.update(range(start, min(end, total_pages) + 1))
+        if len(pages) > max_pages:
+            raise ValidationError(f"Cannot request more than {max_pages} pages at once")
+    
+    return sorted(pages)
+
 def validate_search_query(query, min_length=2, max_length=200):
     """Validate search query"""
     if not query:
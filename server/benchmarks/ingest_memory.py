@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# benchmarks/ingest_memory.py
+"""
+Peak-memory benchmark for note ingestion
+
+Builds synthetic PDFs and pushes them through the streaming pipeline
+(pages -> chunks -> embedding batches -> upsert batches) and through the old
+materialize-everything flow, reporting tracemalloc peaks for each. A
+deterministic stand-in encoder and a discarding sink keep the model and
+Qdrant out of the measurement.
+
+Usage:
+    python benchmarks/ingest_memory.py --pages 200 2000
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+import fitz  # PyMuPDF
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.ingestion import (
+    iter_pdf_pages, iter_text_chunks, iter_page_chunks,
+    iter_embedded_batches, iter_chunk_points, upsert_streaming
+)
+
+VECTOR_SIZE = 384  # all-MiniLM-L6-v2
+
+PARAGRAPH = (
+    "Relational algebra is a procedural query language which takes relations as "
+    "input and produces relations as output [3]. Selection, projection, union, set "
+    "difference and cartesian product are its fundamental operations. "
+)
+
+
+class NullSink:
+    """Qdrant stand-in that counts and discards upserted points"""
+
+    def __init__(self):
+        self.count = 0
+
+    def upsert(self, collection_name, points):
+        self.count += len(points)
+
+
+def encode(texts):
+    """Deterministic stand-in for SentenceTransformer.encode"""
+    rng = np.random.default_rng(len(texts))
+    return rng.standard_normal((len(texts), VECTOR_SIZE), dtype=np.float32)
+
+
+def build_pdf(path, pages):
+    """Write a synthetic text-heavy PDF with the given number of pages"""
+    doc = fitz.open()
+    for page_num in range(1, pages + 1):
+        page = doc.new_page()
+        page.insert_textbox(
+            fitz.Rect(40, 40, 560, 800),
+            f"Page {page_num}\n" + PARAGRAPH * 12,
+            fontsize=9
+        )
+    doc.save(path)
+    doc.close()
+
+
+def run_streaming(path, embed_batch_size=64, upsert_batch_size=100, max_in_flight=2):
+    """The pipeline used by notes.store_text_in_qdrant"""
+    sink = NullSink()
+    chunks = iter_page_chunks(iter_pdf_pages(path))
+    points = iter_chunk_points('bench', iter_embedded_batches(chunks, encode, batch_size=embed_batch_size))
+    upsert_streaming(sink, 'notes_content', points, batch_size=upsert_batch_size, max_in_flight=max_in_flight)
+    return sink.count
+
+
+def run_materialized(path):
+    """The previous flow: whole document, every chunk and every point in memory"""
+    sink = NullSink()
+    text_by_page = dict(iter_pdf_pages(path))
+
+    chunk_records = []
+    for page_num, text in text_by_page.items():
+        for i, (start, chunk) in enumerate(iter_text_chunks(text)):
+            chunk_records.append({'page': page_num, 'chunk_index': i, 'text': chunk,
+                                  'context': text[max(0, start - 50):start + len(chunk) + 50],
+                                  'chunk_position': start})
+
+    vectors = encode([c['text'] for c in chunk_records])
+    points = list(iter_chunk_points('bench', [(chunk_records, vectors)]))
+
+    for i in range(0, len(points), 100):
+        sink.upsert('notes_content', points[i:i + 100])
+    return sink.count
+
+
+def measure(func, *args):
+    """Return (result, peak_bytes, seconds) for a single call"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, nargs='+', default=[200, 2000])
+    parser.add_argument('--skip-materialized', action='store_true')
+    args = parser.parse_args()
+
+    print(f"{'pages':>6} {'mode':<13} {'points':>8} {'peak MiB':>9} {'seconds':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            path = os.path.join(tmp, f"synthetic_{pages}.pdf")
+            build_pdf(path, pages)
+
+            modes = [('streaming', run_streaming)]
+            if not args.skip_materialized:
+                modes.append(('materialized', run_materialized))
+
+            for mode, func in modes:
+                count, peak, elapsed = measure(func, path)
+                print(f"{pages:>6} {mode:<13} {count:>8} {peak / 2**20:>9.1f} {elapsed:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# benchmarks/reference_extraction.py
+"""
+Throughput benchmark for reference extraction
+
+Compares the single-pass engine in app.services.references against the two
+per-line heuristics it replaced (PDFProcessor._extract_references and
+notes.extract_page_references), over the pages of sample_notes.pdf and a
+synthetic citation-heavy corpus.
+
+Usage:
+    python benchmarks/reference_extraction.py --repeat 20 --synthetic-pages 500
+"""
+import os
+import re
+import sys
+import time
+import uuid
+import random
+import argparse
+from datetime import datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.ingestion import iter_pdf_pages
+from app.services.references import extract_references
+
+SAMPLE_PDF = os.path.join(os.path.dirname(__file__), '..', 'sample_notes.pdf')
+
+
+def legacy_processor_references(text, page_num):
+    """PDFProcessor._extract_references before the shared engine"""
+    references = []
+    lines = text.split('\n')
+    citation_pattern = r'\[\d+\]|\[\w+\s+et\s+al\.?,\s+\d{4}\]'
+    footnote_pattern = r'[¹²³⁴⁵⁶⁷⁸⁹]'
+    reference_section_patterns = [r'^references$', r'^bibliography$', r'^works cited$', r'^citations$']
+
+    is_reference_section = False
+    for line in lines:
+        line_lower = line.strip().lower()
+        for pattern in reference_section_patterns:
+            if re.match(pattern, line_lower):
+                is_reference_section = True
+                references.append({'id': str(uuid.uuid4()), 'pageNumber': page_num,
+                                   'text': f"References section starts here: {line.strip()}",
+                                   'title': "References Section", 'type': 'section',
+                                   'created_at': datetime.now()})
+                break
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if re.findall(citation_pattern, line):
+            references.append({'id': str(uuid.uuid4()), 'pageNumber': page_num, 'text': line,
+                               'title': f"Citation on page {page_num}", 'type': 'citation',
+                               'created_at': datetime.now()})
+            continue
+        if re.search(footnote_pattern, line):
+            references.append({'id': str(uuid.uuid4()), 'pageNumber': page_num, 'text': line,
+                               'title': f"Footnote on page {page_num}", 'type': 'footnote',
+                               'created_at': datetime.now()})
+            continue
+        if is_reference_section and len(line) > 30:
+            references.append({'id': str(uuid.uuid4()), 'pageNumber': page_num, 'text': line,
+                               'title': "Reference from bibliography", 'type': 'bibliography',
+                               'created_at': datetime.now()})
+    return references
+
+
+def legacy_notes_references(text, page_num):
+    """notes.extract_page_references before the shared engine"""
+    references = []
+    for line in text.split('\n'):
+        if (line.strip().startswith('[') and ']' in line) or \
+           (line.strip() and line.strip()[0].isdigit() and '.' in line[:5]):
+            references.append({'pageNumber': page_num, 'text': line.strip(),
+                               'title': f"Reference on page {page_num}", 'created_at': datetime.now()})
+    return references
+
+
+def legacy_both(text, page_num):
+    """What the two old paths cost together, i.e. what one engine call replaces"""
+    return legacy_processor_references(text, page_num) + legacy_notes_references(text, page_num)
+
+
+def synthetic_corpus(pages, seed=7):
+    """Citation-heavy pages: inline citations, footnotes, numbered lists and a bibliography"""
+    rng = random.Random(seed)
+    authors = ['Smith', 'Okoth', 'Wanjiru', 'Codd', 'Date', 'Ullman', 'Kimani', 'Stonebraker']
+    corpus = []
+    for page_num in range(1, pages + 1):
+        lines = []
+        for _ in range(40):
+            roll = rng.random()
+            if roll < 0.35:
+                lines.append(f"Normalization removes update anomalies [{rng.randint(1, 90)}] in practice.")
+            elif roll < 0.45:
+                lines.append(f"As shown by [{rng.choice(authors)} et al., {rng.randint(1970, 2024)}], joins dominate.")
+            elif roll < 0.55:
+                lines.append("Transactions must be serializable¹ under strict two-phase locking²")
+            elif roll < 0.65:
+                lines.append(f"{rng.randint(1, 20)}. Functional dependencies and closure")
+            else:
+                lines.append("A relation schema describes the attributes and their domains for a table.")
+        if page_num % 10 == 0:
+            lines.append("References")
+            for i in range(15):
+                lines.append(f"{rng.choice(authors)}, E. F. A relational model of data for large shared data banks {i}")
+        corpus.append((page_num, '\n'.join(lines)))
+    return corpus
+
+
+def time_extractor(func, pages, repeat):
+    """Return (references found per run, best seconds per run)"""
+    best = float('inf')
+    found = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        found = sum(len(func(text, page_num)) for page_num, text in pages)
+        best = min(best, time.perf_counter() - started)
+    return found, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--synthetic-pages', type=int, default=500)
+    args = parser.parse_args()
+
+    corpora = [
+        ('sample_notes.pdf', list(iter_pdf_pages(SAMPLE_PDF))),
+        (f'synthetic x{args.synthetic_pages}', synthetic_corpus(args.synthetic_pages))
+    ]
+    extractors = [
+        ('legacy processor', legacy_processor_references),
+        ('legacy notes', legacy_notes_references),
+        ('legacy both', legacy_both),
+        ('engine', extract_references)
+    ]
+
+    print(f"{'corpus':<20} {'extractor':<17} {'refs':>7} {'ms':>9} {'pages/s':>9}")
+    for corpus_name, pages in corpora:
+        for name, func in extractors:
+            found, seconds = time_extractor(func, pages, args.repeat)
+            print(f"{corpus_name:<20} {name:<17} {found:>7} {seconds * 1000:>9.1f} {len(pages) / seconds:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
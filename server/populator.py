@@ -410,15 +410,12 @@ def populate_comp311_database():
         # Get or create unit
         unit = Unit.collection.find_one({"code": comp311_info["code"]})
         if not unit:
-            unit_result = Unit.collection.insert_one({
-                "name": comp311_info["name"],
-                "code": comp311_info["code"],
-                "description": comp311_info["description"],
-                "course_id": ObjectId(course_id),
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow()
-            })
-            unit_id = unit_result.inserted_id
+            unit_id = Unit.create(
+                name=comp311_info["name"],
+                code=comp311_info["code"],
+                description=comp311_info["description"],
+                course_id=course_id
+            )['_id']
         else:
             unit_id = unit["_id"]
         
@@ -471,21 +468,17 @@ def create_past_paper(unit_id, instructor_id, paper_info, questions):
         
         print(f"Created past paper: {paper_info['title']} for {paper_info['year']} {paper_info['semester']}")
         
-        # Create individual questions
-        for question in questions:
-            question_obj = Question.create_from_pastpaper(
-                unit_id=str(unit_id),
-                question_text=question["text"],
-                question_number=question["question_number"],
-                marks=question["marks"],
-                subquestions=question.get("subquestions"),
-                year=paper_info["year"],
-                exam_type=paper_info["exam_type"],
-                pastpaper_id=str(pastpaper["_id"]),
-                section=None  # Can add section if needed
-            )
-            
-            print(f"Added question {question['question_number']} to past paper")
+        # Create individual questions in one batched write
+        question_docs = Question.create_many_from_pastpaper(
+            unit_id=str(unit_id),
+            questions=questions,
+            year=paper_info["year"],
+            exam_type=paper_info["exam_type"],
+            pastpaper_id=str(pastpaper["_id"]),
+            section=None  # Can add section if needed
+        )
+        
+        print(f"Added {len(question_docs)} questions to past paper")
 
 if __name__ == "__main__":
     print("Starting COMP 311 database population...")
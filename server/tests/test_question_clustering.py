@@ -0,0 +1,37 @@
+import numpy as np
+from app.services.question_clustering import assign_group_ids, cluster_embeddings
+
+
+def test_stale_group_shared_by_two_components_is_split():
+    # a1 and a2 are near-identical; b is unrelated but carries the same old id
+    vectors = np.array([[1.0, 0.0], [0.99, 0.01], [0.0, 1.0]])
+    ids = ['a1', 'a2', 'b']
+    labels = cluster_embeddings(vectors, threshold=0.85)
+    components = {}
+    for question_id, label in zip(ids, labels):
+        components.setdefault(label, []).append(question_id)
+    components = list(components.values())
+    assert len(components) == 2
+
+    current = {'a1': 'old', 'a2': 'old', 'b': 'old'}
+    group_ids = dict(zip(map(tuple, components), assign_group_ids(components, current)))
+
+    # The larger component keeps the old id; the other gets a fresh one
+    assert group_ids[('a1', 'a2')] == 'old'
+    assert group_ids[('b',)] not in ('old', None)
+
+    # A second run with the new ids is stable
+    current = {q: group_ids[c] for c in group_ids for q in c}
+    assert assign_group_ids(components, current) == [current[c[0]] for c in components]
+
+
+def test_component_falls_back_to_its_next_existing_id():
+    components = [['a1', 'a2'], ['b1', 'b2']]
+    current = {'a1': 'x', 'a2': 'x', 'b1': 'x', 'b2': 'y'}
+    assert assign_group_ids(components, current) == ['x', 'y']
+
+
+def test_ungrouped_components_get_distinct_new_ids():
+    components = [['a'], ['b']]
+    group_ids = assign_group_ids(components, {'a': None, 'b': None})
+    assert len(set(group_ids)) == 2
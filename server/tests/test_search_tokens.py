@@ -0,0 +1,41 @@
+import mongomock
+import pytest
+from app.services.search_tokens import search_filter, unit_search_tokens
+
+
+@pytest.fixture
+def units():
+    collection = mongomock.MongoClient().db.units
+    for code in ('CS101', 'CS 102', 'MATH 101'):
+        unit = {'name': 'Unit', 'code': code, 'description': ''}
+        unit['search_tokens'] = unit_search_tokens(unit)
+        collection.insert_one(unit)
+    return collection
+
+
+def codes(collection, search):
+    return sorted(unit['code'] for unit in collection.find(search_filter(search)))
+
+
+@pytest.mark.parametrize('search', ['CS 101', 'CS-101', 'cs101'])
+def test_unspaced_code_found_by_spaced_query(units, search):
+    assert codes(units, search) == ['CS101']
+
+
+@pytest.mark.parametrize('search', ['CS 102', 'CS-102', 'cs102'])
+def test_spaced_code_found_by_unspaced_query(units, search):
+    assert codes(units, search) == ['CS 102']
+
+
+def test_prefix_of_joined_code(units):
+    assert codes(units, 'cs1') == ['CS 102', 'CS101']
+
+
+def test_long_queries_only_match_every_word():
+    assert search_filter('data structures and algorithms') == {
+        'search_tokens': {'$all': ['data', 'structures', 'and', 'algorithms']}
+    }
+
+
+def test_empty_search():
+    assert search_filter(' - ') is None